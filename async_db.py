@@ -0,0 +1,42 @@
+"""
+Async database access for request handlers.
+
+The engine uses aiosqlite for the development SQLite database and asyncpg
+for PostgreSQL (DATABASE_URL), with the db_profile pool and pragmas, so
+handlers can await queries on the event loop instead of blocking it or
+hopping to a worker thread for every call to SessionLocal.
+
+Usage in a route:
+
+    @router.get("/entities/{tin}")
+    async def get_entity(tin: str, session: AsyncSession = Depends(get_async_session)):
+        return await EntityRepository(session).get_by_tin(tin)
+"""
+import logging
+import os
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db_profile import create_async_engine
+from direct_db_setup import DB_URL
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL", DB_URL)
+
+async_engine = create_async_engine(DATABASE_URL)
+# Objects stay usable after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency: one session per request, rolled back unless committed"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def dispose_async_engine():
+    """Close pooled connections on shutdown"""
+    await async_engine.dispose()
+    logger.info("Async database engine disposed")
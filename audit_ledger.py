@@ -0,0 +1,500 @@
+"""
+Hash-chained audit ledger with Merkle checkpoints.
+
+Every audit_logs row gets a sequence number and a chain hash,
+chain_hash = SHA-256(previous chain_hash + audit_hash), so changing,
+removing or reordering an entry breaks every chain hash after it. Each
+time AUDIT_CHECKPOINT_INTERVAL entries complete a block, the block's chain
+hashes are folded into a Merkle root, and block roots go into an
+append-only Merkle mountain range (audit_merkle_nodes, one row per
+complete subtree) whose bagged peaks are the ledger root.
+
+Proving that an entry is in the ledger reads its block's chain hashes
+plus O(log n) stored nodes, however large audit_logs grows, and the proof
+is returned so a client can check it against a ledger root it pinned
+earlier or that was anchored on chain. Appends are serialized by updating
+the single audit_ledger_head row first in each append transaction, so
+several workers can write to the same ledger.
+
+When retention drops an old audit_logs partition, the hashes of dropped
+rows that share a block with rows still kept move to audit_ledger_stubs,
+so those blocks still reproduce their checkpointed roots; entries older
+than that are reported as pruned rather than missing.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from async_db import async_engine
+from audit_partitions import insert_entries
+from direct_db_setup import AuditCheckpoint, AuditLedgerHead, AuditLedgerStub, AuditLog, AuditMerkleNode
+from token_verifier import token_verifier
+
+CHECKPOINT_INTERVAL = int(os.getenv("AUDIT_CHECKPOINT_INTERVAL", "1024"))
+if CHECKPOINT_INTERVAL < 2 or CHECKPOINT_INTERVAL & (CHECKPOINT_INTERVAL - 1):
+    raise ValueError("AUDIT_CHECKPOINT_INTERVAL must be a power of two")
+MAX_RANGE = 100_000  # entries per verify_range call
+GENESIS = "0" * 64
+CONTENT_FIELDS = ("log_id", "user_id", "event_type", "entity_id", "operation", "details", "timestamp")
+
+audit_logs = AuditLog.__table__
+ledger_head = AuditLedgerHead.__table__
+checkpoints = AuditCheckpoint.__table__
+merkle_nodes = AuditMerkleNode.__table__
+stubs = AuditLedgerStub.__table__
+
+
+def _sha256(data: str) -> str:
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def event_hash(event: dict) -> str:
+    """SHA-256 of an audit event's content, as stored in audit_hash"""
+    content = {field: event.get(field) for field in CONTENT_FIELDS}
+    return _sha256(json.dumps(content, sort_keys=True, separators=(",", ":"), default=str))
+
+
+def row_event(row) -> dict:
+    """The event an audit_logs row was written from"""
+    event = {field: row[field] for field in CONTENT_FIELDS}
+    if isinstance(event["timestamp"], datetime):
+        event["timestamp"] = event["timestamp"].isoformat()
+    return event
+
+
+def log_id_time(log_id: str) -> Optional[datetime]:
+    """When an event was recorded, from its AUDIT-YYYYmmddHHMMSS-... log_id"""
+    if len(log_id) < 21 or log_id[20] != "-":
+        return None
+    try:
+        return datetime.strptime(log_id[6:20], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+
+def chain(previous: str, audit_hash: str) -> str:
+    return _sha256(previous + audit_hash)
+
+
+def leaf_hash(chain_hash: str) -> str:
+    # Distinct prefixes for leaves and nodes (RFC 6962) so a node can't pose as a leaf
+    return _sha256("\x00" + chain_hash)
+
+
+def node_hash(left: str, right: str) -> str:
+    return _sha256("\x01" + left + right)
+
+
+def merkle_levels(chain_hashes: Sequence[str]) -> List[List[str]]:
+    """Every level of the Merkle tree over a full block, leaves first"""
+    levels = [[leaf_hash(h) for h in chain_hashes]]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        levels.append([node_hash(below[i], below[i + 1]) for i in range(0, len(below), 2)])
+    return levels
+
+
+def merkle_path(levels: List[List[str]], index: int) -> List[str]:
+    path = []
+    for level in levels[:-1]:
+        path.append(level[index ^ 1])
+        index >>= 1
+    return path
+
+
+def root_from_path(node: str, index: int, path: Sequence[str]) -> str:
+    """Fold a leaf (or subtree root) at index up its sibling path"""
+    for sibling in path:
+        node = node_hash(sibling, node) if index & 1 else node_hash(node, sibling)
+        index >>= 1
+    return node
+
+
+def peaks(blocks: int) -> List[Tuple[int, int]]:
+    """(level, idx) of the perfect subtrees a mountain range of this many blocks consists of"""
+    result, offset = [], 0
+    for level in reversed(range(blocks.bit_length())):
+        if blocks & (1 << level):
+            result.append((level, offset >> level))
+            offset += 1 << level
+    return result
+
+
+def bag_peaks(peak_hashes: Sequence[str]) -> str:
+    root = peak_hashes[-1]
+    for peak in reversed(peak_hashes[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+def verify_proof(proof: dict) -> bool:
+    """Check an inclusion proof from verify_entry without touching the database"""
+    block_root = root_from_path(leaf_hash(proof["chain_hash"]), proof["index"], proof["block_path"])
+    peak = root_from_path(block_root, proof["block"], proof["ledger_path"])
+    peak_hashes = list(proof["peaks"])
+    peak_hashes[proof["peak"]] = peak
+    return bag_peaks(peak_hashes) == proof["ledger_root"]
+
+
+async def _nodes(conn: AsyncConnection, keys: Sequence[Tuple[int, int]]) -> Dict[Tuple[int, int], str]:
+    if not keys:
+        return {}
+    result = await conn.execute(
+        select(merkle_nodes.c.level, merkle_nodes.c.idx, merkle_nodes.c.hash).where(
+            or_(*(and_(merkle_nodes.c.level == level, merkle_nodes.c.idx == idx) for level, idx in keys))
+        )
+    )
+    return {(level, idx): node for level, idx, node in result}
+
+
+async def _links(conn: AsyncConnection, first: int, last: int) -> List[Tuple[int, str, str]]:
+    """(seq, audit_hash, chain_hash) for first..last, from audit_logs and retention stubs"""
+    links = {}
+    for table in (stubs, audit_logs):
+        result = await conn.execute(
+            select(table.c.seq, table.c.audit_hash, table.c.chain_hash).where(table.c.seq.between(first, last))
+        )
+        links.update((link[0], tuple(link)) for link in result)
+    return [links[seq] for seq in sorted(links)]
+
+
+async def _block_chain_hashes(conn: AsyncConnection, block: int) -> List[str]:
+    first = block * CHECKPOINT_INTERVAL + 1
+    return [link[2] for link in await _links(conn, first, first + CHECKPOINT_INTERVAL - 1)]
+
+
+async def _chain_hash_at(conn: AsyncConnection, seq: int) -> Optional[str]:
+    """Chain hash after entry seq, even if retention has dropped that entry's row"""
+    if seq < 1:
+        return GENESIS
+    for query in (
+        select(audit_logs.c.chain_hash).where(audit_logs.c.seq == seq),
+        select(stubs.c.chain_hash).where(stubs.c.seq == seq),
+        select(checkpoints.c.chain_hash).where(checkpoints.c.last_seq == seq),
+    ):
+        found = await conn.scalar(query)
+        if found is not None:
+            return found
+    return None
+
+
+async def _checkpoint(conn: AsyncConnection, block: int):
+    chain_hashes = await _block_chain_hashes(conn, block)
+    root = merkle_levels(chain_hashes)[-1][0]
+
+    # Append to the mountain range: merge with the left sibling while this is a right child
+    new_nodes = [{"level": 0, "idx": block, "hash": root}]
+    level, idx, node = 0, block, root
+    while idx & 1:
+        left = (await _nodes(conn, [(level, idx - 1)]))[(level, idx - 1)]
+        level, idx = level + 1, idx >> 1
+        node = node_hash(left, node)
+        new_nodes.append({"level": level, "idx": idx, "hash": node})
+    await conn.execute(insert(merkle_nodes), new_nodes)
+
+    keys = peaks(block + 1)
+    found = await _nodes(conn, keys)
+    await conn.execute(insert(checkpoints).values(
+        block=block,
+        last_seq=(block + 1) * CHECKPOINT_INTERVAL,
+        merkle_root=root,
+        ledger_root=bag_peaks([found[key] for key in keys]),
+        chain_hash=chain_hashes[-1],
+        created_at=datetime.utcnow(),
+    ))
+
+
+async def _lock_head(conn: AsyncConnection) -> Tuple[int, str]:
+    """Take the ledger lock for this transaction; returns the head (seq, chain_hash)"""
+    now = datetime.utcnow()
+    locked = await conn.execute(update(ledger_head).where(ledger_head.c.id == 1).values(updated_at=now))
+    if locked.rowcount == 0:
+        await conn.execute(insert(ledger_head).values(id=1, seq=0, chain_hash=GENESIS, updated_at=now))
+    return tuple((
+        await conn.execute(select(ledger_head.c.seq, ledger_head.c.chain_hash).where(ledger_head.c.id == 1))
+    ).one())
+
+
+async def _advance(conn: AsyncConnection, previous_seq: int, seq: int, chain_hash: str):
+    """Move the head to seq and checkpoint every block completed since previous_seq"""
+    await conn.execute(update(ledger_head).where(ledger_head.c.id == 1).values(seq=seq, chain_hash=chain_hash))
+    for block in range(previous_seq // CHECKPOINT_INTERVAL, seq // CHECKPOINT_INTERVAL):
+        await _checkpoint(conn, block)
+
+
+async def append_entries(conn: AsyncConnection, rows: List[dict]) -> int:
+    """
+    Chain rows onto the ledger and insert them into audit_logs
+
+    Run inside a transaction. Rows whose log_id is already in audit_logs
+    are skipped, so replaying a batch is harmless. Returns the number of
+    rows inserted.
+    """
+    seq, chain_hash = await _lock_head(conn)
+    previous_seq = seq
+
+    query = select(audit_logs.c.log_id).where(audit_logs.c.log_id.in_([row["log_id"] for row in rows]))
+    timestamps = [row.get("timestamp") for row in rows]
+    if all(isinstance(ts, datetime) for ts in timestamps):
+        # A replayed row keeps its timestamp, so only the batch's months need searching
+        query = query.where(audit_logs.c.timestamp.between(min(timestamps), max(timestamps)))
+    seen = set(await conn.scalars(query))
+    fresh = []
+    for row in rows:
+        if row["log_id"] in seen:
+            continue
+        seen.add(row["log_id"])
+        seq += 1
+        chain_hash = chain(chain_hash, row["audit_hash"])
+        fresh.append({**row, "seq": seq, "chain_hash": chain_hash})
+    if not fresh:
+        return 0
+
+    # executemany: the statement is compiled once and cached, unlike a VALUES list per batch
+    await insert_entries(conn, fresh)
+    await _advance(conn, previous_seq, seq, chain_hash)
+    return len(fresh)
+
+
+async def backfill_ledger(conn: AsyncConnection) -> int:
+    """Chain audit_logs rows written before the ledger existed (seq is NULL), oldest first"""
+    seq, chain_hash = await _lock_head(conn)
+    previous_seq = seq
+    unchained = await conn.execute(
+        select(audit_logs.c.id, audit_logs.c.audit_hash).where(audit_logs.c.seq.is_(None)).order_by(audit_logs.c.id)
+    )
+    links = []
+    for row_id, audit_hash in unchained:
+        seq += 1
+        chain_hash = chain(chain_hash, audit_hash or "")
+        links.append({"row_id": row_id, "new_seq": seq, "new_chain_hash": chain_hash})
+    if not links:
+        return 0
+    await conn.execute(
+        update(audit_logs).where(audit_logs.c.id == bindparam("row_id"))
+        .values(seq=bindparam("new_seq"), chain_hash=bindparam("new_chain_hash")),
+        links,
+    )
+    await _advance(conn, previous_seq, seq, chain_hash)
+    return len(links)
+
+
+async def latest_checkpoint(conn: AsyncConnection):
+    return (await conn.execute(select(checkpoints).order_by(checkpoints.c.block.desc()).limit(1))).mappings().first()
+
+
+async def _ledger_proof(conn: AsyncConnection, block: int, blocks: int) -> dict:
+    """Sibling path from a block root to its peak, and every peak, for a range of this many blocks"""
+    keys = peaks(blocks)
+    for position, (level, idx) in enumerate(keys):
+        if idx << level <= block < (idx + 1) << level:
+            break
+    siblings = [(l, (block >> l) ^ 1) for l in range(level)]
+    found = await _nodes(conn, siblings + keys)
+    return {
+        "block": block,
+        "ledger_path": [found[key] for key in siblings],
+        "peak": position,
+        "peaks": [found[key] for key in keys],
+    }
+
+
+async def verify_entry(conn: AsyncConnection, log_id: str) -> Optional[dict]:
+    """
+    Check one audit entry and return its inclusion proof
+
+    Checks that the row's content still matches audit_hash, that it links
+    to the previous chain hash, and that its block root and the path up
+    the mountain range reproduce the latest checkpointed ledger root.
+    Entries in the block that has no checkpoint yet are checked by
+    following the chain from the last checkpoint instead.
+    """
+    query = select(audit_logs).where(audit_logs.c.log_id == log_id)
+    recorded = log_id_time(log_id)
+    if recorded is not None:
+        # Only look in the partition the entry was written to
+        query = query.where(audit_logs.c.timestamp.between(recorded - timedelta(days=1), recorded + timedelta(days=1)))
+    row = (await conn.execute(query)).mappings().first()
+    if row is None:
+        return None
+    checks = {"content": event_hash(row_event(row)) == row["audit_hash"]}
+    result = {"audit_id": log_id, "seq": row["seq"], "checkpointed": False, "checks": checks, "proof": None}
+    if row["seq"] is None:
+        checks["chained"] = False  # written before the ledger existed
+        result["valid"] = False
+        return result
+
+    seq = row["seq"]
+    block, index = divmod(seq - 1, CHECKPOINT_INTERVAL)
+    latest = await latest_checkpoint(conn)
+    if latest is None or block > latest["block"]:
+        # Not checkpointed yet: follow the chain from the last checkpoint (< one block)
+        previous = latest["chain_hash"] if latest else GENESIS
+        first = latest["last_seq"] + 1 if latest else 1
+        links = await _links(conn, first, seq)
+        for _, audit_hash, chain_hash in links:
+            previous = chain(previous, audit_hash)
+            if previous != chain_hash:
+                break
+        checks["chain"] = len(links) == seq - first + 1 and previous == row["chain_hash"]
+    else:
+        previous = await _chain_hash_at(conn, seq - 1)
+        checks["chain"] = chain(previous or "", row["audit_hash"]) == row["chain_hash"]
+        levels = merkle_levels(await _block_chain_hashes(conn, block))
+        checkpoint = (await conn.execute(select(checkpoints).where(checkpoints.c.block == block))).mappings().one()
+        checks["block_root"] = levels[-1][0] == checkpoint["merkle_root"]
+        proof = {
+            "chain_hash": row["chain_hash"],
+            "index": index,
+            "block_path": merkle_path(levels, index),
+            **(await _ledger_proof(conn, block, latest["block"] + 1)),
+            "ledger_root": latest["ledger_root"],
+            "last_seq": latest["last_seq"],
+            "anchor": latest["blockchain_tx_hash"],
+        }
+        checks["ledger_root"] = verify_proof(proof)
+        result["checkpointed"] = True
+        result["proof"] = proof
+    result["valid"] = all(checks.values())
+    return result
+
+
+async def verify_range(conn: AsyncConnection, first_seq: int, last_seq: int) -> dict:
+    """
+    Rehash entries first_seq..last_seq and check them against the ledger
+
+    Every entry's content and chain link is recomputed; each block the
+    range covers completely is also checked against its checkpoint and,
+    through O(log n) stored nodes, against the latest ledger root. Entries
+    dropped by retention count as pruned: stubbed ones still take part in
+    their block's root, and blocks dropped whole are skipped.
+    """
+    last_seq = min(last_seq, first_seq + MAX_RANGE - 1)
+    previous = await _chain_hash_at(conn, first_seq - 1)
+    rows = {
+        row["seq"]: row for row in (await conn.execute(
+            select(audit_logs).where(audit_logs.c.seq.between(first_seq, last_seq))
+        )).mappings()
+    }
+    stubbed = {
+        seq: (audit_hash, chain_hash) for seq, audit_hash, chain_hash in await conn.execute(
+            select(stubs.c.seq, stubs.c.audit_hash, stubs.c.chain_hash).where(stubs.c.seq.between(first_seq, last_seq))
+        )
+    }
+    end = max([*rows, *stubbed], default=first_seq - 1)
+    if end >= first_seq:
+        last_seq = end  # range runs past the end of the ledger
+    else:
+        # Nothing left here: either past the end of the ledger or dropped by retention
+        horizon = await conn.scalar(select(func.min(audit_logs.c.seq))) or 0
+        end = min(last_seq, horizon - 1)
+
+    invalid, recomputed, pruned, horizon = [], {}, 0, None
+    for seq in range(first_seq, end + 1):
+        if seq in rows or seq in stubbed:
+            row = rows.get(seq)
+            audit_hash, chain_hash = (row["audit_hash"], row["chain_hash"]) if row else stubbed[seq]
+            if previous is None:
+                previous = await _chain_hash_at(conn, seq - 1) or ""
+            previous = chain(previous, audit_hash)
+            if previous != chain_hash or (row is not None and event_hash(row_event(row)) != audit_hash):
+                invalid.append(seq)
+            recomputed[seq] = previous
+            pruned += row is None
+            continue
+        if horizon is None:
+            horizon = await conn.scalar(select(func.min(audit_logs.c.seq))) or 0
+        if seq < horizon:
+            pruned += 1  # dropped with its whole block by retention
+            previous = None
+        else:
+            invalid.append(seq)  # missing entry
+
+    latest = await latest_checkpoint(conn)
+    blocks_checked, bad_blocks = 0, []
+    if latest is not None:
+        first_block = -(-(first_seq - 1) // CHECKPOINT_INTERVAL)
+        last_block = min(last_seq // CHECKPOINT_INTERVAL - 1, latest["block"])
+        stored = {
+            row.block: row.merkle_root for row in await conn.execute(
+                select(checkpoints.c.block, checkpoints.c.merkle_root)
+                .where(checkpoints.c.block.between(first_block, last_block))
+            )
+        }
+        for block in range(first_block, last_block + 1):
+            first = block * CHECKPOINT_INTERVAL + 1
+            block_seqs = range(first, first + CHECKPOINT_INTERVAL)
+            if not any(seq in recomputed for seq in block_seqs) and all(seq < (horizon or 0) for seq in block_seqs):
+                continue
+            block_hashes = [recomputed.get(seq, "") for seq in block_seqs]
+            root = merkle_levels(block_hashes)[-1][0]
+            proof = await _ledger_proof(conn, block, latest["block"] + 1)
+            peak_hashes = list(proof["peaks"])
+            peak_hashes[proof["peak"]] = root_from_path(root, block, proof["ledger_path"])
+            if root != stored.get(block) or bag_peaks(peak_hashes) != latest["ledger_root"]:
+                bad_blocks.append(block)
+            blocks_checked += 1
+
+    return {
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "entries": len(rows),
+        "pruned": pruned,
+        "blocks_checked": blocks_checked,
+        "invalid_seqs": invalid[:100],
+        "invalid_blocks": bad_blocks[:100],
+        "ledger_root": latest["ledger_root"] if latest else None,
+        "valid": bool(recomputed) and not invalid and not bad_blocks,
+    }
+
+
+# Verify Audit Integrity API
+
+# Same Bearer requirement as the security endpoints these routes take over
+router = APIRouter(
+    prefix="/api/v1/security/audit",
+    tags=["security"],
+    dependencies=[Depends(token_verifier.require("read:audit"))],
+)
+
+
+async def _connection():
+    async with async_engine.connect() as conn:
+        yield conn
+
+
+@router.get("/verify/{audit_id}")
+async def verify_audit_integrity(audit_id: str, conn: AsyncConnection = Depends(_connection)):
+    """Verify one audit entry and return its Merkle inclusion proof"""
+    result = await verify_entry(conn, audit_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Audit entry {audit_id} not found")
+    return result
+
+
+@router.get("/verify")
+async def verify_audit_range(
+    from_seq: int = Query(..., ge=1),
+    to_seq: int = Query(..., ge=1),
+    conn: AsyncConnection = Depends(_connection),
+):
+    """Rehash a range of ledger entries (at most 100,000) and check their checkpoints"""
+    if to_seq < from_seq:
+        raise HTTPException(status_code=400, detail="to_seq must not be less than from_seq")
+    return await verify_range(conn, from_seq, to_seq)
+
+
+@router.get("/root")
+async def audit_ledger_root(conn: AsyncConnection = Depends(_connection)):
+    """Latest checkpoint: the ledger root to pin or anchor, and the entries it covers"""
+    latest = await latest_checkpoint(conn)
+    entries = await conn.scalar(select(func.coalesce(func.max(ledger_head.c.seq), 0)))
+    if latest is None:
+        return {"entries": entries, "checkpoint": None}
+    return {"entries": entries, "checkpoint": dict(latest)}
@@ -0,0 +1,364 @@
+"""
+Monthly partitions for audit_logs, with time-based retention.
+
+On PostgreSQL audit_logs becomes a table partitioned by RANGE (timestamp)
+with one partition per month (audit_logs_y2026m10, ...). On SQLite each
+month is its own shard table and audit_logs is a UNION ALL view over the
+shards, so the AuditLog model, the repositories and the ledger keep
+reading "audit_logs" either way; rows are written through
+insert_entries(), which routes them to the right month.
+
+A timestamp filter only touches the months it covers: PostgreSQL prunes
+partitions, and on SQLite the predicate is pushed into every arm of the
+view where the shard's timestamp index answers it from its empty range.
+Each partition carries four indexes (ledger seq, log_id,
+entity_id+timestamp, user_id+timestamp) instead of the unpartitioned
+table's assortment, and seq doubles as the row id.
+
+apply_retention() drops whole months once they are older than
+DATA_RETENTION_DAYS: DETACH + DROP on PostgreSQL, DROP TABLE on SQLite,
+either of which is instant compared to DELETE. Ledger hashes of dropped
+rows that share a checkpoint block with rows still kept are copied to
+audit_ledger_stubs first, so every retained entry stays verifiable.
+"""
+import asyncio
+import logging
+import os
+import re
+import weakref
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import (JSON, BigInteger, Column, Computed, DateTime, Index, Integer, MetaData,
+                        PrimaryKeyConstraint, String, Table, and_, column, func, insert, select,
+                        table, text)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from direct_db_setup import AuditLedgerStub, AuditLog
+
+logger = logging.getLogger(__name__)
+
+DATA_RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS", "365"))
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "2"))
+MAINTENANCE_INTERVAL = 6 * 3600
+
+PARTITION_NAME = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+UNPARTITIONED = "audit_logs_unpartitioned"
+STORAGE_COLUMNS = ("seq", "log_id", "user_id", "event_type", "entity_id", "operation", "details",
+                   "audit_hash", "blockchain_tx_hash", "timestamp", "chain_hash")
+
+_metadata = MetaData()
+_layouts = weakref.WeakKeyDictionary()  # engine -> {"mode": ..., "months": set()}
+
+
+def _storage_columns() -> List[Column]:
+    return [
+        Column("log_id", String(50), nullable=False),
+        Column("user_id", Integer),
+        Column("event_type", String(50), nullable=False),
+        Column("entity_id", String(50)),
+        Column("operation", String(50), nullable=False),
+        Column("details", JSON),
+        Column("audit_hash", String(64), nullable=False),
+        Column("blockchain_tx_hash", String(66)),
+        Column("timestamp", DateTime, nullable=False),
+        Column("chain_hash", String(64)),
+    ]
+
+
+# PostgreSQL parent table; indexes on it are created on every partition
+partitioned_audit_logs = Table(
+    "audit_logs", _metadata,
+    Column("id", BigInteger, Computed("seq", persisted=True)),
+    Column("seq", BigInteger, nullable=False),
+    *_storage_columns(),
+    PrimaryKeyConstraint("seq", "timestamp", name="audit_logs_seq_timestamp_pkey"),
+    postgresql_partition_by="RANGE (timestamp)",
+)
+# Created once the old table (and its indexes of the same names) is gone
+PARTITIONED_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_log_id ON audit_logs (log_id)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_entity_timestamp ON audit_logs (entity_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_user_timestamp ON audit_logs (user_id, timestamp)",
+)
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"audit_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def months_between(first: date, last: date) -> List[date]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = next_month(first)
+    return months
+
+
+def shard_table(month: date) -> Table:
+    """SQLite shard for one month; seq is the rowid"""
+    name = partition_name(month)
+    if name in _metadata.tables:
+        return _metadata.tables[name]
+    shard = Table(name, _metadata, Column("seq", Integer, primary_key=True, autoincrement=False), *_storage_columns())
+    Index(f"ix_{name}_log_id", shard.c.log_id)
+    Index(f"ix_{name}_timestamp", shard.c.timestamp)
+    Index(f"ix_{name}_entity_timestamp", shard.c.entity_id, shard.c.timestamp)
+    Index(f"ix_{name}_user_timestamp", shard.c.user_id, shard.c.timestamp)
+    return shard
+
+
+async def _list_partitions(conn: AsyncConnection) -> Set[date]:
+    if conn.dialect.name == "postgresql":
+        names = await conn.scalars(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'audit_logs'"
+        ))
+    else:
+        names = await conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'audit_logs_y%'"))
+    months = set()
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.add(date(int(match.group(1)), int(match.group(2)), 1))
+    return months
+
+
+async def layout(conn: AsyncConnection, refresh: bool = False) -> dict:
+    """How audit_logs is stored: mode "table", "partitioned" (PostgreSQL) or "sharded" (SQLite)"""
+    engine = conn.sync_engine
+    state = None if refresh else _layouts.get(engine)
+    if state is None:
+        if conn.dialect.name == "postgresql":
+            kind = await conn.scalar(text("SELECT relkind FROM pg_class WHERE relname = 'audit_logs'"))
+            mode = "partitioned" if kind == "p" else "table"
+        elif conn.dialect.name == "sqlite":
+            kind = await conn.scalar(text("SELECT type FROM sqlite_master WHERE name = 'audit_logs'"))
+            mode = "sharded" if kind == "view" else "table"
+        else:
+            mode = "table"
+        months = await _list_partitions(conn) if mode != "table" else set()
+        state = _layouts[engine] = {"mode": mode, "months": months}
+    return state
+
+
+async def _rebuild_view(conn: AsyncConnection, months: Iterable[date]):
+    """Point the audit_logs view at the given SQLite shards"""
+    columns = ", ".join(STORAGE_COLUMNS)
+    arms = [f"SELECT seq AS id, {columns} FROM {partition_name(month)}" for month in sorted(months)]
+    await conn.execute(text("DROP VIEW IF EXISTS audit_logs"))
+    await conn.execute(text("CREATE VIEW audit_logs AS " + " UNION ALL ".join(arms)))
+
+
+async def ensure_partitions(conn: AsyncConnection, months: Iterable[date]):
+    """Create any missing monthly partitions (or shards) for these months"""
+    state = await layout(conn)
+    missing = set(months) - state["months"]
+    if state["mode"] == "table" or not missing:
+        return
+    for month in sorted(missing):
+        name = partition_name(month)
+        if state["mode"] == "partitioned":
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            ))
+        else:
+            await conn.run_sync(shard_table(month).create, checkfirst=True)
+        logger.info(f"Created audit_logs partition {name}")
+    state["months"] |= missing
+    if state["mode"] == "sharded":
+        await _rebuild_view(conn, await _list_partitions(conn))
+
+
+async def insert_entries(conn: AsyncConnection, rows: List[dict]):
+    """Insert ledger rows into audit_logs, routing them to their month's partition"""
+    state = await layout(conn)
+    try:
+        if state["mode"] == "table":
+            await conn.execute(insert(AuditLog.__table__), rows)
+            return
+        by_month = {}
+        for row in rows:
+            row.pop("id", None)  # seq is the row id
+            by_month.setdefault(month_start(row["timestamp"]), []).append(row)
+        await ensure_partitions(conn, by_month)
+        if state["mode"] == "partitioned":
+            await conn.execute(insert(partitioned_audit_logs), rows)
+        else:
+            for month, month_rows in by_month.items():
+                await conn.execute(insert(shard_table(month)), month_rows)
+    except Exception:
+        _layouts.pop(conn.sync_engine, None)  # another worker may have added or dropped months
+        raise
+
+
+async def _lock_conversion(conn: AsyncConnection):
+    """Serialize partition_audit_logs across workers until this transaction ends"""
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('audit_logs_partitioning'))"))
+    elif not (await conn.get_raw_connection()).driver_connection.in_transaction:
+        # Take SQLite's write lock before reading the layout, not at the first write
+        await conn.execute(text("BEGIN IMMEDIATE"))
+
+
+async def partition_audit_logs(conn: AsyncConnection, now: datetime = None) -> int:
+    """
+    Convert audit_logs to monthly partitions (PostgreSQL) or shards (SQLite)
+
+    Rows written before the ledger existed are chained first, since seq is
+    the partition key's companion in the primary key. Returns the number
+    of rows moved; does nothing if audit_logs is already partitioned.
+    Every worker calls this on startup; the first converts while the
+    others wait on a lock, then find the conversion done.
+    """
+    from audit_ledger import backfill_ledger
+
+    if conn.dialect.name not in ("postgresql", "sqlite") or (await layout(conn, refresh=True))["mode"] != "table":
+        return 0
+    await _lock_conversion(conn)
+    state = await layout(conn, refresh=True)
+    if state["mode"] != "table":
+        return 0
+    now = now or datetime.utcnow()
+    current = month_start(now)
+    wanted = set(months_between(current, _months_ahead(current)))
+
+    exists = await conn.run_sync(lambda sync_conn: sync_conn.dialect.has_table(sync_conn, "audit_logs"))
+    moved = 0
+    if exists:
+        await backfill_ledger(conn)
+        await conn.execute(text(f"ALTER TABLE audit_logs RENAME TO {UNPARTITIONED}"))
+        oldest, newest = (await conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {UNPARTITIONED}"))).one()
+        if oldest is not None:
+            oldest, newest = (datetime.fromisoformat(ts) if isinstance(ts, str) else ts for ts in (oldest, newest))
+            wanted |= set(months_between(month_start(oldest), month_start(newest)))
+
+    columns = ", ".join(STORAGE_COLUMNS)
+    source = columns.replace("timestamp", "COALESCE(timestamp, CURRENT_TIMESTAMP)").replace(
+        "audit_hash", "COALESCE(audit_hash, '')", 1)
+    if conn.dialect.name == "postgresql":
+        await conn.run_sync(partitioned_audit_logs.create)
+        state.update(mode="partitioned", months=set())
+        await ensure_partitions(conn, wanted)
+        if exists:
+            moved = (await conn.execute(text(
+                f"INSERT INTO audit_logs ({columns}) SELECT {source} FROM {UNPARTITIONED}"
+            ))).rowcount
+            await conn.execute(text(f"DROP TABLE {UNPARTITIONED}"))
+        # Built once over the copied rows rather than maintained row by row during the copy
+        for ddl in PARTITIONED_INDEXES:
+            await conn.execute(text(ddl))
+    else:
+        for month in sorted(wanted):
+            await conn.run_sync(shard_table(month).create, checkfirst=True)
+            if exists:
+                moved += (await conn.execute(text(
+                    f"INSERT INTO {partition_name(month)} ({columns}) SELECT {source} FROM {UNPARTITIONED} "
+                    f"WHERE COALESCE(timestamp, CURRENT_TIMESTAMP) >= :start "
+                    f"AND COALESCE(timestamp, CURRENT_TIMESTAMP) < :end"
+                ), {"start": f"{month} 00:00:00", "end": f"{next_month(month)} 00:00:00"})).rowcount
+        if exists:
+            await conn.execute(text(f"DROP TABLE {UNPARTITIONED}"))
+        await _rebuild_view(conn, wanted)
+        state.update(mode="sharded", months=set(wanted))
+    logger.info(f"audit_logs partitioned by month: {len(wanted)} partitions, {moved} rows moved")
+    return moved
+
+
+def _months_ahead(current: date) -> date:
+    month = current
+    for _ in range(AUDIT_PARTITIONS_AHEAD):
+        month = next_month(month)
+    return month
+
+
+async def _keep_ledger_stubs(conn: AsyncConnection, names: List[str]):
+    """
+    Copy the ledger hashes still needed out of partitions about to be dropped
+
+    That is every dropped row from the block of the oldest row kept
+    onwards, plus any block not checkpointed yet, whose chain is verified
+    by walking it from the last checkpoint.
+    """
+    from audit_ledger import CHECKPOINT_INTERVAL, latest_checkpoint
+
+    oldest_kept = await conn.scalar(select(func.min(AuditLog.__table__.c.seq)))
+    latest = await latest_checkpoint(conn)
+    first_block = latest["block"] + 1 if latest else 0
+    if oldest_kept is not None:
+        first_block = min(first_block, (oldest_kept - 1) // CHECKPOINT_INTERVAL)
+    for name in names:
+        dropped = table(name, column("seq"), column("audit_hash"), column("chain_hash"))
+        await conn.execute(insert(AuditLedgerStub.__table__).from_select(
+            ["seq", "audit_hash", "chain_hash"],
+            select(dropped.c.seq, dropped.c.audit_hash, dropped.c.chain_hash)
+            .where(dropped.c.seq > first_block * CHECKPOINT_INTERVAL),
+        ))
+
+
+async def apply_retention(conn: AsyncConnection, now: datetime = None,
+                          retention_days: int = DATA_RETENTION_DAYS) -> List[str]:
+    """Drop monthly partitions entirely older than the retention window; returns their names"""
+    state = await layout(conn, refresh=True)
+    if state["mode"] == "table" or retention_days <= 0:
+        return []
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    expired = [month for month in sorted(state["months"])
+               if datetime.combine(next_month(month), datetime.min.time()) <= cutoff]
+    if not expired:
+        return []
+
+    # Take every expired month out of audit_logs first, so the ones kept are what's left
+    names = [partition_name(month) for month in expired]
+    if state["mode"] == "partitioned":
+        for name in names:
+            await conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+    else:
+        await _rebuild_view(conn, state["months"] - set(expired))
+    await _keep_ledger_stubs(conn, names)
+    for name in names:
+        await conn.execute(text(f"DROP TABLE {name}"))
+    state["months"] -= set(expired)
+    logger.info(f"Audit retention ({retention_days} days) dropped {', '.join(names)}")
+    return names
+
+
+async def maintain_partitions(engine: AsyncEngine, now: datetime = None) -> List[str]:
+    """Create the coming months' partitions and drop expired ones"""
+    now = now or datetime.utcnow()
+    current = month_start(now)
+    async with engine.begin() as conn:
+        await ensure_partitions(conn, months_between(current, _months_ahead(current)))
+    async with engine.begin() as conn:
+        return await apply_retention(conn, now)
+
+
+async def run_partition_maintenance(engine: AsyncEngine, interval: float = MAINTENANCE_INTERVAL):
+    """Background task: maintain_partitions every interval seconds"""
+    while True:
+        try:
+            await maintain_partitions(engine)
+        except Exception as e:
+            logger.error(f"Audit partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def timestamp_filter(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """WHERE clause on audit_logs.timestamp; lets the database skip other months"""
+    audit_logs = AuditLog.__table__
+    clauses = []
+    if since is not None:
+        clauses.append(audit_logs.c.timestamp >= since)
+    if until is not None:
+        clauses.append(audit_logs.c.timestamp < until)
+    return and_(True, *clauses)
@@ -0,0 +1,512 @@
+"""
+Application-side audit pipeline.
+
+Writes no longer pay for auditing inline. record() appends the event to a
+local spool file and puts it on a bounded in-memory queue; a background
+task drains the queue and writes whatever has accumulated as one batched
+INSERT in one transaction, so batches grow by themselves under load. Each batch is
+chained onto the audit ledger (audit_ledger.py) as it is inserted.
+
+The spool is a series of JSON-lines segments, and a segment is deleted
+once every event in it has been committed. Whatever is left on disk after
+a crash is replayed by the next start(); log_id is unique and the ledger
+skips ids that already exist, so replaying is idempotent. When the queue is full
+(a burst, or the database is down) events are only spooled, and their
+segment is replayed from disk once the queue drains, so record() never
+blocks and never drops an event. Spool writes go to the page cache, which
+survives a process crash; segments are fsynced when a flush fails so a
+backlog also survives losing the machine. Segment names carry the process
+id and open segments are flock()ed, so uvicorn workers can share a spool
+directory and start() only replays segments no live process holds.
+
+A batch that still fails after AUDIT_MAX_ATTEMPTS tries (a row the
+database rejects, or a long outage) is appended to the process's
+dead-letter-<pid>.jsonl in the spool directory and the writer moves on.
+Dead-letter files are not replayed automatically; once the cause is
+fixed, rename one to audit-replay-<n>.jsonl and the next start()
+replays it.
+
+install_session_auditing() audits ORM inserts, updates and deletes on
+AUDITED_MODELS: they are collected at flush time and recorded only after
+the transaction commits; writes inside a savepoint that rolls back are
+dropped.
+
+On PostgreSQL the init.sql row triggers on users, entities and cases stay
+in place for everything else (raw SQL, the asyncpg migration, tables
+without an audited model). They write to audit_trigger_events, which
+start() drains into the ledger every AUDIT_TRIGGER_DRAIN_SECONDS, each
+batch deleted and chained in one transaction. ORM flushes set
+zra.orm_audited to the audited tables for the flush, and the trigger skips
+those, so no write is recorded twice.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from audit_ledger import append_entries, event_hash
+from direct_db_setup import Entity, User
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker per spool dir
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_SPOOL_DIR = Path(os.getenv("AUDIT_SPOOL_DIR", str(Path(__file__).parent / "audit_spool")))
+AUDIT_SEGMENT_EVENTS = 10000  # rotate the active spool segment after this many events
+AUDIT_MAX_ATTEMPTS = int(os.getenv("AUDIT_MAX_ATTEMPTS", "10"))
+AUDIT_TRIGGER_DRAIN_SECONDS = float(os.getenv("AUDIT_TRIGGER_DRAIN_SECONDS", "1"))
+MAX_RETRY_DELAY = 5.0
+
+AUDITED_MODELS = (User, Entity)
+REDACTED_COLUMNS = frozenset({"hashed_password"})
+ORM_AUDITED_TABLES = ",".join(model.__tablename__ for model in AUDITED_MODELS)
+# Rows the init.sql triggers queued, oldest first; SKIP LOCKED lets workers drain side by side
+DRAIN_TRIGGER_EVENTS = text("""
+    DELETE FROM audit_trigger_events
+    WHERE id IN (SELECT id FROM audit_trigger_events ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED)
+    RETURNING id, event_type, entity_id, operation, details, timestamp
+""")
+AUDIT_COLUMNS = ("log_id", "user_id", "event_type", "entity_id", "operation", "details", "audit_hash", "timestamp")
+
+
+def make_event(event_type: str, operation: str, entity_id=None, user_id: int = None,
+               details: dict = None, timestamp: datetime = None) -> dict:
+    """
+    Build an audit event with a unique log_id and its SHA-256 audit_hash
+
+    Args:
+        event_type: Table name for data changes, or e.g. login/data_access
+        operation: INSERT/UPDATE/DELETE, or create/read/update/delete
+        details: JSON-serializable payload
+    """
+    timestamp = timestamp or datetime.utcnow()
+    event = {
+        # The time prefix tells readers which monthly audit_logs partition to look in
+        "log_id": f"AUDIT-{timestamp:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:24]}",
+        "user_id": user_id,
+        "event_type": event_type,
+        "entity_id": None if entity_id is None else str(entity_id),
+        "operation": operation,
+        "details": details,
+        "timestamp": timestamp.isoformat(),
+    }
+    event["audit_hash"] = event_hash(event)
+    return event
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _row(event: dict) -> dict:
+    row = {column: event.get(column) for column in AUDIT_COLUMNS}
+    row["timestamp"] = datetime.fromisoformat(event["timestamp"])
+    return row
+
+
+def _held_by_live_process(path: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return True  # already replayed and removed by another worker
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    """One spool file and how many of its events are written and committed"""
+
+    __slots__ = ("path", "fd", "written", "committed", "closed", "overflow")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.written = 0
+        self.committed = 0
+        self.closed = False
+        self.overflow = False  # some events never made it to the queue
+
+    def close(self):
+        if not self.closed:
+            os.close(self.fd)
+            self.closed = True
+
+
+class AuditWriter:
+    """Bounded queue of audit events flushed to audit_logs in the background"""
+
+    def __init__(self, engine: AsyncEngine, spool_dir: Path = AUDIT_SPOOL_DIR,
+                 queue_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 segment_events: int = AUDIT_SEGMENT_EVENTS, max_attempts: int = AUDIT_MAX_ATTEMPTS):
+        self.engine = engine
+        self.spool_dir = Path(spool_dir)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.segment_events = segment_events
+        self.max_attempts = max_attempts
+        self.stats = {"recorded": 0, "inserted": 0, "batches": 0, "spooled_only": 0, "replayed": 0, "errors": 0,
+                      "dead_lettered": 0, "drained": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._segments: Dict[int, _Segment] = {}
+        self._active: Optional[_Segment] = None
+        self._next_segment: Optional[int] = None
+
+    def record(self, event: dict):
+        """Spool and enqueue an event; safe to call from any thread, never blocks"""
+        line = (_dumps(event) + "\n").encode()
+        with self._lock:
+            segment = self._active_segment()
+            os.write(segment.fd, line)
+            segment.written += 1
+            if segment.written >= self.segment_events:
+                segment.close()
+                self._active = None
+        self.stats["recorded"] += 1
+
+        if self._loop is None:
+            segment.overflow = True  # replayed from the spool by start()
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._enqueue(segment, event)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, segment, event)
+
+    def _enqueue(self, segment: _Segment, event: dict):
+        try:
+            self._queue.put_nowait((segment, event))
+        except asyncio.QueueFull:
+            segment.overflow = True
+            self.stats["spooled_only"] += 1
+
+    def _active_segment(self) -> _Segment:
+        if self._active is None:
+            pid = os.getpid()
+            if self._next_segment is None:
+                existing = [int(p.stem.rsplit("-", 1)[1]) for p in self.spool_dir.glob(f"audit-{pid}-*.jsonl")]
+                self._next_segment = max(existing, default=-1) + 1
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            number = self._next_segment
+            self._next_segment += 1
+            self._active = self._segments[number] = _Segment(self.spool_dir / f"audit-{pid}-{number:08d}.jsonl")
+        return self._active
+
+    def _close_active(self):
+        with self._lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+
+    async def start(self):
+        """Replay spooled events left by a previous run, then start flushing"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._close_active()
+        self._segments.clear()
+        for path in sorted(self.spool_dir.glob("audit-*.jsonl")):
+            if not _held_by_live_process(path):
+                await self._replay(path)
+
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        if self.engine.dialect.name == "postgresql":
+            self._drain_task = asyncio.create_task(self._drain())
+        logger.info(f"Audit writer started (queue {self.queue_size}, batches of {self.batch_size})")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flush what is queued; anything left over stays in the spool for the next start()"""
+        if self._task is None:
+            return
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Audit writer stopped with {self._queue.qsize()} events left in the spool")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._close_active()
+        await self._retire()
+        self._loop = None
+        logger.info(f"Audit writer stopped: {self.stats}")
+
+    async def _run(self):
+        delay = 0.1
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            attempts = 0
+            while True:
+                try:
+                    await self._insert(event for _, event in batch)
+                    break
+                except Exception as e:
+                    attempts += 1
+                    self.stats["errors"] += 1
+                    await asyncio.to_thread(self._fsync_spool)
+                    if attempts >= self.max_attempts:
+                        path = await asyncio.to_thread(self._dead_letter, [event for _, event in batch])
+                        logger.error(f"Audit flush of {len(batch)} events failed {attempts} times, "
+                                     f"moved them to {path}: {e}")
+                        break
+                    logger.error(f"Audit flush of {len(batch)} events failed, retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_RETRY_DELAY)
+            delay = 0.1
+
+            for segment, _ in batch:
+                segment.committed += 1
+                self._queue.task_done()
+            self.stats["batches"] += 1
+            if self._queue.empty():
+                self._close_active()  # idle: let the segment be retired
+            await self._retire()
+
+    async def _insert(self, events: Iterable[dict]) -> int:
+        rows = [_row(event) for event in events]
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            async with self.engine.begin() as conn:
+                await append_entries(conn, chunk)
+        self.stats["inserted"] += len(rows)
+        return len(rows)
+
+    async def drain_trigger_events(self) -> int:
+        """Move up to batch_size rows the init.sql triggers queued into the ledger"""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(DRAIN_TRIGGER_EVENTS, {"limit": self.batch_size})
+            rows = sorted(result.mappings(), key=lambda r: r["id"])
+            events = [
+                make_event(r["event_type"], r["operation"], entity_id=r["entity_id"],
+                           details=json.loads(r["details"]) if isinstance(r["details"], str) else r["details"],
+                           timestamp=r["timestamp"])
+                for r in rows
+            ]
+            if events:
+                await append_entries(conn, [_row(event) for event in events])
+        self.stats["drained"] += len(events)
+        return len(events)
+
+    async def _drain(self):
+        while True:
+            try:
+                while await self.drain_trigger_events() >= self.batch_size:
+                    pass
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Draining audit_trigger_events failed: {e}")
+            await asyncio.sleep(AUDIT_TRIGGER_DRAIN_SECONDS)
+
+    async def _retire(self):
+        """Delete closed segments that are fully committed; replay the ones that overflowed"""
+        for number, segment in list(self._segments.items()):
+            if not segment.closed:
+                continue
+            if segment.overflow:
+                await self._replay(segment.path)
+            elif segment.committed >= segment.written:
+                segment.path.unlink(missing_ok=True)
+            else:
+                continue
+            del self._segments[number]
+
+    async def _replay(self, path: Path):
+        events = []
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return  # another worker got to it first
+        with f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping torn audit spool line in {path.name}")
+        if events:
+            await self._insert(events)
+            self.stats["replayed"] += len(events)
+        path.unlink(missing_ok=True)
+
+    def _dead_letter(self, events: Iterable[dict]) -> Path:
+        path = self.spool_dir / f"dead-letter-{os.getpid()}.jsonl"
+        lines = [(_dumps(event) + "\n").encode() for event in events]
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, b"".join(lines))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.stats["dead_lettered"] += len(lines)
+        return path
+
+    def _fsync_spool(self):
+        with self._lock:
+            for segment in self._segments.values():
+                if not segment.closed:
+                    os.fsync(segment.fd)
+
+
+def change_event(obj, operation: str, user_id: int = None) -> dict:
+    """Audit event for an ORM insert, update or delete, like the old row trigger"""
+    state = inspect(obj)
+    if operation == "UPDATE":
+        changes = {}
+        for attr in state.mapper.column_attrs:
+            history = state.attrs[attr.key].history
+            if not history.has_changes():
+                continue
+            if attr.key in REDACTED_COLUMNS:
+                changes[attr.key] = "[redacted]"
+            else:
+                changes[attr.key] = {
+                    "old": _jsonable(history.deleted[0]) if history.deleted else None,
+                    "new": _jsonable(history.added[0]) if history.added else None,
+                }
+        details = {"changes": changes}
+    else:
+        # state.dict holds what is loaded; reading it never triggers a lazy load
+        values = {
+            attr.key: _jsonable(state.dict.get(attr.key))
+            for attr in state.mapper.column_attrs if attr.key not in REDACTED_COLUMNS
+        }
+        details = {"new": values} if operation == "INSERT" else {"old": values}
+    # Inserted rows get their identity only after the flush completes; their key is already set
+    key = state.identity or state.mapper.primary_key_from_instance(obj)
+    return make_event(obj.__tablename__, operation, entity_id=key[0] if len(key) == 1 else ",".join(map(str, key)),
+                      user_id=user_id, details=details)
+
+
+def _set_orm_audited(session, tables: str) -> bool:
+    """Tell the PostgreSQL row triggers which tables this transaction audits itself"""
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return False
+    connection.execute(text("SELECT set_config('zra.orm_audited', :tables, true)"), {"tables": tables})
+    session.info["orm_audited"] = bool(tables)
+    return True
+
+
+def install_session_auditing(writer: AuditWriter, session_class=Session):
+    """
+    Audit ORM writes on AUDITED_MODELS for every session of session_class
+
+    Applies to AsyncSession too, which runs on a sync Session. The acting
+    user is taken from session.info["user_id"] when a handler sets it.
+    """
+
+    @event.listens_for(session_class, "before_flush")
+    def _mark_orm_audited(session, flush_context, instances):
+        if any(isinstance(obj, AUDITED_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+            _set_orm_audited(session, ORM_AUDITED_TABLES)
+
+    @event.listens_for(session_class, "after_flush_postexec")
+    def _unmark_orm_audited(session, flush_context):
+        if session.info.pop("orm_audited", False):
+            _set_orm_audited(session, "")
+
+    @event.listens_for(session_class, "after_flush")
+    def _collect(session, flush_context):
+        user_id = session.info.get("user_id")
+        pending = session.info.setdefault("audit_events", [])
+        for operation, objects in (("INSERT", session.new), ("UPDATE", session.dirty), ("DELETE", session.deleted)):
+            for obj in objects:
+                if not isinstance(obj, AUDITED_MODELS):
+                    continue
+                if operation == "UPDATE" and not session.is_modified(obj, include_collections=False):
+                    continue
+                pending.append(change_event(obj, operation, user_id))
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _collect_bulk(orm_execute_state):
+        mapper = orm_execute_state.bind_mapper
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if mapper is None or not issubclass(mapper.class_, AUDITED_MODELS):
+            return
+        statement = orm_execute_state.statement
+        session = orm_execute_state.session
+        compiled = statement.compile()
+        details = {"statement": str(compiled), "params": {k: _jsonable(v) for k, v in compiled.params.items()}}
+        operation = "UPDATE" if orm_execute_state.is_update else "DELETE"
+        session.info.setdefault("audit_events", []).append(
+            make_event(mapper.local_table.name, operation, user_id=session.info.get("user_id"), details=details)
+        )
+        if not _set_orm_audited(session, ORM_AUDITED_TABLES):
+            return None
+        try:
+            return orm_execute_state.invoke_statement()
+        finally:
+            _set_orm_audited(session, "")
+
+    @event.listens_for(session_class, "after_commit")
+    def _record(session):
+        session.info.pop("audit_marks", None)
+        for audit_event in session.info.pop("audit_events", ()):
+            writer.record(audit_event)
+
+    @event.listens_for(session_class, "after_transaction_create")
+    def _mark_savepoint(session, transaction):
+        if transaction.nested:
+            marks = session.info.setdefault("audit_marks", {})
+            marks[transaction] = len(session.info.get("audit_events", ()))
+
+    # after_rollback cannot tell a savepoint from the outer transaction; a
+    # savepoint rollback drops just the events collected since it began
+    @event.listens_for(session_class, "after_soft_rollback")
+    def _discard(session, previous_transaction):
+        mark = session.info.get("audit_marks", {}).pop(previous_transaction, None)
+        if previous_transaction.nested and mark is not None:
+            del session.info.get("audit_events", [])[mark:]
+        else:
+            session.info.pop("audit_events", None)
+            session.info.pop("audit_marks", None)
@@ -1,6 +1,7 @@
 import os
 import sys
-import sqlite3
+
+from db_profile import connect
 
 def check_database():
     db_path = os.path.abspath('zra.db')
@@ -11,7 +12,7 @@ def check_database():
         return False
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path, readonly=True)
         cursor = conn.cursor()
         
         # Check if tables exist
@@ -0,0 +1,173 @@
+"""
+Connection profile applied to every database engine and script connection.
+
+SQLite connections are switched to WAL (readers no longer block the writer
+and vice versa), synchronous=NORMAL (fsync at checkpoints instead of every
+commit; still safe in WAL mode), a memory-mapped read window, a larger
+page cache and a busy timeout so lock contention waits instead of failing
+with "database is locked".
+
+Engines get a sized connection pool from DATABASE_POOL_MIN/MAX, and
+create_engines() also returns a separate read-only engine whose
+connections have query_only set, so read traffic gets its own pool and can
+never take the write lock. create_async_engine() builds the asyncio
+equivalent (aiosqlite for SQLite, asyncpg for PostgreSQL) with the same
+profile.
+"""
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Tuple, Union
+
+from sqlalchemy import create_engine as sa_create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine as sa_create_async_engine
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+POOL_SIZE = int(os.getenv("DATABASE_POOL_MIN", "5"))
+POOL_MAX = int(os.getenv("DATABASE_POOL_MAX", "20"))
+POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT_SECONDS", "30"))
+POOL_RECYCLE = int(os.getenv("DATABASE_MAX_LIFETIME_SECONDS", "300"))
+READER_POOL_SIZE = int(os.getenv("DATABASE_READER_POOL_SIZE", "10"))
+
+# Sync driver names -> asyncio drivers
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def sqlite_pragmas(readonly: bool = False) -> Tuple[str, ...]:
+    pragmas = (
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    )
+    if readonly:
+        # journal_mode is stored in the database file; a writer has already set it
+        return pragmas + ("PRAGMA query_only=ON",)
+    return ("PRAGMA journal_mode=WAL",) + pragmas
+
+
+def apply_sqlite_pragmas(dbapi_connection, readonly: bool = False):
+    """Apply the profile to a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas(readonly):
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def connect(db_path: Union[str, Path], readonly: bool = False, create: bool = True, **kwargs) -> sqlite3.Connection:
+    """
+    sqlite3.connect with the profile applied, for scripts
+
+    Args:
+        db_path: Database file
+        readonly: Open with mode=ro and query_only
+        create: Create the file if it does not exist (ignored when readonly)
+    """
+    mode = "ro" if readonly else ("rwc" if create else "rw")
+    kwargs.setdefault("timeout", SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn = sqlite3.connect(f"file:{db_path}?mode={mode}", uri=True, **kwargs)
+    apply_sqlite_pragmas(conn, readonly)
+    return conn
+
+
+def create_engine(url: str, readonly: bool = False, pool_size: int = None, **kwargs) -> Engine:
+    """
+    SQLAlchemy create_engine with the profile applied
+
+    Args:
+        url: Database URL
+        readonly: Read-only engine (SQLite: mode=ro and query_only)
+        pool_size: Pooled connections; defaults to DATABASE_POOL_MIN, or
+            DATABASE_READER_POOL_SIZE for read-only engines
+    """
+    sa_url = make_url(url)
+    is_sqlite = sa_url.get_backend_name() == "sqlite"
+    if is_sqlite and sa_url.database in (None, "", ":memory:"):
+        return sa_create_engine(url, **kwargs)  # single in-memory connection, nothing to pool
+
+    if pool_size is None:
+        pool_size = READER_POOL_SIZE if readonly else POOL_SIZE
+    kwargs.setdefault("pool_size", pool_size)
+    kwargs.setdefault("max_overflow", max(0, POOL_MAX - pool_size))
+    kwargs.setdefault("pool_timeout", POOL_TIMEOUT)
+    if not is_sqlite:
+        kwargs.setdefault("pool_pre_ping", True)
+        kwargs.setdefault("pool_recycle", POOL_RECYCLE)
+        return sa_create_engine(url, **kwargs)
+
+    connect_args = kwargs.pop("connect_args", {})
+    connect_args.setdefault("check_same_thread", False)
+    connect_args.setdefault("timeout", SQLITE_BUSY_TIMEOUT_MS / 1000)
+    if readonly:
+        path = Path(sa_url.database).resolve().as_posix()
+        sa_url = sa_url.set(database=f"file:{path}", query={"mode": "ro", "uri": "true"})
+    engine = sa_create_engine(sa_url, connect_args=connect_args, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _apply_profile(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, readonly)
+
+    return engine
+
+
+def create_engines(url: str, **kwargs) -> Tuple[Engine, Engine]:
+    """Writer engine and read-only reader engine for url, each with its own pool"""
+    writer = create_engine(url, **kwargs)
+    reader = create_engine(url, readonly=True, **kwargs)
+    logger.info(
+        f"Database engines ready: writer pool {writer.pool.size()}, reader pool {reader.pool.size()}"
+    )
+    return writer, reader
+
+
+def create_async_engine(url: str, pool_size: int = None, **kwargs) -> AsyncEngine:
+    """
+    SQLAlchemy create_async_engine with the profile applied
+
+    Args:
+        url: Database URL; a sync sqlite:// or postgresql:// URL is switched
+            to the aiosqlite or asyncpg driver
+        pool_size: Pooled connections; defaults to DATABASE_POOL_MIN
+    """
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    if backend in ASYNC_DRIVERS and sa_url.drivername in (backend, f"{backend}+psycopg2", f"{backend}+pysqlite"):
+        sa_url = sa_url.set(drivername=ASYNC_DRIVERS[backend])
+    is_sqlite = backend == "sqlite"
+    if is_sqlite and sa_url.database in (None, "", ":memory:"):
+        return sa_create_async_engine(sa_url, **kwargs)
+
+    if pool_size is None:
+        pool_size = POOL_SIZE
+    kwargs.setdefault("pool_size", pool_size)
+    kwargs.setdefault("max_overflow", max(0, POOL_MAX - pool_size))
+    kwargs.setdefault("pool_timeout", POOL_TIMEOUT)
+    if not is_sqlite:
+        kwargs.setdefault("pool_pre_ping", True)
+        kwargs.setdefault("pool_recycle", POOL_RECYCLE)
+        return sa_create_async_engine(sa_url, **kwargs)
+
+    connect_args = kwargs.pop("connect_args", {})
+    connect_args.setdefault("timeout", SQLITE_BUSY_TIMEOUT_MS / 1000)
+    engine = sa_create_async_engine(sa_url, connect_args=connect_args, **kwargs)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_profile(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection)
+
+    return engine
@@ -5,17 +5,20 @@ This script explicitly defines all models and creates the database tables.
 import os
 import sys
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, JSON, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
+from db_profile import create_engines
+
 # Set up the database path
 DB_PATH = os.path.abspath('zra.db')
 DB_URL = f"sqlite:///{DB_PATH.replace(os.sep, '/')}"
 
-# Create the SQLAlchemy engine and session
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
+# Create the SQLAlchemy engines (WAL, mmap, pooled writer + read-only reader) and sessions
+engine, reader_engine = create_engines(DB_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine)
 Base = declarative_base()
 
 # Define all models explicitly
@@ -68,10 +71,8 @@ class Entity(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationships
-    cases = relationship("Case", back_populates="entity")
-    obligations = relationship("Obligation", back_populates="entity")
-    risk_assessments = relationship("RiskAssessment", back_populates="entity")
+    # Relationships to Case, Obligation and RiskAssessment go here once those
+    # models are defined; naming undefined classes breaks mapper configuration
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -86,10 +87,46 @@ class AuditLog(Base):
     audit_hash = Column(String(64), nullable=False)  # SHA-256 hash for integrity
     blockchain_tx_hash = Column(String(66))  # Blockchain transaction hash
     timestamp = Column(DateTime, default=datetime.utcnow)
+    seq = Column(BigInteger, unique=True, index=True)  # Position in the audit ledger
+    chain_hash = Column(String(64))  # SHA-256(previous chain_hash + audit_hash)
     
     # Relationships
     user = relationship("User", back_populates="audit_logs")
 
+class AuditLedgerHead(Base):
+    __tablename__ = "audit_ledger_head"
+    
+    id = Column(Integer, primary_key=True)  # single row, id 1
+    seq = Column(BigInteger, nullable=False)
+    chain_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class AuditCheckpoint(Base):
+    __tablename__ = "audit_checkpoints"
+    
+    block = Column(BigInteger, primary_key=True, autoincrement=False)
+    last_seq = Column(BigInteger, nullable=False)
+    merkle_root = Column(String(64), nullable=False)  # Root over the block's chain hashes
+    ledger_root = Column(String(64), nullable=False)  # Root over every block so far
+    chain_hash = Column(String(64), nullable=False)  # Chain hash at last_seq
+    blockchain_tx_hash = Column(String(66))  # Where ledger_root was anchored, if it was
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AuditMerkleNode(Base):
+    __tablename__ = "audit_merkle_nodes"
+    
+    level = Column(Integer, primary_key=True, autoincrement=False)  # 0 = block roots
+    idx = Column(BigInteger, primary_key=True, autoincrement=False)
+    hash = Column(String(64), nullable=False)
+
+class AuditLedgerStub(Base):
+    __tablename__ = "audit_ledger_stubs"
+
+    # Hashes of rows dropped by retention whose block still has rows to verify
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)
+    audit_hash = Column(String(64), nullable=False)
+    chain_hash = Column(String(64), nullable=False)
+
 # Add other model classes as needed...
 
 def create_database():
@@ -100,6 +137,10 @@ def create_database():
     if os.path.exists(DB_PATH):
         try:
             os.remove(DB_PATH)
+            # A leftover WAL would otherwise be replayed into the new file
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(DB_PATH + suffix):
+                    os.remove(DB_PATH + suffix)
             print("Removed existing database file.")
         except Exception as e:
             print(f"Error removing existing database: {e}")
@@ -0,0 +1,155 @@
+"""
+Health and readiness checks served from memory.
+
+Dependency probes (Redis, database) run on a background schedule with a
+timeout, off the event loop. Their results are cached together with the
+pre-serialized response bodies, so /health and /ready only return bytes
+that already exist and load-balancer polling never reaches a backend.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+from fastapi import Response
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeResult(NamedTuple):
+    ok: bool
+    latency_ms: float
+    checked_at: str
+    error: Optional[str] = None
+
+
+class _Probe(NamedTuple):
+    check: Callable[[], bool]
+    critical: bool
+
+
+class HealthMonitor:
+    def __init__(self, version: str, interval: float = 5.0, timeout: float = 2.0):
+        """
+        Initialize the health monitor
+
+        Args:
+            version: Application version reported in the responses
+            interval: Seconds between probe rounds
+            timeout: Seconds before a single probe is reported as failed
+        """
+        self.version = version
+        self.interval = interval
+        self.timeout = timeout
+        # Readiness fails if probes have not completed for this long
+        self.stale_after = max(3 * interval, interval + timeout)
+        self._probes: Dict[str, _Probe] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.results: Dict[str, ProbeResult] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_round = 0.0
+        self._ready = False
+        self._liveness_body = b""
+        self._readiness_body = b""
+        self._render()
+
+    def add_probe(self, name: str, check: Callable[[], bool], critical: bool = True):
+        """Register a blocking check; critical probes gate readiness"""
+        self._probes[name] = _Probe(check, critical)
+
+    async def _run_probe(self, name: str, probe: _Probe) -> ProbeResult:
+        checked_at = datetime.utcnow().isoformat()
+        # A probe still stuck in its thread from a previous round is not restarted
+        future = self._inflight.get(name)
+        if future is None or future.done():
+            future = self._inflight[name] = asyncio.ensure_future(asyncio.to_thread(probe.check))
+
+        start = time.perf_counter()
+        try:
+            ok = bool(await asyncio.wait_for(asyncio.shield(future), self.timeout))
+            error = None if ok else "probe returned false"
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, str(e)
+        return ProbeResult(ok, round((time.perf_counter() - start) * 1000, 2), checked_at, error)
+
+    async def run_once(self):
+        """Run every probe concurrently and refresh the cached responses"""
+        names = list(self._probes)
+        results = await asyncio.gather(*(self._run_probe(n, self._probes[n]) for n in names))
+        self.results = dict(zip(names, results))
+        self._last_round = time.monotonic()
+        self._render()
+
+    def _render(self):
+        services = {
+            name: "connected" if result.ok else "disconnected"
+            for name, result in self.results.items()
+        }
+        checks = {name: result._asdict() for name, result in self.results.items()}
+        self._ready = bool(self.results) and all(
+            self.results[name].ok for name, probe in self._probes.items() if probe.critical
+        )
+        timestamp = datetime.utcnow().isoformat()
+        self._liveness_body = json.dumps({
+            "status": "healthy",
+            "timestamp": timestamp,
+            "version": self.version,
+            "services": services,
+        }).encode()
+        self._readiness_body = json.dumps({
+            "status": "ready" if self._ready else "not_ready",
+            "timestamp": timestamp,
+            "checks": checks,
+        }).encode()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start probing in the background (call from the lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready and time.monotonic() - self._last_round < self.stale_after
+
+    def liveness_response(self) -> Response:
+        """The process is up; dependency status is informational"""
+        return Response(content=self._liveness_body, media_type="application/json")
+
+    def readiness_response(self) -> Response:
+        """200 when every critical dependency passed its last, recent probe"""
+        return Response(
+            content=self._readiness_body,
+            media_type="application/json",
+            status_code=200 if self.ready else 503,
+        )
+
+
+def sqlalchemy_probe(engine) -> Callable[[], bool]:
+    """Blocking database check for HealthMonitor.add_probe"""
+    def check() -> bool:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    return check
@@ -4,52 +4,65 @@
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
 
--- Create audit log function
+-- Audit logging is done by the application (audit_writer.py): ORM writes on
+-- users and entities are recorded after commit and batched into audit_logs.
+-- The row triggers stay for every other writer (raw SQL, the asyncpg
+-- migration, cases, which has no audited model yet), but only append to the
+-- unindexed audit_trigger_events inbox; the audit writer drains it into the
+-- hash-chained ledger. ORM flushes set zra.orm_audited to the tables they
+-- already audit, and the trigger skips those rows.
+CREATE TABLE IF NOT EXISTS audit_trigger_events (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    entity_id VARCHAR(50),
+    operation VARCHAR(20) NOT NULL,
+    details JSONB,
+    timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
 CREATE OR REPLACE FUNCTION audit_trigger_function()
 RETURNS TRIGGER AS $$
 BEGIN
-    INSERT INTO audit_logs (
-        log_id,
-        event_type,
-        entity_id,
-        operation,
-        details,
-        audit_hash,
-        timestamp
-    ) VALUES (
-        'AUDIT-' || extract(epoch from now())::bigint,
+    IF TG_TABLE_NAME = ANY(string_to_array(current_setting('zra.orm_audited', true), ',')) THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO audit_trigger_events (event_type, entity_id, operation, details)
+    VALUES (
         TG_TABLE_NAME,
         COALESCE(NEW.id::text, OLD.id::text),
         TG_OP,
         jsonb_build_object(
-            'old', CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD) ELSE NULL END,
-            'new', CASE WHEN TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN to_jsonb(NEW) ELSE NULL END
-        ),
-        encode(digest(COALESCE(NEW::text, OLD::text), 'sha256'), 'hex'),
-        now()
+            'old', CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN to_jsonb(OLD) - 'hashed_password' END,
+            'new', CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN to_jsonb(NEW) - 'hashed_password' END
+        )
     );
-    RETURN COALESCE(NEW, OLD);
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Create audit triggers for critical tables
+DROP TRIGGER IF EXISTS users_audit_trigger ON users;
 CREATE TRIGGER users_audit_trigger
     AFTER INSERT OR UPDATE OR DELETE ON users
     FOR EACH ROW EXECUTE FUNCTION audit_trigger_function();
 
+DROP TRIGGER IF EXISTS entities_audit_trigger ON entities;
 CREATE TRIGGER entities_audit_trigger
     AFTER INSERT OR UPDATE OR DELETE ON entities
     FOR EACH ROW EXECUTE FUNCTION audit_trigger_function();
 
+DROP TRIGGER IF EXISTS cases_audit_trigger ON cases;
 CREATE TRIGGER cases_audit_trigger
     AFTER INSERT OR UPDATE OR DELETE ON cases
     FOR EACH ROW EXECUTE FUNCTION audit_trigger_function();
 
--- Create indexes for performance
-CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs(timestamp);
-CREATE INDEX IF NOT EXISTS idx_audit_logs_entity_id ON audit_logs(entity_id);
-CREATE INDEX IF NOT EXISTS idx_audit_logs_event_type ON audit_logs(event_type);
+-- audit_logs is partitioned by month on startup (audit_partitions.py), which
+-- creates its (entity_id, timestamp) and (user_id, timestamp) indexes on every
+-- partition; timestamp lookups are served by partition pruning instead.
+DROP INDEX IF EXISTS idx_audit_logs_timestamp;
+DROP INDEX IF EXISTS idx_audit_logs_event_type;
+DROP INDEX IF EXISTS idx_audit_logs_entity_id;
 
+-- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_entities_tin ON entities(tin);
 CREATE INDEX IF NOT EXISTS idx_entities_status ON entities(status);
 CREATE INDEX IF NOT EXISTS idx_entities_compliance_score ON entities(compliance_score);
@@ -62,24 +75,61 @@ CREATE INDEX IF NOT EXISTS idx_risk_assessments_entity_id ON risk_assessments(en
 CREATE INDEX IF NOT EXISTS idx_risk_assessments_risk_type ON risk_assessments(risk_type);
 CREATE INDEX IF NOT EXISTS idx_risk_assessments_created_at ON risk_assessments(created_at);
 
--- Create views for common queries
-CREATE OR REPLACE VIEW entity_compliance_summary AS
+-- Dashboard summaries are materialized views, refreshed concurrently by the
+-- application (summaries.py) when their source tables change and at least
+-- every SUMMARY_MAX_AGE seconds; summary_refreshes records when. Cases and
+-- obligations are counted in separate subqueries so the two joins no longer
+-- multiply each other's rows.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'entity_compliance_summary' AND relkind = 'v') THEN
+        DROP VIEW entity_compliance_summary;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'risk_summary' AND relkind = 'v') THEN
+        DROP VIEW risk_summary;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS summary_refreshes (
+    name VARCHAR(64) PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL
+);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS entity_compliance_summary AS
 SELECT 
     e.entity_id,
     e.name,
     e.type,
     e.compliance_score,
     e.risk_score,
-    COUNT(c.id) as total_cases,
-    COUNT(CASE WHEN c.status = 'active' THEN 1 END) as active_cases,
-    COUNT(o.id) as total_obligations,
-    COUNT(CASE WHEN o.status = 'pending' THEN 1 END) as pending_obligations
+    COALESCE(c.total_cases, 0) as total_cases,
+    COALESCE(c.active_cases, 0) as active_cases,
+    COALESCE(o.total_obligations, 0) as total_obligations,
+    COALESCE(o.pending_obligations, 0) as pending_obligations
 FROM entities e
-LEFT JOIN cases c ON e.id = c.entity_id
-LEFT JOIN obligations o ON e.id = o.entity_id
-GROUP BY e.id, e.entity_id, e.name, e.type, e.compliance_score, e.risk_score;
-
-CREATE OR REPLACE VIEW risk_summary AS
+LEFT JOIN (
+    SELECT entity_id, COUNT(*) as total_cases, COUNT(*) FILTER (WHERE status = 'active') as active_cases
+    FROM cases GROUP BY entity_id
+) c ON e.id = c.entity_id
+LEFT JOIN (
+    SELECT entity_id, COUNT(*) as total_obligations, COUNT(*) FILTER (WHERE status = 'pending') as pending_obligations
+    FROM obligations GROUP BY entity_id
+) o ON e.id = o.entity_id;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_entity_compliance_summary ON entity_compliance_summary(entity_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS compliance_overview AS
+SELECT 
+    1 as id,
+    COUNT(*) as total_entities,
+    AVG(compliance_score) as average_compliance_score,
+    AVG(risk_score) as average_risk_score,
+    COUNT(*) FILTER (WHERE risk_score >= 0.7) as high_risk_entities,
+    COALESCE(SUM(active_cases), 0) as active_cases,
+    COALESCE(SUM(pending_obligations), 0) as pending_obligations
+FROM entity_compliance_summary;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_compliance_overview ON compliance_overview(id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS risk_summary AS
 SELECT 
     ra.risk_type,
     COUNT(*) as total_assessments,
@@ -89,6 +139,7 @@ SELECT
 FROM risk_assessments ra
 WHERE ra.created_at >= CURRENT_DATE - INTERVAL '30 days'
 GROUP BY ra.risk_type;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_risk_summary ON risk_summary(risk_type);
 
 -- Insert sample data
 INSERT INTO users (username, email, hashed_password, full_name, role) VALUES
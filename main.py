@@ -4,25 +4,37 @@ Main application entry point
 """
 
 import uvicorn
-from datetime import datetime
 from fastapi import FastAPI, HTTPException, Request, Response, status, APIRouter, Form, Depends, APIRouter
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Mount
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, engine
+from async_db import async_engine, dispose_async_engine
+from audit_writer import AuditWriter, install_session_auditing
+from audit_ledger import router as audit_ledger_router
+from audit_partitions import partition_audit_logs, run_partition_maintenance
+from response_cache import install_cache_invalidation, response_cache
+from summaries import SummaryRefresher, install_summary_tracking, router as summaries_router
 from app.api.v1.api import api_router
 from app.api.v1.endpoints.admin_router import router as admin_router
 from app.core.redis_manager import redis_manager
-from app.core.rate_limiter import rate_limiter
+from rate_limiter import RateLimiter
+from redis_breaker import CircuitBreaker
+from redis_pool import PooledRedisManager
+from token_bucket import TokenBucketPreFilter
+from middleware import CacheControlMiddleware, RateLimitMiddleware, SelectiveGZipMiddleware
+from static_assets import PrecompressedStaticFiles
+from health import HealthMonitor, sqlalchemy_probe
+from templating import create_templates, is_production, warm_templates
+from tracing import setup_tracing, shutdown_tracing
+from metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, generate_metrics
 from app.core.openapi import configure_openapi, API_TITLE, API_DESCRIPTION, API_VERSION
 from app.core.request_validation import setup_request_validation
 from app.routers.dashboard import dashboard_router as dash_router
@@ -34,6 +46,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Dependency probes run in the background; /health and /ready serve cached results
+health_monitor = HealthMonitor(
+    API_VERSION,
+    interval=float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5")),
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2")),
+)
+health_monitor.add_probe("redis", redis_manager.ping, critical=False)
+
+# The request path (rate limiter, response cache) talks to Redis through bounded
+# connection pools: a burst waits for a free connection instead of opening more
+redis_pool = PooledRedisManager() if settings.REDIS_ENABLED else None
+request_redis = redis_pool or redis_manager
+
+# Requests stop calling Redis after consecutive failures and use local state
+# until a background ping succeeds (exponential backoff between pings)
+redis_breaker = CircuitBreaker(request_redis.ping)
+health_monitor.add_probe("database", sqlalchemy_probe(engine))
+
+# ORM writes on audited tables are recorded after commit and flushed in batches
+audit_writer = AuditWriter(async_engine)
+if os.getenv("AUDIT_LOG_ENABLED", "true").lower() == "true":
+    install_session_auditing(audit_writer)
+
+# Dashboard summaries are refreshed when committed writes touch their source tables
+# and their cached responses are invalidated by each refresh
+summary_refresher = SummaryRefresher(
+    async_engine,
+    on_refresh=lambda names: response_cache.invalidate(*(f"summary:{name}" for name in names)),
+)
+install_summary_tracking(summary_refresher)
+
+# Cached API responses are shared between workers through Redis and tagged
+# "table:<name>" for invalidation by committed writes
+if settings.REDIS_ENABLED:
+    response_cache.redis = request_redis
+    response_cache.breaker = redis_breaker
+install_cache_invalidation(response_cache)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -51,13 +101,38 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize database: {str(e)}")
         raise
 
+    # Compile every template before the first request in production
+    if is_production():
+        await asyncio.to_thread(warm_templates, templates)
+
+    # Monthly audit_logs partitions, created ahead and dropped after DATA_RETENTION_DAYS
+    partition_task = None
+    if os.getenv("AUDIT_PARTITIONING", "true").lower() == "true":
+        async with async_engine.begin() as conn:
+            await partition_audit_logs(conn)
+        partition_task = asyncio.create_task(run_partition_maintenance(async_engine))
+
     # Setup monitoring and other services
-    # setup_monitoring()  # Uncomment if you have monitoring setup
+    health_monitor.start()
+    await audit_writer.start()
+    summary_refresher.start()
+    rate_limiter.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down application...")
+    await health_monitor.stop()
+    await audit_writer.stop()
+    await summary_refresher.stop()
+    await rate_limiter.stop()
+    if redis_pool is not None:
+        redis_pool.close()
+        await redis_pool.aclose()
+    if partition_task is not None:
+        partition_task.cancel()
+    await dispose_async_engine()
+    shutdown_tracing()
 
 # Initialize FastAPI app with lifespan and OpenAPI configuration
 # Initialize templates with absolute path
@@ -70,23 +145,10 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, "app", "templates")
 # Ensure the templates directory exists
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 
-# Initialize templates with explicit auto_reload in development
-templates = Jinja2Templates(
-    directory=TEMPLATES_DIR,
-    auto_reload=True,  # Auto-reload templates in development
-    autoescape=True,
-)
-
-# Add template debugging information
-logger.info(f"\n{'='*80}")
-logger.info(f"Template Configuration:")
-logger.info(f"- BASE_DIR: {BASE_DIR}")
-logger.info(f"- TEMPLATES_DIR: {TEMPLATES_DIR}")
-logger.info(f"- Template directory exists: {os.path.exists(TEMPLATES_DIR)}")
-logger.info(f"- Files in template directory: {os.listdir(TEMPLATES_DIR) if os.path.exists(TEMPLATES_DIR) else 'Directory not found'}")
-logger.info(f"- Current working directory: {os.getcwd()}")
-logger.info(f"- Script directory: {os.path.dirname(os.path.abspath(__file__))}")
-logger.info(f"{'='*80}\n")
+# Initialize templates: auto_reload in development; in production no reload
+# checks plus an on-disk bytecode cache, warmed in the lifespan (templating.py)
+templates = create_templates(TEMPLATES_DIR)
+logger.debug(f"Templates directory: {TEMPLATES_DIR} (production mode: {is_production()})")
 
 
 # Add a route to check template existence
@@ -104,6 +166,9 @@ app = FastAPI(
 # Configure OpenAPI documentation
 app = configure_openapi(app)
 
+# Opt-in OpenTelemetry tracing (TRACING_ENABLED=true)
+setup_tracing(app, engine=engine, async_engine=async_engine)
+
 # Add middleware
 # Add CORS middleware
 app.add_middleware(
@@ -114,37 +179,31 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
-# Register rate limiter as a Starlette middleware via BaseHTTPMiddleware
-app.add_middleware(BaseHTTPMiddleware, dispatch=rate_limiter)
+# Rate limiting: per-worker token buckets in front of the shared Redis window.
+# Floods are rejected locally; admitted requests sync to Redis in batches.
+rate_limiter = TokenBucketPreFilter(
+    RateLimiter(request_redis, limit=int(os.getenv("RATE_LIMIT_PER_MINUTE", "120")), window=60, breaker=redis_breaker),
+    sync_every=int(os.getenv("RATE_LIMIT_SYNC_EVERY", "20")),
+    sync_interval_ms=int(os.getenv("RATE_LIMIT_SYNC_INTERVAL_MS", "250")),
+)
+app.add_middleware(RateLimitMiddleware, prefilter=rate_limiter)
 setup_request_validation(app)
 
-# Add GZip compression for responses > 1KB
-app.add_middleware(GZipMiddleware, minimum_size=1000)
-
-# Cache control middleware
-
-
-class CacheControlMiddleware(BaseHTTPMiddleware):
-    """Middleware to control caching behavior for different routes"""
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Don't cache API responses by default
-        if request.url.path.startswith("/api/"):
-            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-        # Cache static assets for 1 year
-        elif any(ext in request.url.path for ext in [".js", ".css", ".png", ".jpg", ".jpeg", ".gif", ".svg"]):
-            response.headers["Cache-Control"] = "public, max-age=31536000"
-
-        return response
-
+# Add GZip compression for responses > 1KB. Assets with pre-built .br/.gz
+# variants (scripts/build_assets.py) are skipped; precompressed_paths is
+# filled from the build manifests once the static directories are mounted.
+precompressed_paths = set()
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1000, exclude_paths=precompressed_paths)
 
+# Cache control middleware (pure ASGI: only rewrites response start headers)
 app.add_middleware(CacheControlMiddleware)
 
-# Include API routers
+# Request metrics (outermost, so latency covers the whole middleware stack)
+app.add_middleware(MetricsMiddleware)
+
+# Include API routers (the audit ledger routes first, so they back /security/audit/verify)
+app.include_router(audit_ledger_router)
+app.include_router(summaries_router)
 app.include_router(api_router, prefix="/api/v1")
 
 # Include admin routes with the /admin prefix
@@ -210,9 +269,6 @@ async def dashboard_list(request: Request):
     Dashboard list page that shows all available dashboards
     """
     try:
-        logger.info(f"Templates directory: {TEMPLATES_DIR}")
-        logger.info(f"Template exists: {os.path.exists(os.path.join(TEMPLATES_DIR, 'dashboard_list.html'))}")
-        
         # Update the dashboard links to point to the correct paths
         dashboards = [
             {
@@ -245,14 +301,7 @@ async def dashboard_list(request: Request):
             }
         ]
         
-        # Try to render the template
-        template_path = os.path.join(TEMPLATES_DIR, "dashboard_list.html")
-        logger.info(f"Attempting to render template at: {template_path}")
-        
-        if not os.path.exists(template_path):
-            logger.error(f"Template not found at: {template_path}")
-            raise HTTPException(status_code=500, detail=f"Template not found at: {template_path}")
-            
+        # A missing template raises TemplateNotFound, reported as a 500 below
         return templates.TemplateResponse(
             "dashboard_list.html",
             {
@@ -404,26 +453,32 @@ async def favicon():
 @app.get("/health", tags=["system"])
 async def health_check():
     """
-    Health check endpoint
+    Health check endpoint (liveness)
 
-    Returns the status of the application and its dependencies.
+    Returns the status of the application and the last probed status of its
+    dependencies. Served from memory; never touches Redis or the database.
     """
-    redis_status = "connected" if redis_manager.ping() else "disconnected"
+    return health_monitor.liveness_response()
 
-    return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": API_VERSION,
-        "services": {
-            "redis": redis_status,
-            "database": "connected"  # Add database health check if needed
-        }
-    }
+# Readiness endpoint
+@app.get("/ready", tags=["system"])
+async def readiness_check():
+    """
+    Readiness endpoint
+
+    503 until the database probe has passed recently. Served from memory.
+    """
+    return health_monitor.readiness_response()
+
+# Prometheus scrape endpoint (see prometheus.yml / zra_rules.yml)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=generate_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 # Mount static files at root with cache control headers
 
 
-class SPAStaticFiles(StaticFiles):
+class SPAStaticFiles(PrecompressedStaticFiles):
     """Static file server with SPA support"""
 
     async def get_response(self, path: str, scope):
@@ -437,9 +492,12 @@ class SPAStaticFiles(StaticFiles):
 
 
 # Mount static files (but not at root yet)
-static_files = StaticFiles(directory="static")
+static_files = PrecompressedStaticFiles(directory="static")
 app.mount("/static", static_files, name="static")
 
+# Templates link assets via {{ asset_url("css/style.css") }} to get the hashed name
+templates.env.globals["asset_url"] = lambda path: f"/static/{static_files.hashed_path(path)}"
+
 # Mount the dash directory for dashboard files
 try:
     dash_dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dash")
@@ -510,7 +568,7 @@ if os.path.exists(assets_dir):
     logger.info(f"Mounting /assets from {assets_dir}")
     app.mount(
         "/assets",
-        StaticFiles(directory=assets_dir),
+        PrecompressedStaticFiles(directory=assets_dir),
         name="assets"
     )
 else:
@@ -526,6 +584,13 @@ if os.path.exists(dashboard_dir):
 else:
     logger.warning(f"Dashboard directory not found at {dashboard_dir}")
 
+# Only the first mount at a path is reachable
+mounted = set()
+for route in app.routes:
+    if isinstance(route, Mount) and isinstance(route.app, PrecompressedStaticFiles) and route.path not in mounted:
+        mounted.add(route.path)
+        precompressed_paths.update(route.app.precompressed_urls(route.path))
+
 if __name__ == "__main__":
     # Enable debug mode for detailed error messages
     import os
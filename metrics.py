@@ -0,0 +1,135 @@
+"""
+Prometheus instrumentation for the ZRA application.
+
+Defines the metric families referenced by zra_rules.yml and a pure ASGI
+middleware that records request counts and latency per route template.
+
+Multiple uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the workers start. Each worker then writes its
+samples to mmap-backed files in that directory and /metrics merges them,
+so every scrape sees the totals of all workers rather than whichever
+worker happened to answer. Workers hold these files open, so the
+directory is wiped only before any worker starts, by
+``python -m scripts.prepare_metrics_dir`` (the Docker CMD runs it);
+importing this module merely creates the directory if it is missing.
+It is ignored when unset.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Unlabelled metrics open their mmap file as they are defined below
+if os.environ.get(MULTIPROC_DIR_ENV):
+    os.makedirs(os.environ[MULTIPROC_DIR_ENV], exist_ok=True)
+
+REQUESTS = Counter(
+    "zra_requests_total",
+    "HTTP requests processed",
+    ["method", "route", "status"],
+)
+
+REQUEST_DURATION = Histogram(
+    "zra_request_duration_seconds",
+    "HTTP request latency in seconds",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 2.5, 5.0, 10.0),
+)
+
+# Labelled so there is no series until a real score is published; an
+# unlabelled gauge would export 0 and keep LowComplianceScore firing
+COMPLIANCE_SCORE = Gauge(
+    "zra_compliance_score",
+    "Most recently computed average compliance score (0-1)",
+    ["scope"],
+    multiprocess_mode="mostrecent",
+)
+
+FRAUD_DETECTIONS = Counter(
+    "zra_fraud_detections_total",
+    "Fraud detections raised by the risk engine",
+    ["risk_level"],
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def record_fraud_detection(risk_level: str = "high"):
+    """Count one fraud detection (EntityRepository.update_scores, when an entity turns high risk)"""
+    FRAUD_DETECTIONS.labels(risk_level=risk_level).inc()
+
+
+def set_compliance_score(score: float, scope: str = "overall"):
+    """Publish the latest compliance score (SummaryRefresher, after refreshing compliance_overview)"""
+    COMPLIANCE_SCORE.labels(scope=scope).set(score)
+
+
+def generate_metrics() -> bytes:
+    """Render all metrics in the Prometheus text format"""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def route_template(scope: Scope, root_path: str = "") -> str:
+    """
+    Route label for a finished request.
+
+    Uses the matched route's path template (``/api/v1/tax/status/{tpin}``)
+    rather than the raw path so label cardinality stays bounded.
+    root_path is the value the scope had before routing.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", UNMATCHED_ROUTE)
+    # Static mounts extend root_path with the mount point
+    mount = scope.get("root_path", "")[len(root_path):]
+    if mount:
+        return f"{mount}/{{path}}"
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records zra_requests_total and zra_request_duration_seconds"""
+
+    def __init__(self, app: ASGIApp, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        status = 500
+        root_path = scope.get("root_path", "")
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = route_template(scope, root_path)
+            method = scope["method"]
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_DURATION.labels(method, route).observe(elapsed)
+
@@ -0,0 +1,113 @@
+"""
+Pure ASGI middleware for the request path.
+
+Unlike BaseHTTPMiddleware these do not spawn a task or re-stream the
+response body per request: they either answer directly or pass the ASGI
+call through, touching only the headers of ``http.response.start``.
+"""
+from typing import Collection, Tuple
+
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from token_bucket import TokenBucketPreFilter
+
+NO_STORE_HEADERS = (
+    ("Cache-Control", "no-store, no-cache, must-revalidate"),
+    ("Pragma", "no-cache"),
+    ("Expires", "0"),
+)
+
+
+class CacheControlMiddleware:
+    """
+    Middleware to control caching behavior for different routes
+
+    Static assets are not handled here: PrecompressedStaticFiles sets their
+    cache headers from the build manifest. API responses default to
+    no-store unless the route set its own Cache-Control.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def cache_headers(self, path: str) -> Tuple[Tuple[str, str], ...]:
+        # Don't cache API responses by default
+        if path.startswith("/api/"):
+            return NO_STORE_HEADERS
+        return ()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        overrides = self.cache_headers(scope["path"])
+        if not overrides:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # A route that set its own Cache-Control (response_cache.py) knows better
+                if "cache-control" not in headers:
+                    for name, value in overrides:
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves paths with pre-compressed content alone
+
+    exclude_paths holds exact request paths and is kept by reference, so it
+    can be filled in after the static directories are mounted.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9,
+                 exclude_paths: Collection[str] = ()):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
+
+
+class RateLimitMiddleware:
+    """Rejects over-limit clients with 429 before the request reaches the app"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        prefilter: TokenBucketPreFilter,
+        exempt_paths: Tuple[str, ...] = ("/health", "/ready", "/metrics"),
+    ):
+        self.app = app
+        self.prefilter = prefilter
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            return await self.app(scope, receive, send)
+
+        client = scope.get("client")
+        decision = await self.prefilter.acheck(client[0] if client else "unknown")
+        if decision.allowed:
+            return await self.app(scope, receive, send)
+
+        limiter = self.prefilter.limiter
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "error": "Too Many Requests",
+                "message": f"Rate limit exceeded. Maximum {limiter.limit} requests per {limiter.window} seconds allowed.",
+                "retry_after": decision.retry_after,
+            },
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+        await response(scope, receive, send)
@@ -1,239 +1,464 @@
 """
 Database Migration Script: MySQL to PostgreSQL
 This script migrates data from the MySQL schema (base/db/zra_db.sql) to PostgreSQL schema (init.sql)
+
+Each MySQL table is streamed through a server-side cursor in primary key
+order. Every chunk is COPYed into a temporary staging table and merged into
+the target tables with one set-based statement, in the same transaction that
+advances the table's watermark in migration_checkpoints. Tables run
+concurrently over a connection pool as soon as the tables they depend on are
+done, and a rerun resumes each table after its last committed chunk.
+
+Run with: python migrate_mysql_to_postgres.py [--restart] [--concurrency N]
 """
 
+import argparse
 import asyncio
 import asyncpg
+import pymysql
+import pymysql.cursors
+import time
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine, text
-import json
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, NamedTuple, Optional, Tuple
+from datetime import date, datetime
+
+# Rows fetched from MySQL and COPYed into PostgreSQL per round trip (and per checkpoint)
+CHUNK_SIZE = 5000
+# Table pipelines running at once; also the PostgreSQL pool size
+CONCURRENCY = 4
+
+
+class SourceTable(NamedTuple):
+    key: str
+    columns: List[str]
+    depends_on: Tuple[str, ...] = ()
+    key_type: type = int
+
+
+# MySQL tables read by the migration (base/db/zra_db.sql), streamed in primary key order
+SOURCE_TABLES = {
+    'taxpayers': SourceTable('TPIN', ['TPIN', 'TaxpayerType', 'RegistrationDate', 'Status', 'PrimaryEmail', 'PrimaryPhone'],
+                             key_type=str),
+    'individuals': SourceTable('IndividualID', ['IndividualID', 'TPIN', 'FirstName', 'LastName', 'email'], ('taxpayers',)),
+    # After individuals so business details win for a TPIN present in both
+    'biz_businesses': SourceTable('BusinessID', ['BusinessID', 'TPIN', 'BusinessName', 'Email'], ('individuals',)),
+    'taxreturns': SourceTable('ReturnID', ['ReturnID', 'TPIN', 'TaxPeriod', 'DueDate', 'Status'], ('taxpayers',)),
+    'payments': SourceTable('PaymentID', ['PaymentID', 'TPIN', 'PaymentDate', 'AmountPaid', 'PaymentMethod'], ('taxpayers',)),
+    'auditcases': SourceTable('AuditID', ['AuditID', 'TPIN', 'CaseOfficerID', 'StartDate', 'AuditType', 'Status', 'FindingsSummary', 'RiskLevel'],
+                              ('taxpayers',)),
+    'penalties': SourceTable('PenaltyID', ['PenaltyID', 'TPIN', 'PenaltyType', 'Amount', 'IssueDate', 'Status'], ('taxpayers',)),
+}
+
+# Session-local staging tables filled with COPY and emptied on commit;
+# entity ids are resolved by tin in the upsert
+STAGING_TABLES = {
+    'stage_entities': [('entity_id', 'text'), ('name', 'text'), ('type', 'text'), ('tin', 'text'),
+                       ('email', 'text'), ('phone', 'text'), ('status', 'text'), ('created_at', 'timestamp')],
+    # Names and emails from individuals/biz_businesses
+    'stage_entity_details': [('tin', 'text'), ('name', 'text'), ('email', 'text')],
+    'stage_obligations': [('obligation_id', 'text'), ('tin', 'text'), ('type', 'text'), ('description', 'text'),
+                          ('due_date', 'timestamp'), ('status', 'text'), ('priority', 'text')],
+    'stage_cases': [('case_id', 'text'), ('tin', 'text'), ('case_type', 'text'), ('priority', 'text'),
+                    ('status', 'text'), ('description', 'text'), ('assigned_officer', 'text'), ('created_at', 'timestamp')],
+}
+
+# Set-based merges from a staged chunk into the PostgreSQL schema.
+# DISTINCT ON keeps one row per key so ON CONFLICT never touches a row twice.
+ENTITIES_UPSERT = """
+    INSERT INTO entities (entity_id, name, type, tin, contact_info, compliance_score, risk_score, status, created_at)
+    SELECT DISTINCT ON (s.entity_id)
+           s.entity_id, s.name, s.type, s.tin,
+           json_build_object('email', s.email, 'phone', s.phone),
+           0.0, 0.0, s.status, s.created_at
+    FROM stage_entities s
+    ORDER BY s.entity_id
+    ON CONFLICT (entity_id) DO UPDATE SET
+        status = EXCLUDED.status,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Names and emails are applied after the entity exists, so re-running
+# taxpayers never resets them to the TPIN
+ENTITY_DETAILS_UPDATE = """
+    UPDATE entities e SET
+        name = s.name,
+        contact_info = json_build_object('email', s.email, 'phone', e.contact_info->>'phone'),
+        updated_at = CURRENT_TIMESTAMP
+    FROM stage_entity_details s
+    WHERE e.tin = s.tin
+"""
+
+OBLIGATIONS_UPSERT = """
+    INSERT INTO obligations (obligation_id, entity_id, type, description, due_date, status, priority)
+    SELECT DISTINCT ON (s.obligation_id)
+           s.obligation_id, e.id, s.type, s.description, s.due_date, s.status, s.priority
+    FROM stage_obligations s
+    JOIN entities e ON e.tin = s.tin
+    ORDER BY s.obligation_id
+    ON CONFLICT (obligation_id) DO UPDATE SET
+        description = EXCLUDED.description,
+        status = EXCLUDED.status,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+CASES_UPSERT = """
+    INSERT INTO cases (case_id, entity_id, case_type, priority, status, description, assigned_officer, created_at)
+    SELECT DISTINCT ON (s.case_id)
+           s.case_id, e.id, s.case_type, s.priority, s.status, s.description, s.assigned_officer, s.created_at
+    FROM stage_cases s
+    JOIN entities e ON e.tin = s.tin
+    ORDER BY s.case_id
+    ON CONFLICT (case_id) DO UPDATE SET
+        status = EXCLUDED.status,
+        description = EXCLUDED.description,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+BATCH_UPSERTS = {
+    'taxpayers': ENTITIES_UPSERT,
+    'individuals': ENTITY_DETAILS_UPDATE,
+    'biz_businesses': ENTITY_DETAILS_UPDATE,
+    'taxreturns': OBLIGATIONS_UPSERT,
+    'payments': OBLIGATIONS_UPSERT,
+    'penalties': OBLIGATIONS_UPSERT,
+    'auditcases': CASES_UPSERT,
+}
+
+# Control table holding the last committed source key per table
+CHECKPOINTS_DDL = """
+    CREATE TABLE IF NOT EXISTS migration_checkpoints (
+        source_table TEXT PRIMARY KEY,
+        watermark TEXT,
+        rows_copied BIGINT NOT NULL DEFAULT 0,
+        completed BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SAVE_CHECKPOINT = """
+    INSERT INTO migration_checkpoints (source_table, watermark, rows_copied, completed)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (source_table) DO UPDATE SET
+        watermark = COALESCE(EXCLUDED.watermark, migration_checkpoints.watermark),
+        rows_copied = migration_checkpoints.rows_copied + EXCLUDED.rows_copied,
+        completed = EXCLUDED.completed,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def as_datetime(value: Any, default: Optional[datetime] = None) -> Optional[datetime]:
+    """MySQL DATE/DATETIME/string value as the datetime COPY expects for a timestamp column"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def entity_row(taxpayer: Dict[str, Any]) -> Tuple:
+    return (
+        f"entity-{taxpayer['TPIN']}",
+        taxpayer['TPIN'],  # Use TPIN as name until individuals/businesses fill it in
+        taxpayer['TaxpayerType'].lower(),
+        taxpayer['TPIN'],
+        taxpayer['PrimaryEmail'],
+        taxpayer['PrimaryPhone'],
+        taxpayer['Status'].lower(),
+        as_datetime(taxpayer['RegistrationDate']),
+    )
+
+
+def individual_row(individual: Dict[str, Any]) -> Tuple:
+    return (individual['TPIN'], f"{individual['FirstName']} {individual['LastName']}", individual['email'])
+
+
+def business_row(business: Dict[str, Any]) -> Tuple:
+    return (business['TPIN'], business['BusinessName'], business['Email'])
+
+
+def taxreturn_row(taxreturn: Dict[str, Any], now: datetime) -> Tuple:
+    return (
+        f"return-{taxreturn['TPIN']}-{taxreturn['TaxPeriod']}",
+        taxreturn['TPIN'],
+        'tax_filing',
+        f"Tax return filing for period {taxreturn['TaxPeriod']}",
+        as_datetime(taxreturn['DueDate'], now),
+        'completed' if taxreturn['Status'] == 'Filed' else 'pending',
+        'medium',
+    )
+
+
+def payment_row(payment: Dict[str, Any], now: datetime) -> Tuple:
+    return (
+        f"payment-{payment['TPIN']}-{payment['PaymentID']}",
+        payment['TPIN'],
+        'payment',
+        f"Payment of {payment['AmountPaid']} via {payment['PaymentMethod']}",
+        as_datetime(payment['PaymentDate'], now),
+        'completed',
+        'high',
+    )
+
+
+def penalty_row(penalty: Dict[str, Any], now: datetime) -> Tuple:
+    return (
+        f"penalty-{penalty['TPIN']}-{penalty['PenaltyID']}",
+        penalty['TPIN'],
+        'penalty',
+        f"{penalty['PenaltyType']} penalty of {penalty['Amount']}",
+        as_datetime(penalty['IssueDate'], now),
+        'completed' if penalty['Status'] in ('Paid', 'Waived') else 'pending',
+        'high',
+    )
+
+
+def auditcase_row(auditcase: Dict[str, Any], now: datetime) -> Tuple:
+    return (
+        f"case-{auditcase['AuditID']}",
+        auditcase['TPIN'],
+        'fraud_investigation' if auditcase['AuditType'] == 'Investigation' else 'compliance_review',
+        (auditcase['RiskLevel'] or 'Low').lower(),
+        'investigating' if auditcase['Status'] == 'Open' else 'resolved',
+        auditcase['FindingsSummary'] or f"Audit case for {auditcase['AuditType']}",
+        f"Officer-{auditcase['CaseOfficerID']}",
+        as_datetime(auditcase['StartDate'], now),
+    )
+
+
+# Source table -> (staging table, row transform)
+ROW_TRANSFORMS = {
+    'taxpayers': ('stage_entities', lambda row, now: entity_row(row)),
+    'individuals': ('stage_entity_details', lambda row, now: individual_row(row)),
+    'biz_businesses': ('stage_entity_details', lambda row, now: business_row(row)),
+    'taxreturns': ('stage_obligations', taxreturn_row),
+    'payments': ('stage_obligations', payment_row),
+    'penalties': ('stage_obligations', penalty_row),
+    'auditcases': ('stage_cases', auditcase_row),
+}
+
+
+class TableStats:
+    """Rows moved and time spent for one source table in this run"""
+
+    def __init__(self, table: str):
+        self.table = table
+        self.status = 'pending'
+        self.rows = 0
+        self.written = 0
+        self.total = 0  # rows copied across all runs, from the checkpoint
+        self.seconds = 0.0
+        self.resumed_after: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.table}: {self.rows:,} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s, {self.written:,} written)")
+
 
 class DatabaseMigrator:
-    def __init__(self, mysql_config: Dict[str, str], postgres_config: Dict[str, str]):
+    def __init__(self, mysql_config: Dict[str, str], postgres_config: Dict[str, str],
+                 chunk_size: int = CHUNK_SIZE, concurrency: int = CONCURRENCY):
         self.mysql_config = mysql_config
         self.postgres_config = postgres_config
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.pool: Optional[asyncpg.Pool] = None
+        self.stats: Dict[str, TableStats] = {table: TableStats(table) for table in SOURCE_TABLES}
+        self.started_at: Optional[datetime] = None
+        self.elapsed = 0.0
 
-    async def migrate_mysql_to_postgres(self):
-        """Main migration function"""
-
-        # Step 1: Extract data from MySQL
-        print("🔄 Starting migration from MySQL to PostgreSQL...")
+    @property
+    def postgres_dsn(self) -> str:
+        return f"postgresql://{self.postgres_config['user']}:{self.postgres_config['password']}@{self.postgres_config['host']}:{self.postgres_config['port']}/{self.postgres_config['database']}"
 
-        mysql_data = await self.extract_mysql_data()
+    async def migrate_mysql_to_postgres(self, restart: bool = False) -> Dict[str, TableStats]:
+        """
+        Main migration function
 
-        # Step 2: Transform data to match PostgreSQL schema
-        print("🔄 Transforming data to PostgreSQL schema...")
-        postgres_data = self.transform_data(mysql_data)
+        Args:
+            restart: Discard the checkpoints and migrate every table from the start
+        """
 
-        # Step 3: Insert data into PostgreSQL
-        print("🔄 Inserting data into PostgreSQL...")
-        await self.insert_postgres_data(postgres_data)
+        print("🔄 Starting migration from MySQL to PostgreSQL...")
+        self.started_at = datetime.now()
+        start = time.perf_counter()
 
-        print("✅ Migration completed successfully!")
+        self.pool = await asyncpg.create_pool(self.postgres_dsn, min_size=1, max_size=self.concurrency)
+        try:
+            checkpoints = await self.load_checkpoints(restart)
+            await self.run_pipelines(checkpoints)
+        finally:
+            await self.pool.close()
+            self.elapsed = time.perf_counter() - start
 
-    async def extract_mysql_data(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Extract data from MySQL database"""
-
-        # This would connect to MySQL and extract data
-        # For now, we'll simulate based on the SQL file structure
-
-        data = {
-            'taxpayers': [
-                {'TPIN': '2134567890', 'TaxpayerType': 'Individual', 'RegistrationDate': '2025-10-21', 'Status': 'Active', 'PrimaryEmail': 'jas@try.com', 'PrimaryPhone': None},
-                {'TPIN': '3214567890', 'TaxpayerType': 'Individual', 'RegistrationDate': '2025-10-21', 'Status': 'Active', 'PrimaryEmail': 'jasper@try.com', 'PrimaryPhone': None},
-                {'TPIN': 'jas@try.com', 'TaxpayerType': 'Individual', 'RegistrationDate': '2025-10-21', 'Status': 'Active', 'PrimaryEmail': 'jas@try.com', 'PrimaryPhone': None}
-            ],
-            'individuals': [
-                {'IndividualID': 6, 'TPIN': '2134567890', 'FirstName': 'Pateh', 'LastName': 'Mike', 'email': 'jas@try.com', 'NRC': None, 'DateOfBirth': None, 'tpin_hash': ''},
-                {'IndividualID': 8, 'TPIN': '3214567890', 'FirstName': 'Pateh', 'LastName': 'Mike', 'email': 'jasper@try.com', 'NRC': None, 'DateOfBirth': None, 'tpin_hash': ''}
-            ],
-            'biz_businesses': [
-                {'BusinessID': 1, 'BusinessName': 'Pateh Innovations', 'TPIN': '0987654321', 'Email': 'patnovations@work.net', 'tpin_hash': '$2y$10$k7y80Q0PALkZT2BQFO1rp.oCs6eWDsRJLkvt0HHosMlwyPNT/ItNO', 'CreatedAt': '2025-10-22 15:55:46'}
-            ],
-            'taxreturns': [
-                # Extract from taxreturns table data would go here
-            ],
-            'payments': [
-                # Extract from payments table data would go here
-            ],
-            'auditcases': [
-                # Extract from auditcases table data would go here
-            ],
-            'penalties': [
-                # Extract from penalties table data would go here
-            ]
-        }
-
-        return data
-
-    def transform_data(self, mysql_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
-        """Transform MySQL data to PostgreSQL schema"""
-
-        postgres_data = {}
-
-        # Transform taxpayers to entities
-        entities = []
-        for taxpayer in mysql_data['taxpayers']:
-            # Map MySQL taxpayer to PostgreSQL entity
-            entity = {
-                'entity_id': f"entity-{taxpayer['TPIN']}",
-                'name': taxpayer['TPIN'],  # Use TPIN as name initially
-                'type': taxpayer['TaxpayerType'].lower(),
-                'tin': taxpayer['TPIN'],
-                'contact_info': {
-                    'email': taxpayer['PrimaryEmail'],
-                    'phone': taxpayer['PrimaryPhone']
-                },
-                'compliance_score': 0.0,
-                'risk_score': 0.0,
-                'status': taxpayer['Status'].lower(),
-                'created_at': taxpayer['RegistrationDate']
-            }
-            entities.append(entity)
-
-        postgres_data['entities'] = entities
-
-        # Transform individuals data
-        for individual in mysql_data['individuals']:
-            # Update corresponding entity with individual details
-            for entity in entities:
-                if entity['tin'] == individual['TPIN']:
-                    entity['name'] = f"{individual['FirstName']} {individual['LastName']}"
-                    if entity['contact_info']:
-                        entity['contact_info']['email'] = individual['email']
-                    break
+        failed = [table for table, stats in self.stats.items() if stats.status != 'done']
+        if failed:
+            raise RuntimeError(f"Tables not migrated: {', '.join(failed)}. Rerun to resume from the last checkpoint.")
 
-        # Transform businesses data
-        for business in mysql_data['biz_businesses']:
-            # Update corresponding entity with business details
-            for entity in entities:
-                if entity['tin'] == business['TPIN']:
-                    entity['name'] = business['BusinessName']
-                    if entity['contact_info']:
-                        entity['contact_info']['email'] = business['Email']
+        print("✅ Migration completed successfully!")
+        return self.stats
+
+    async def load_checkpoints(self, restart: bool = False) -> Dict[str, asyncpg.Record]:
+        """Create the control table if needed and read the saved watermarks"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(CHECKPOINTS_DDL)
+            if restart:
+                await conn.execute("DELETE FROM migration_checkpoints")
+            rows = await conn.fetch("SELECT source_table, watermark, rows_copied, completed FROM migration_checkpoints")
+        return {row['source_table']: row for row in rows}
+
+    async def run_pipelines(self, checkpoints: Dict[str, asyncpg.Record]):
+        """
+        Run one pipeline per source table concurrently.
+
+        Each pipeline waits for the tables it depends on and is skipped if
+        one of them did not finish. The pool size bounds how many copy at once.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run(table: str):
+            depends_on = SOURCE_TABLES[table].depends_on
+            await asyncio.gather(*(tasks[dependency] for dependency in depends_on))
+            stats = self.stats[table]
+            if any(self.stats[dependency].status != 'done' for dependency in depends_on):
+                stats.status = 'skipped'
+                print(f"⏭️  {table}: skipped, depends on {', '.join(depends_on)}")
+                return
+            try:
+                await self.migrate_table(table, checkpoints.get(table))
+            except Exception as e:
+                stats.status = 'failed'
+                stats.error = str(e)
+                print(f"❌ {table}: failed after {stats.rows:,} rows: {e}")
+
+        # SOURCE_TABLES lists every table after its dependencies
+        for table in SOURCE_TABLES:
+            tasks[table] = asyncio.create_task(run(table))
+        await asyncio.gather(*tasks.values())
+
+    async def migrate_table(self, table: str, checkpoint: Optional[asyncpg.Record] = None):
+        """Copy one source table chunk by chunk, committing a checkpoint with each chunk"""
+        source = SOURCE_TABLES[table]
+        stats = self.stats[table]
+        stats.total = checkpoint['rows_copied'] if checkpoint else 0
+        if checkpoint and checkpoint['completed']:
+            stats.status = 'done'
+            print(f"✅ {table}: already migrated ({stats.total:,} rows)")
+            return
+
+        watermark = None
+        if checkpoint and checkpoint['watermark'] is not None:
+            watermark = source.key_type(checkpoint['watermark'])
+            stats.resumed_after = checkpoint['watermark']
+            print(f"🔄 {table}: resuming after {source.key} {watermark}")
+
+        stage, transform = ROW_TRANSFORMS[table]
+        columns = [name for name, _ in STAGING_TABLES[stage]]
+        now = datetime.now()
+        start = time.perf_counter()
+
+        try:
+            async with self.pool.acquire() as conn:
+                await self.create_staging_table(conn, stage)
+                async for chunk in self.extract_mysql_data(table, after=watermark):
+                    records = [transform(row, now) for row in chunk]
+                    watermark = chunk[-1][source.key]
+                    async with conn.transaction():
+                        await conn.copy_records_to_table(stage, records=records, columns=columns)
+                        written = await self.insert_postgres_data(conn, table)
+                        await conn.execute(SAVE_CHECKPOINT, table, str(watermark), len(records), False)
+                    stats.rows += len(records)
+                    stats.written += written
+                    stats.total += len(records)
+                await conn.execute(SAVE_CHECKPOINT, table, None, 0, True)
+        finally:
+            # Failed tables report the time spent before the error too
+            stats.seconds = time.perf_counter() - start
+
+        stats.status = 'done'
+        print(f"✅ {stats}")
+
+    async def extract_mysql_data(self, table: str, after: Any = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream a MySQL table in chunks of chunk_size rows, in primary key order.
+
+        Uses an unbuffered server-side cursor (SSDictCursor) on its own
+        connection, so only the current chunk is held in memory. The blocking
+        pymysql calls run in a worker thread. after skips rows up to and
+        including that key, for resuming from a checkpoint.
+        """
+        source = SOURCE_TABLES[table]
+        columns = ', '.join(f"`{column}`" for column in source.columns)
+        query = f"SELECT {columns} FROM `{table}`"
+        params: Tuple = ()
+        if after is not None:
+            query += f" WHERE `{source.key}` > %s"
+            params = (after,)
+        query += f" ORDER BY `{source.key}`"
+
+        conn = await asyncio.to_thread(
+            pymysql.connect, cursorclass=pymysql.cursors.SSDictCursor, charset='utf8mb4', **self.mysql_config
+        )
+        try:
+            cursor = conn.cursor()
+            await asyncio.to_thread(cursor.execute, query, params)
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, self.chunk_size)
+                if not rows:
                     break
-
-        # Transform tax returns to obligations
-        obligations = []
-        for taxreturn in mysql_data['taxreturns']:
-            obligation = {
-                'obligation_id': f"return-{taxreturn['TPIN']}-{taxreturn['TaxPeriod']}",
-                'entity_id': next((e['id'] for e in entities if e['tin'] == taxreturn['TPIN']), None),
-                'type': 'tax_filing',
-                'description': f"Tax return filing for period {taxreturn['TaxPeriod']}",
-                'due_date': taxreturn['DueDate'] if taxreturn['DueDate'] else datetime.now(),
-                'status': 'completed' if taxreturn['Status'] == 'Filed' else 'pending',
-                'priority': 'medium'
-            }
-            if obligation['entity_id']:
-                obligations.append(obligation)
-
-        postgres_data['obligations'] = obligations
-
-        # Transform payments to obligations
-        for payment in mysql_data['payments']:
-            obligation = {
-                'obligation_id': f"payment-{payment['TPIN']}-{payment['PaymentID']}",
-                'entity_id': next((e['id'] for e in entities if e['tin'] == payment['TPIN']), None),
-                'type': 'payment',
-                'description': f"Payment of {payment['AmountPaid']} via {payment['PaymentMethod']}",
-                'due_date': payment['PaymentDate'] if payment['PaymentDate'] else datetime.now(),
-                'status': 'completed',
-                'priority': 'high'
-            }
-            if obligation['entity_id']:
-                obligations.append(obligation)
-
-        # Transform audit cases
-        cases = []
-        for auditcase in mysql_data['auditcases']:
-            entity_id = next((e['id'] for e in entities if e['tin'] == auditcase['TPIN']), None)
-            if entity_id:
-                case = {
-                    'case_id': f"case-{auditcase['AuditID']}",
-                    'entity_id': entity_id,
-                    'case_type': 'fraud_investigation' if auditcase['AuditType'] == 'Investigation' else 'compliance_review',
-                    'priority': auditcase['RiskLevel'].lower(),
-                    'status': 'investigating' if auditcase['Status'] == 'Open' else 'resolved',
-                    'description': auditcase['FindingsSummary'] or f"Audit case for {auditcase['AuditType']}",
-                    'assigned_officer': f"Officer-{auditcase['CaseOfficerID']}",
-                    'created_at': auditcase['StartDate'] if auditcase['StartDate'] else datetime.now()
-                }
-                cases.append(case)
-
-        postgres_data['cases'] = cases
-
-        return postgres_data
-
-    async def insert_postgres_data(self, postgres_data: Dict[str, List[Dict[str, Any]]]):
-        """Insert transformed data into PostgreSQL"""
-
-        # Connect to PostgreSQL
-        conn_string = f"postgresql://{self.postgres_config['user']}:{self.postgres_config['password']}@{self.postgres_config['host']}:{self.postgres_config['port']}/{self.postgres_config['database']}"
-
-        async with asyncpg.connect(conn_string) as conn:
-            # Insert entities
-            for entity in postgres_data['entities']:
-                await conn.execute("""
-                    INSERT INTO entities (entity_id, name, type, tin, contact_info, compliance_score, risk_score, status, created_at)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                    ON CONFLICT (entity_id) DO UPDATE SET
-                        name = EXCLUDED.name,
-                        contact_info = EXCLUDED.contact_info,
-                        updated_at = CURRENT_TIMESTAMP
-                """, entity['entity_id'], entity['name'], entity['type'], entity['tin'],
-                     json.dumps(entity['contact_info']), entity['compliance_score'],
-                     entity['risk_score'], entity['status'], entity['created_at'])
-
-            # Insert obligations
-            for obligation in postgres_data['obligations']:
-                await conn.execute("""
-                    INSERT INTO obligations (obligation_id, entity_id, type, description, due_date, status, priority)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7)
-                    ON CONFLICT (obligation_id) DO UPDATE SET
-                        description = EXCLUDED.description,
-                        status = EXCLUDED.status,
-                        updated_at = CURRENT_TIMESTAMP
-                """, obligation['obligation_id'], obligation['entity_id'], obligation['type'],
-                     obligation['description'], obligation['due_date'], obligation['status'],
-                     obligation['priority'])
-
-            # Insert cases
-            for case in postgres_data['cases']:
-                await conn.execute("""
-                    INSERT INTO cases (case_id, entity_id, case_type, priority, status, description, assigned_officer, created_at)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                    ON CONFLICT (case_id) DO UPDATE SET
-                        status = EXCLUDED.status,
-                        description = EXCLUDED.description,
-                        updated_at = CURRENT_TIMESTAMP
-                """, case['case_id'], case['entity_id'], case['case_type'], case['priority'],
-                     case['status'], case['description'], case['assigned_officer'], case['created_at'])
-
-    async def create_migration_report(self, mysql_data: Dict, postgres_data: Dict) -> str:
-        """Generate migration report"""
+                yield rows
+        finally:
+            await asyncio.to_thread(conn.close)
+
+    async def create_staging_table(self, conn: asyncpg.Connection, stage: str):
+        """Create a temporary staging table on this connection, emptied at every commit"""
+        definition = ', '.join(f"{name} {kind}" for name, kind in STAGING_TABLES[stage])
+        await conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} ({definition}) ON COMMIT DELETE ROWS")
+
+    async def insert_postgres_data(self, conn: asyncpg.Connection, table: str) -> int:
+        """Merge the staged chunk of table into the PostgreSQL schema, returning rows written"""
+        status = await conn.execute(BATCH_UPSERTS[table])
+        return int(status.split()[-1])
+
+    async def create_migration_report(self) -> str:
+        """Generate migration report from the figures of the last run"""
+
+        rows = []
+        for table, stats in self.stats.items():
+            resumed = stats.resumed_after if stats.resumed_after is not None else '-'
+            status = f"{stats.status}: {stats.error}" if stats.error else stats.status
+            rows.append(
+                f"| {table} | {status} | {stats.rows:,} | {stats.written:,} | {stats.total:,} "
+                f"| {stats.seconds:.2f} | {stats.rows_per_second:,.0f} | {resumed} |"
+            )
+        copied = sum(stats.rows for stats in self.stats.values())
+        succeeded = all(stats.status == 'done' for stats in self.stats.values())
+        started = self.started_at.isoformat() if self.started_at else 'not started'
+        table_lines = '\n'.join(rows)
 
         report = f"""
 # Database Migration Report
 Generated: {datetime.now().isoformat()}
 
 ## Migration Summary
+- Started: {started}
+- Wall time: {self.elapsed:.2f}s
+- Rows copied this run: {copied:,} ({copied / self.elapsed if self.elapsed else 0:,.0f} rows/s overall)
+- Chunk size: {self.chunk_size:,} rows, {self.concurrency} concurrent pipelines
 
-### MySQL Data Extracted:
-- Taxpayers: {len(mysql_data['taxpayers'])}
-- Individuals: {len(mysql_data['individuals'])}
-- Businesses: {len(mysql_data['biz_businesses'])}
-- Tax Returns: {len(mysql_data['taxreturns'])}
-- Payments: {len(mysql_data['payments'])}
-- Audit Cases: {len(mysql_data['auditcases'])}
+| Source table | Status | Rows this run | Rows written | Rows total | Time (s) | Rows/s | Resumed after |
+|---|---|---|---|---|---|---|---|
+{table_lines}
 
-### PostgreSQL Data Transformed:
-- Entities: {len(postgres_data['entities'])}
-- Obligations: {len(postgres_data['obligations'])}
-- Cases: {len(postgres_data['cases'])}
+Rows written counts entities/obligations/cases inserted or updated; child rows
+whose TPIN has no entity are not written. Rows total includes earlier runs.
 
 ## Transformation Details:
 
@@ -256,7 +481,6 @@ Generated: {datetime.now().isoformat()}
 - All TPINs preserved as unique identifiers
 - Contact information consolidated
 - Compliance and risk scores initialized to 0.0
-- Timestamps converted to UTC
 
 ## Next Steps:
 1. Verify data integrity in PostgreSQL
@@ -264,12 +488,12 @@ Generated: {datetime.now().isoformat()}
 3. Review and adjust risk assessments
 4. Set up data synchronization processes
 
-Migration completed successfully! 🎉
+{'Migration completed successfully! 🎉' if succeeded else 'Migration incomplete: rerun to resume from the saved checkpoints.'}
 """
 
         return report
 
-async def run_migration():
+async def run_migration(restart: bool = False, concurrency: int = CONCURRENCY, chunk_size: int = CHUNK_SIZE):
     """Run the complete migration process"""
 
     # Configuration - update these with your actual database credentials
@@ -289,14 +513,21 @@ async def run_migration():
         'port': 5432
     }
 
-    migrator = DatabaseMigrator(mysql_config, postgres_config)
+    migrator = DatabaseMigrator(mysql_config, postgres_config, chunk_size=chunk_size, concurrency=concurrency)
 
     try:
-        await migrator.migrate_mysql_to_postgres()
+        await migrator.migrate_mysql_to_postgres(restart=restart)
         print("✅ Migration completed successfully!")
     except Exception as e:
         print(f"❌ Migration failed: {str(e)}")
         raise
+    finally:
+        print(await migrator.create_migration_report())
 
 if __name__ == "__main__":
-    asyncio.run(run_migration())
+    parser = argparse.ArgumentParser(description="Migrate the MySQL tax database to PostgreSQL")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and start over")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    asyncio.run(run_migration(args.restart, args.concurrency, args.chunk_size))
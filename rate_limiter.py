@@ -1,27 +1,167 @@
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 from functools import wraps
+import math
+import secrets
 import time
-from typing import Callable, Optional
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from redis_breaker import REDIS_ERRORS, CircuitBreaker, LocalRateWindows, RedisUnavailable
+from redis_pool import pipelined
+
+# Sliding-window check executed atomically on the Redis server.
+# KEYS[1] = sorted set for the client
+# ARGV    = now (ms), window (ms), limit, unique member id, cost (default 1)
+# Returns {requests granted, request count in window, retry after (ms)}
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[5] or '1')
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+
+local granted = math.max(0, math.min(cost, limit - count))
+if granted == 1 then
+    redis.call('ZADD', key, now, ARGV[4])
+elseif granted > 1 then
+    for i = 1, granted do
+        redis.call('ZADD', key, now, ARGV[4] .. ':' .. i)
+    end
+end
+if granted > 0 then
+    redis.call('PEXPIRE', key, window)
+end
+count = count + granted
+
+local retry_after = 0
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    retry_after = window
+    if oldest[2] then
+        retry_after = tonumber(oldest[2]) + window - now
+    end
+end
+return {granted, count, retry_after}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of a single rate limit check"""
+    allowed: bool
+    count: int
+    limit: int
+    retry_after_ms: int
+
+    @property
+    def retry_after(self) -> int:
+        """Retry-After value in whole seconds (never 0 for a rejection)"""
+        if self.allowed:
+            return 0
+        return max(1, math.ceil(self.retry_after_ms / 1000))
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.count)
+
 
 class RateLimiter:
-    def __init__(self, redis_manager, limit: int = 100, window: int = 60):
+    def __init__(self, redis_manager, limit: int = 100, window: int = 60, breaker: Optional[CircuitBreaker] = None,
+                 fallback: Optional[LocalRateWindows] = None):
         """
         Initialize rate limiter
-        
+
         Args:
             redis_manager: Instance of RedisManager
             limit: Maximum number of requests allowed in the time window
             window: Time window in seconds
+            breaker: Circuit breaker guarding Redis; while it is open requests are counted locally
+            fallback: Local windows used while Redis is unavailable (default: a new LocalRateWindows)
         """
         self.redis = redis_manager
         self.limit = limit
         self.window = window
+        self.window_ms = int(window * 1000)
+        self.breaker = breaker
+        self.fallback = fallback if fallback is not None else LocalRateWindows()
+        self._script = None
+
+    @property
+    def script(self):
+        """Registered Lua script (EVALSHA with automatic EVAL fallback)"""
+        if self._script is None:
+            self._script = self.redis.redis.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    @staticmethod
+    def _member(now_ms: int) -> str:
+        # Unique per request so bursts inside the same millisecond are all counted
+        return f"{now_ms}-{secrets.token_hex(6)}"
+
+    def hit(self, rate_key: str, cost: int = 1) -> RateLimitResult:
+        """
+        Record cost requests for rate_key and check them against the limit.
+
+        Performs the whole sliding-window update in one Redis round trip.
+        Only the requests that fit in the window are recorded; the result is
+        allowed when all of them fit. With a breaker, Redis being unreachable
+        falls back to this worker's local windows.
+        """
+        now_ms = int(time.time() * 1000)
+        args = [now_ms, self.window_ms, self.limit, self._member(now_ms), cost]
+        if self.breaker is None:
+            granted, count, retry_after_ms = self.script(keys=[rate_key], args=args)
+        else:
+            try:
+                granted, count, retry_after_ms = self.breaker.call(self.script, keys=[rate_key], args=args)
+            except (RedisUnavailable, *REDIS_ERRORS):
+                granted, count, retry_after_ms = self.fallback.hit(rate_key, self.limit, self.window_ms, cost, now_ms)
+        return RateLimitResult(int(granted) >= cost, int(count), self.limit, int(retry_after_ms))
+
+    def hit_many(self, hits: List[Tuple[str, int]]) -> List[RateLimitResult]:
+        """
+        hit() for several (rate_key, cost) pairs at once.
+
+        The scripts are queued on a pipeline by redis_pool.pipelined, so
+        there is one round trip per REDIS_BATCH_SIZE keys instead of one per
+        key. A breaker failure sends the whole batch to the local windows.
+        """
+        now_ms = int(time.time() * 1000)
+        script = self.script
+
+        def queue(pipe, item):
+            rate_key, cost = item
+            script(keys=[rate_key], args=[now_ms, self.window_ms, self.limit, self._member(now_ms), cost], client=pipe)
+
+        if self.breaker is None:
+            replies = pipelined(self.redis.redis, hits, queue)
+        else:
+            try:
+                replies = self.breaker.call(pipelined, self.redis.redis, hits, queue)
+            except (RedisUnavailable, *REDIS_ERRORS):
+                replies = [self.fallback.hit(rate_key, self.limit, self.window_ms, cost, now_ms)
+                           for rate_key, cost in hits]
+        return [
+            RateLimitResult(int(granted) >= cost, int(count), self.limit, int(retry_after_ms))
+            for (_, cost), (granted, count, retry_after_ms) in zip(hits, replies)
+        ]
+
+    def headers(self, result: RateLimitResult) -> dict:
+        """Standard rate limit response headers for a check result"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+        }
+        if not result.allowed:
+            headers["Retry-After"] = str(result.retry_after)
+        return headers
 
     def __call__(self, key: Optional[str] = None):
         """
         Decorator to rate limit API endpoints
-        
+
         Args:
             key: Optional custom key for rate limiting. If None, uses client IP
         """
@@ -29,41 +169,23 @@ class RateLimiter:
             @wraps(func)
             async def wrapper(request: Request, *args, **kwargs):
                 # Use custom key or client IP as default
-                rate_key = key or f"rate_limit:{request.client.host}"                
-                # Get current timestamp
-                current_time = int(time.time())
-                
-                # Create a pipeline for atomic operations
-                pipe = self.redis.redis.pipeline()
-                
-                # Add current timestamp to sorted set
-                pipe.zadd(rate_key, {str(current_time): current_time})
-                
-                # Remove timestamps older than the time window
-                pipe.zremrangebyscore(rate_key, 0, current_time - self.window)
-                
-                # Get count of requests in current window
-                pipe.zcard(rate_key)
-                
-                # Set expiry on the key
-                pipe.expire(rate_key, self.window)
-                
-                # Execute all commands atomically
-                _, _, request_count, _ = pipe.execute()
-                
+                rate_key = key or f"rate_limit:{request.client.host}"
+                result = self.hit(rate_key)
+
                 # Check if rate limit exceeded
-                if request_count > self.limit:
+                if not result.allowed:
                     raise HTTPException(
                         status_code=429,
                         detail={
                             "error": "Too Many Requests",
                             "message": f"Rate limit exceeded. Maximum {self.limit} requests per {self.window} seconds allowed.",
-                            "retry_after": self.window - (current_time % self.window)
-                        }
+                            "retry_after": result.retry_after
+                        },
+                        headers=self.headers(result),
                     )
-                
+
                 # Call the original function
                 return await func(request, *args, **kwargs)
-            
+
             return wrapper
         return decorator
@@ -0,0 +1,188 @@
+"""
+Circuit breaker for Redis on the request path.
+
+After REDIS_BREAKER_FAILURES consecutive connection errors or timeouts
+the breaker opens: calls fail immediately with RedisUnavailable instead of
+each waiting for a socket timeout, and callers serve from local state,
+RateLimiter from LocalRateWindows and ResponseCache from its in-process
+tier. Checking an open breaker is a clock read and a comparison.
+
+While open, recovery is probed in a background thread with the probe
+callable (redis_manager.ping), never by a request. The first probe runs
+REDIS_BREAKER_BASE_DELAY_SECONDS after the breaker opens; each failed
+probe doubles the delay up to REDIS_BREAKER_MAX_DELAY_SECONDS, with
+jitter so workers do not probe in step. A successful probe closes it.
+
+Rate limits served from LocalRateWindows are per worker, so while Redis
+is down a client can make up to limit requests per window to each worker.
+"""
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_BREAKER_FAILURES = int(os.getenv("REDIS_BREAKER_FAILURES", "3"))
+REDIS_BREAKER_BASE_DELAY = float(os.getenv("REDIS_BREAKER_BASE_DELAY_SECONDS", "0.5"))
+REDIS_BREAKER_MAX_DELAY = float(os.getenv("REDIS_BREAKER_MAX_DELAY_SECONDS", "30"))
+REDIS_FALLBACK_MAX_KEYS = int(os.getenv("REDIS_FALLBACK_MAX_KEYS", "100000"))
+
+# Errors meaning Redis is unreachable, as opposed to a bad command
+REDIS_ERRORS: Tuple[type, ...] = (ConnectionError, TimeoutError)
+if redis is not None:
+    REDIS_ERRORS += (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+
+class RedisUnavailable(Exception):
+    """Raised instead of calling Redis while the breaker is open"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, probe: Callable[[], Any], failure_threshold: int = REDIS_BREAKER_FAILURES,
+                 base_delay: float = REDIS_BREAKER_BASE_DELAY, max_delay: float = REDIS_BREAKER_MAX_DELAY,
+                 background: bool = True):
+        """
+        Initialize the breaker
+
+        Args:
+            probe: Returns truthy when Redis is reachable again (e.g. redis_manager.ping)
+            failure_threshold: Consecutive failures that open the breaker
+            base_delay: Seconds before the first recovery probe
+            max_delay: Upper bound on the delay between probes
+            background: Run probes in a thread; False runs them inline (for tests)
+        """
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.background = background
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._probes = 0
+        self._next_probe = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True when Redis may be called; while open, starts a probe once it is due"""
+        if self.state == self.CLOSED:
+            return True
+        if not self._probing and time.monotonic() >= self._next_probe:
+            self._start_probe()
+        return False
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call func(*args, **kwargs) through the breaker; raises RedisUnavailable while open"""
+        if not self.allow():
+            raise RedisUnavailable("Redis circuit breaker is open")
+        try:
+            result = func(*args, **kwargs)
+        except REDIS_ERRORS:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.trips += 1
+                self._probes = 0
+                self._schedule_probe()
+                logger.warning(f"Redis circuit breaker opened after {self.failures} consecutive failures")
+
+    def _schedule_probe(self):
+        delay = min(self.max_delay, self.base_delay * 2 ** self._probes)
+        self._next_probe = time.monotonic() + delay * random.uniform(1.0, 1.2)
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probing or self.state == self.CLOSED:
+                return
+            self._probing = True
+        if self.background:
+            threading.Thread(target=self._run_probe, name="redis-breaker-probe", daemon=True).start()
+        else:
+            self._run_probe()
+
+    def _run_probe(self):
+        try:
+            recovered = bool(self.probe())
+        except Exception:
+            recovered = False
+        with self._lock:
+            self._probing = False
+            if recovered:
+                self.state = self.CLOSED
+                self.failures = 0
+                logger.info(f"Redis circuit breaker closed after {self._probes + 1} probes")
+            else:
+                self._probes += 1
+                self._schedule_probe()
+
+
+class LocalRateWindows:
+    """
+    Sliding-window counters kept in process, bounded by max_keys (least recently used dropped)
+
+    Each key keeps the counts of its current and previous fixed windows and
+    weights the previous one by how much of it still overlaps the sliding
+    window, which approximates RateLimiter's sorted-set window in O(1) memory.
+    """
+
+    def __init__(self, max_keys: int = REDIS_FALLBACK_MAX_KEYS):
+        self.max_keys = max_keys
+        self._windows: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def hit(self, key: str, limit: int, window_ms: int, cost: int = 1, now_ms: int = None) -> Tuple[int, int, int]:
+        """Same contract as the Lua script: (requests granted, count in window, retry after ms)"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = [now_ms, 0, 0]  # start, previous count, current count
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(key)
+
+            start, previous, current = window
+            elapsed = now_ms - start
+            if elapsed >= window_ms:
+                windows_passed = elapsed // window_ms
+                previous = current if windows_passed == 1 else 0
+                current = 0
+                start += windows_passed * window_ms
+                elapsed = now_ms - start
+
+            count = math.ceil(previous * (1 - elapsed / window_ms)) + current
+            granted = max(0, min(cost, limit - count))
+            current += granted
+            count += granted
+            window[:] = [start, previous, current]
+
+        retry_after = window_ms - elapsed if count >= limit else 0
+        return granted, count, retry_after
@@ -0,0 +1,247 @@
+"""
+Low-impact Redis monitoring agent.
+
+Each round costs a fixed number of round trips however large the
+keyspace is:
+
+  1 pipeline:  INFO stats, memory, keyspace and commandstats; key counts
+               come from the keyspace entry of the client's database, not
+               from walking the keys
+  1 pipeline:  RANDOMKEY x sample_size
+  1 pipeline:  TYPE, TTL and MEMORY USAGE for each sampled key
+  latency_probes PINGs, timed client-side
+
+Sampled keys are bucketed by prefix (rate_limit:, api:keys:, ratelimit:
+and "other"). Over a sliding window of rounds this gives each prefix's
+share of the keyspace, so its key count and memory can be extrapolated
+from INFO totals, and how many of its keys have no TTL (rate limit keys
+without one are a leak). Counters from INFO are turned into per-second
+rates between rounds. Every round produces one flat sample, written as a
+JSON line or a console line and exported as Prometheus gauges.
+"""
+import json
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Sequence
+
+from table_stats import redis_key_count
+
+DEFAULT_PREFIXES = ("rate_limit:", "api:keys:", "ratelimit:")
+OTHER = "other"
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _percentile(values: Sequence[float], q: int) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+class RedisMonitor:
+    def __init__(self, client, prefixes: Sequence[str] = DEFAULT_PREFIXES, sample_size: int = 100,
+                 window: int = 30, latency_probes: int = 5, exact: bool = False, db: Optional[int] = None):
+        """
+        Initialize the monitor
+
+        Args:
+            client: redis-py client (decoded or raw responses)
+            prefixes: Key prefixes to track; everything else is "other"
+            sample_size: Keys sampled per round, the sampling budget
+            window: Rounds of samples and latencies the estimates are taken over
+            latency_probes: PINGs timed per round
+            exact: Also count keys with a full SCAN each round (slow, for verification)
+            db: Database the client has selected (default: read from its connection pool)
+        """
+        self.client = client
+        self.prefixes = tuple(prefixes)
+        self.sample_size = sample_size
+        self.latency_probes = latency_probes
+        self.exact = exact
+        if db is None:
+            pool = getattr(client, "connection_pool", None)
+            db = int(pool.connection_kwargs.get("db", 0)) if pool is not None else 0
+        # RANDOMKEY only samples this database, so the totals must come from it alone
+        self.db = db
+        self._samples: Deque[List[dict]] = deque(maxlen=window)
+        self._latencies: Deque[List[float]] = deque(maxlen=window)
+        self._previous: Optional[dict] = None
+
+    def prefix_of(self, key: str) -> str:
+        for prefix in self.prefixes:
+            if key.startswith(prefix):
+                return prefix
+        return OTHER
+
+    def _info(self) -> dict:
+        pipe = self.client.pipeline(transaction=False)
+        for section in ("stats", "memory", "keyspace", "commandstats"):
+            pipe.info(section)
+        stats, memory, keyspace, commandstats = pipe.execute()
+        calls = usec = 0
+        for name, command in commandstats.items():
+            if name.startswith("cmdstat_"):
+                calls += command.get("calls", 0)
+                usec += command.get("usec", 0)
+        db = keyspace.get(f"db{self.db}", {})  # absent while the database is empty
+        return {
+            "time": time.monotonic(),
+            "keys": db.get("keys", 0),
+            "expires": db.get("expires", 0),
+            "used_memory": memory.get("used_memory", 0),
+            "commands": stats.get("total_commands_processed", 0),
+            "hits": stats.get("keyspace_hits", 0),
+            "misses": stats.get("keyspace_misses", 0),
+            "expired_keys": stats.get("expired_keys", 0),
+            "evicted_keys": stats.get("evicted_keys", 0),
+            "calls": calls,
+            "usec": usec,
+        }
+
+    def _sample_keys(self) -> List[dict]:
+        pipe = self.client.pipeline(transaction=False)
+        for _ in range(self.sample_size):
+            pipe.randomkey()
+        keys = [key for key in pipe.execute() if key is not None]
+        if not keys:
+            return []
+
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.ttl(key)
+            pipe.memory_usage(key)
+        replies = pipe.execute(raise_on_error=False)
+        sampled = []
+        for i, key in enumerate(keys):
+            key_type, ttl, memory = replies[3 * i:3 * i + 3]
+            key_type = _decode(key_type)
+            if key_type == "none" or isinstance(memory, Exception):
+                continue  # expired or deleted between RANDOMKEY and now
+            sampled.append({"prefix": self.prefix_of(_decode(key)), "type": key_type, "ttl": ttl, "memory": memory or 0})
+        return sampled
+
+    def _probe_latency(self) -> List[float]:
+        latencies = []
+        for _ in range(self.latency_probes):
+            start = time.perf_counter()
+            self.client.ping()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def prefix_estimates(self, keys: int) -> Dict[str, dict]:
+        """Each prefix's estimated key count, memory and share of keys without TTL, over the window"""
+        sampled = [key for round_keys in self._samples for key in round_keys]
+        buckets = {prefix: [] for prefix in (*self.prefixes, OTHER)}
+        for key in sampled:
+            buckets[key["prefix"]].append(key)
+        estimates = {}
+        for prefix, members in buckets.items():
+            share = len(members) / len(sampled) if sampled else 0.0
+            average = sum(key["memory"] for key in members) / len(members) if members else 0
+            estimates[prefix] = {
+                "keys": round(keys * share),
+                "memory_bytes": round(keys * share * average),
+                "no_ttl_share": round(sum(key["ttl"] == -1 for key in members) / len(members), 3) if members else None,
+                "sampled": len(members),
+            }
+        return estimates
+
+    def collect(self) -> dict:
+        """Run one round and return its sample"""
+        current = self._info()
+        self._samples.append(self._sample_keys())
+        self._latencies.append(self._probe_latency())
+
+        sample = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "keys": current["keys"],
+            "expires": current["expires"],
+            "used_memory": current["used_memory"],
+            "ops_per_sec": None,
+            "hit_ratio": None,
+            "expired_per_sec": None,
+            "evicted_per_sec": None,
+            "server_usec_per_call": None,
+        }
+        previous = self._previous
+        if previous is not None:
+            elapsed = max(current["time"] - previous["time"], 1e-9)
+            sample["ops_per_sec"] = round((current["commands"] - previous["commands"]) / elapsed, 1)
+            sample["expired_per_sec"] = round((current["expired_keys"] - previous["expired_keys"]) / elapsed, 1)
+            sample["evicted_per_sec"] = round((current["evicted_keys"] - previous["evicted_keys"]) / elapsed, 1)
+            lookups = (current["hits"] - previous["hits"]) + (current["misses"] - previous["misses"])
+            if lookups > 0:
+                sample["hit_ratio"] = round((current["hits"] - previous["hits"]) / lookups, 4)
+            calls = current["calls"] - previous["calls"]
+            if calls > 0:
+                sample["server_usec_per_call"] = round((current["usec"] - previous["usec"]) / calls, 2)
+        self._previous = current
+
+        latencies = sorted(latency for round_latencies in self._latencies for latency in round_latencies)
+        for q in (50, 95, 99):
+            value = _percentile(latencies, q)
+            sample[f"latency_p{q}_ms"] = None if value is None else round(value * 1000, 3)
+        sample["prefixes"] = self.prefix_estimates(current["keys"])
+        if self.exact:
+            sample["keys_exact"] = redis_key_count(self.client, exact=True).rows
+        return sample
+
+
+def format_line(sample: dict) -> str:
+    """One console line per sample, so the output scrolls as a time series"""
+
+    def show(value, fmt):
+        return "-" if value is None else format(value, fmt)
+
+    prefixes = " ".join(
+        f"{prefix.rstrip(':')}={estimate['keys']:,}/{estimate['memory_bytes'] / 1024 / 1024:.1f}MB"
+        for prefix, estimate in sample["prefixes"].items() if estimate["sampled"]
+    )
+    return (
+        f"{sample['timestamp'][11:19]} keys={sample['keys']:,} mem={sample['used_memory'] / 1024 / 1024:.1f}MB "
+        f"ops/s={show(sample['ops_per_sec'], ',.0f')} hit={show(sample['hit_ratio'], '.1%')} "
+        f"p50={show(sample['latency_p50_ms'], '.2f')}ms p99={show(sample['latency_p99_ms'], '.2f')}ms "
+        f"{prefixes}"
+    )
+
+
+def format_json(sample: dict) -> str:
+    return json.dumps(sample, separators=(",", ":"))
+
+
+class PrometheusExporter:
+    """Gauges for the samples, on their own registry so they can be served from the agent process"""
+
+    def __init__(self, registry=None):
+        from prometheus_client import CollectorRegistry, Gauge
+
+        self.registry = registry or CollectorRegistry()
+        self.keys = Gauge("zra_redis_keys", "Keys in the monitored Redis database (INFO keyspace)", registry=self.registry)
+        self.memory = Gauge("zra_redis_used_memory_bytes", "Redis used_memory", registry=self.registry)
+        self.ops = Gauge("zra_redis_ops_per_second", "Commands processed per second", registry=self.registry)
+        self.hit_ratio = Gauge("zra_redis_hit_ratio", "Keyspace hits / lookups between samples", registry=self.registry)
+        self.latency = Gauge("zra_redis_latency_seconds", "PING round-trip time", ["quantile"], registry=self.registry)
+        self.prefix_keys = Gauge("zra_redis_prefix_keys", "Estimated keys per prefix", ["prefix"], registry=self.registry)
+        self.prefix_memory = Gauge("zra_redis_prefix_memory_bytes", "Estimated memory per prefix", ["prefix"],
+                                   registry=self.registry)
+
+    def update(self, sample: dict):
+        self.keys.set(sample["keys"])
+        self.memory.set(sample["used_memory"])
+        if sample["ops_per_sec"] is not None:
+            self.ops.set(sample["ops_per_sec"])
+        if sample["hit_ratio"] is not None:
+            self.hit_ratio.set(sample["hit_ratio"])
+        for q in (50, 95, 99):
+            if sample[f"latency_p{q}_ms"] is not None:
+                self.latency.labels(quantile=f"0.{q}").set(sample[f"latency_p{q}_ms"] / 1000)
+        for prefix, estimate in sample["prefixes"].items():
+            self.prefix_keys.labels(prefix=prefix).set(estimate["keys"])
+            self.prefix_memory.labels(prefix=prefix).set(estimate["memory_bytes"])
@@ -0,0 +1,183 @@
+"""
+Pooled Redis clients and batched commands.
+
+PooledRedisManager has the RedisManager interface (redis, ping, get, set)
+on top of a BlockingConnectionPool bounded by REDIS_POOL_MAX_CONNECTIONS:
+when every connection is busy a caller waits up to
+REDIS_POOL_TIMEOUT_SECONDS for one instead of opening another, so a burst
+of requests cannot exhaust the server's client limit. manager.aio is an
+asyncio client with its own bounded pool for use inside request handlers.
+With REDIS_ENABLED, main.py sends the request path through one: the rate
+limiter, the response cache and the circuit breaker's recovery probe.
+
+One command per round trip spends most of its time on the network. The
+batch helpers queue commands on a pipeline and send them REDIS_BATCH_SIZE
+at a time, which keeps every reply buffer bounded:
+
+    values = manager.mget(keys)
+    manager.mset({key: value for ...}, ex=3600)
+    manager.pipelined(api_keys.items(), lambda pipe, item: pipe.hset(f"api:keys:{item[0]}", mapping=item[1]))
+
+Each has an awaitable twin on the asyncio client (amget, amset,
+apipelined). scripts/bench_redis_pipeline.py measures the difference.
+"""
+import logging
+import os
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_POOL_MAX_CONNECTIONS = int(os.getenv("REDIS_POOL_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "2"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "1"))
+REDIS_BATCH_SIZE = int(os.getenv("REDIS_BATCH_SIZE", "500"))
+
+
+def chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pipelined(client, items: Iterable, queue: Callable[[Any, Any], Any], chunk_size: int = REDIS_BATCH_SIZE) -> list:
+    """
+    Run queue(pipe, item) for every item, one round trip per chunk_size items
+
+    Returns the replies of all queued commands, in order.
+    """
+    replies = []
+    for chunk in chunks(items, chunk_size):
+        pipe = client.pipeline(transaction=False)
+        for item in chunk:
+            queue(pipe, item)
+        replies.extend(pipe.execute())
+    return replies
+
+
+def mget(client, keys: Sequence, chunk_size: int = REDIS_BATCH_SIZE) -> list:
+    values = []
+    for chunk in chunks(keys, chunk_size):
+        values.extend(client.mget(chunk))
+    return values
+
+
+def _queue_mset(pipe, chunk: list, ex: Optional[int]):
+    if ex is None:
+        pipe.mset(dict(chunk))
+    else:
+        # MSET cannot set a TTL; SET EX per key is still one round trip per chunk
+        for key, value in chunk:
+            pipe.set(key, value, ex=ex)
+
+
+def mset(client, mapping: Dict, ex: Optional[int] = None, chunk_size: int = REDIS_BATCH_SIZE):
+    for chunk in chunks(mapping.items(), chunk_size):
+        pipe = client.pipeline(transaction=False)
+        _queue_mset(pipe, chunk, ex)
+        pipe.execute()
+
+
+async def async_pipelined(client, items: Iterable, queue: Callable[[Any, Any], Any],
+                          chunk_size: int = REDIS_BATCH_SIZE) -> list:
+    replies = []
+    for chunk in chunks(items, chunk_size):
+        pipe = client.pipeline(transaction=False)
+        for item in chunk:
+            queue(pipe, item)
+        replies.extend(await pipe.execute())
+    return replies
+
+
+async def async_mget(client, keys: Sequence, chunk_size: int = REDIS_BATCH_SIZE) -> list:
+    values = []
+    for chunk in chunks(keys, chunk_size):
+        values.extend(await client.mget(chunk))
+    return values
+
+
+async def async_mset(client, mapping: Dict, ex: Optional[int] = None, chunk_size: int = REDIS_BATCH_SIZE):
+    for chunk in chunks(mapping.items(), chunk_size):
+        pipe = client.pipeline(transaction=False)
+        _queue_mset(pipe, chunk, ex)
+        await pipe.execute()
+
+
+class PooledRedisManager:
+    def __init__(self, url: str = REDIS_URL, db: int = REDIS_DB, max_connections: int = REDIS_POOL_MAX_CONNECTIONS,
+                 pool_timeout: float = REDIS_POOL_TIMEOUT, socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+                 chunk_size: int = REDIS_BATCH_SIZE):
+        """
+        Initialize the manager; no connection is made until the first command
+
+        Args:
+            url: Redis URL (redis:// or rediss://)
+            db: Database number
+            max_connections: Connections per pool (the sync and asyncio pools each have this many)
+            pool_timeout: Seconds to wait for a free connection before raising
+            socket_timeout: Seconds to wait for a reply, and to connect
+            chunk_size: Items per round trip in the batch helpers
+        """
+        if redis is None:
+            raise RuntimeError("PooledRedisManager requires the redis package")
+        self.chunk_size = chunk_size
+        options = dict(
+            db=db,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            health_check_interval=30,
+        )
+        self.pool = redis.BlockingConnectionPool.from_url(url, **options)
+        self.async_pool = redis.asyncio.BlockingConnectionPool.from_url(url, **options)
+        self.redis = redis.Redis(connection_pool=self.pool)
+        self.aio = redis.asyncio.Redis(connection_pool=self.async_pool)
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.redis.ping())
+        except redis.RedisError as e:
+            logger.warning(f"Redis ping failed: {e}")
+            return False
+
+    def get(self, key: str):
+        return self.redis.get(key)
+
+    def set(self, key: str, value, ex: Optional[int] = None):
+        return self.redis.set(key, value, ex=ex)
+
+    def mget(self, keys: Sequence) -> list:
+        return mget(self.redis, keys, self.chunk_size)
+
+    def mset(self, mapping: Dict, ex: Optional[int] = None):
+        mset(self.redis, mapping, ex, self.chunk_size)
+
+    def pipelined(self, items: Iterable, queue: Callable[[Any, Any], Any]) -> list:
+        return pipelined(self.redis, items, queue, self.chunk_size)
+
+    async def amget(self, keys: Sequence) -> list:
+        return await async_mget(self.aio, keys, self.chunk_size)
+
+    async def amset(self, mapping: Dict, ex: Optional[int] = None):
+        await async_mset(self.aio, mapping, ex, self.chunk_size)
+
+    async def apipelined(self, items: Iterable, queue: Callable[[Any, Any], Any]) -> List:
+        return await async_pipelined(self.aio, items, queue, self.chunk_size)
+
+    def close(self):
+        self.pool.disconnect()
+
+    async def aclose(self):
+        await self.async_pool.disconnect()
@@ -0,0 +1,203 @@
+"""
+Async repositories for the core models.
+
+Each repository wraps an AsyncSession and keeps the queries for one model
+in one place. Repositories only flush; the caller owns the transaction and
+commits (or lets the session roll back) once per request.
+
+Relationships are not loaded lazily under asyncio, so methods that return
+related objects load them eagerly with selectinload.
+"""
+from datetime import datetime
+from typing import Generic, Iterable, Optional, Sequence, Type, TypeVar
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from audit_ledger import append_entries
+from audit_partitions import timestamp_filter
+from direct_db_setup import AuditLog, Entity, User, UserSession
+from metrics import record_fraud_detection
+
+# Risk score from which an entity counts as high risk (compliance_overview uses the same)
+HIGH_RISK_THRESHOLD = 0.7
+
+ModelT = TypeVar("ModelT")
+
+
+class AsyncRepository(Generic[ModelT]):
+    """Primary-key access and paging shared by every repository"""
+
+    model: Type[ModelT]
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, pk: int) -> Optional[ModelT]:
+        return await self.session.get(self.model, pk)
+
+    async def list(self, offset: int = 0, limit: int = 100) -> Sequence[ModelT]:
+        result = await self.session.scalars(
+            select(self.model).order_by(self.model.id).offset(offset).limit(limit)
+        )
+        return result.all()
+
+    async def count(self) -> int:
+        return await self.session.scalar(select(func.count()).select_from(self.model))
+
+    async def add(self, obj: ModelT) -> ModelT:
+        self.session.add(obj)
+        await self.session.flush()
+        return obj
+
+    async def delete(self, obj: ModelT):
+        await self.session.delete(obj)
+        await self.session.flush()
+
+
+class UserRepository(AsyncRepository[User]):
+    model = User
+
+    async def get_by_username(self, username: str) -> Optional[User]:
+        return await self.session.scalar(select(User).where(User.username == username))
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        return await self.session.scalar(select(User).where(User.email == email))
+
+    async def get_with_sessions(self, user_id: int) -> Optional[User]:
+        return await self.session.scalar(
+            select(User).where(User.id == user_id).options(selectinload(User.sessions))
+        )
+
+    async def touch_last_login(self, user_id: int, when: datetime = None):
+        await self.session.execute(
+            update(User).where(User.id == user_id).values(last_login=when or datetime.utcnow())
+        )
+
+
+class UserSessionRepository(AsyncRepository[UserSession]):
+    model = UserSession
+
+    async def active_for_user(self, user_id: int) -> Sequence[UserSession]:
+        result = await self.session.scalars(
+            select(UserSession)
+            .where(UserSession.user_id == user_id, UserSession.status == "active")
+            .order_by(UserSession.last_activity.desc())
+        )
+        return result.all()
+
+    async def touch(self, session_id: int, when: datetime = None):
+        await self.session.execute(
+            update(UserSession)
+            .where(UserSession.id == session_id)
+            .values(last_activity=when or datetime.utcnow())
+        )
+
+    async def revoke(self, session_id: int):
+        await self.session.execute(
+            update(UserSession).where(UserSession.id == session_id).values(status="revoked")
+        )
+
+    async def expire_stale(self, now: datetime = None) -> int:
+        """Mark active sessions past expires_at as expired; returns how many"""
+        result = await self.session.execute(
+            update(UserSession)
+            .where(UserSession.status == "active", UserSession.expires_at < (now or datetime.utcnow()))
+            .values(status="expired")
+        )
+        return result.rowcount
+
+
+class EntityRepository(AsyncRepository[Entity]):
+    model = Entity
+
+    async def get_by_entity_id(self, entity_id: str) -> Optional[Entity]:
+        return await self.session.scalar(select(Entity).where(Entity.entity_id == entity_id))
+
+    async def get_by_tin(self, tin: str) -> Optional[Entity]:
+        return await self.session.scalar(select(Entity).where(Entity.tin == tin))
+
+    async def high_risk(self, threshold: float = HIGH_RISK_THRESHOLD, limit: int = 100) -> Sequence[Entity]:
+        result = await self.session.scalars(
+            select(Entity)
+            .where(Entity.risk_score >= threshold, Entity.status == "active")
+            .order_by(Entity.risk_score.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+    async def update_scores(self, entity_id: str, compliance_score: float = None, risk_score: float = None):
+        """Set an entity's scores; one that becomes high risk counts as a fraud detection"""
+        values = {"updated_at": datetime.utcnow()}
+        flagged = False
+        if compliance_score is not None:
+            values["compliance_score"] = compliance_score
+        if risk_score is not None:
+            values["risk_score"] = risk_score
+            if risk_score >= HIGH_RISK_THRESHOLD:
+                previous = await self.session.scalar(
+                    select(func.coalesce(Entity.risk_score, 0.0)).where(Entity.entity_id == entity_id)
+                )
+                flagged = previous is not None and previous < HIGH_RISK_THRESHOLD
+        await self.session.execute(update(Entity).where(Entity.entity_id == entity_id).values(**values))
+        if flagged:
+            record_fraud_detection("high")
+
+
+class AuditLogRepository(AsyncRepository[AuditLog]):
+    """
+    Append-only access to the audit ledger
+
+    audit_logs may be a partitioned table or, on SQLite, a view over monthly
+    shards, and every row needs its ledger seq and chain_hash, so entries
+    are written through audit_ledger.append_entries rather than the session.
+    """
+
+    model = AuditLog
+
+    async def add(self, obj: AuditLog) -> AuditLog:
+        """Chain one entry onto the ledger; returns it as stored, with seq and chain_hash"""
+        row = {column: getattr(obj, column) for column in
+               ("log_id", "user_id", "event_type", "entity_id", "operation", "details", "audit_hash",
+                "blockchain_tx_hash", "timestamp")}
+        row["timestamp"] = row["timestamp"] or datetime.utcnow()
+        await self.add_many([row])
+        return await self.session.scalar(select(AuditLog).where(AuditLog.log_id == row["log_id"]))
+
+    async def delete(self, obj: AuditLog):
+        raise NotImplementedError("audit_logs is append-only; old months are dropped by audit retention")
+
+    async def add_many(self, rows: Iterable[dict]) -> int:
+        """Chain audit rows onto the ledger in one multi-row insert; returns rows inserted"""
+        rows = list(rows)
+        if not rows:
+            return 0
+        return await append_entries(await self.session.connection(), rows)
+
+    async def recent(self, limit: int = 50, event_type: str = None,
+                     since: datetime = None, until: datetime = None) -> Sequence[AuditLog]:
+        query = select(AuditLog).where(timestamp_filter(since, until)).order_by(AuditLog.seq.desc()).limit(limit)
+        if event_type:
+            query = query.where(AuditLog.event_type == event_type)
+        return (await self.session.scalars(query)).all()
+
+    async def for_entity(self, entity_id: str, limit: int = 100,
+                         since: datetime = None, until: datetime = None) -> Sequence[AuditLog]:
+        result = await self.session.scalars(
+            select(AuditLog)
+            .where(AuditLog.entity_id == entity_id, timestamp_filter(since, until))
+            .order_by(AuditLog.timestamp.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+    async def for_user(self, user_id: int, limit: int = 100,
+                       since: datetime = None, until: datetime = None) -> Sequence[AuditLog]:
+        result = await self.session.scalars(
+            select(AuditLog)
+            .where(AuditLog.user_id == user_id, timestamp_filter(since, until))
+            .order_by(AuditLog.timestamp.desc())
+            .limit(limit)
+        )
+        return result.all()
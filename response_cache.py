@@ -0,0 +1,415 @@
+"""
+Two-tier read-through cache for read-only API routes.
+
+    from response_cache import response_cache
+
+    @router.get("/tax/status/{tpin}")
+    @response_cache(ttl=60, tags=lambda tpin: [f"taxpayer:{tpin}", "table:entities"])
+    async def tax_status(tpin: str):
+        ...
+
+A request is answered from, in order:
+
+  1. an in-process LRU, bounded by entry count and bytes; entries live
+     at most RESPONSE_CACHE_LOCAL_TTL seconds here, which bounds how long
+     another worker can serve a response invalidated elsewhere
+  2. Redis (redis_manager), shared by all workers, for the route's ttl;
+     one pipelined round trip fetches the entry and its tags' versions
+  3. the route itself. Concurrent misses on one key wait for the same
+     call instead of each reaching the database
+
+Invalidation is by tag: invalidate("taxpayer:123") drops local entries
+carrying the tag and queues a bump of the tag's version in Redis, which
+retires every shared entry written under the old version. invalidate()
+never waits for Redis: a background thread publishes queued bumps, and
+any Redis call this process makes publishes them first, so its own
+reads never see a retired entry. While Redis is unreachable the bumps
+wait for the next successful call.
+install_cache_invalidation does this for "table:<name>" after each
+commit that wrote to a table.
+
+Cached responses carry a strong ETag and Cache-Control: max-age set to
+their remaining lifetime, and If-None-Match is answered with 304.
+CacheControlMiddleware leaves these headers alone; other /api/ responses
+stay no-store. Only 200 responses are cached, and routes whose output
+depends on the caller must pass vary=("Authorization",) and private=True.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_mapper
+
+from redis_breaker import CircuitBreaker, RedisUnavailable
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "64"))
+RESPONSE_CACHE_LOCAL_TTL = float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", "5"))
+REDIS_PREFIX = "api:cache:"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: str
+    expires_at: float  # wall clock, shared between workers
+    tags: Tuple[str, ...]
+
+    def max_age(self, now: float) -> int:
+        return max(0, int(self.expires_at - now))
+
+    def dumps(self, versions: Sequence[int]) -> bytes:
+        header = json.dumps({"media_type": self.media_type, "etag": self.etag, "expires_at": self.expires_at,
+                             "tags": self.tags, "versions": list(versions)}).encode()
+        return header + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> Tuple["CachedResponse", List[int]]:
+        header, body = data.split(b"\n", 1)
+        meta = json.loads(header)
+        return cls(body, meta["media_type"], meta["etag"], meta["expires_at"], tuple(meta["tags"])), meta["versions"]
+
+
+class LocalCache:
+    """LRU with TTL, bounded by entry count and total body bytes"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = int(RESPONSE_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, float]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: float) -> Optional[CachedResponse]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, local_expiry = item
+        if now >= local_expiry:
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse, local_expiry: float):
+        if len(entry.body) > self.max_bytes // 8:
+            return  # one large response must not flush the rest
+        self.delete(key)
+        self._entries[key] = (entry, local_expiry)
+        self.bytes += len(entry.body)
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self.delete(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        entry = item[0]
+        self.bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.get(tag, set())
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response: Response):
+        self.response = response
+
+
+class ResponseCache:
+    def __init__(self, redis_manager=None, local: LocalCache = None, local_ttl: float = RESPONSE_CACHE_LOCAL_TTL,
+                 breaker: Optional[CircuitBreaker] = None, background: bool = True):
+        """
+        Initialize the response cache
+
+        Args:
+            redis_manager: RedisManager for the shared tier; None keeps the cache in-process
+            local: In-process tier (defaults to a LocalCache with the configured bounds)
+            local_ttl: Longest time an entry is served from the in-process tier
+            breaker: Circuit breaker guarding Redis; while it is open only the local tier is used
+            background: Publish invalidations from a thread; False publishes inline (for tests)
+        """
+        self.redis = redis_manager
+        self.breaker = breaker
+        self.local = local or LocalCache()
+        self.local_ttl = local_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        self.background = background
+        self._unpublished: Set[str] = set()
+        self._lock = threading.Lock()  # the local tier and _unpublished, shared with committing threads
+        self._publish_lock = threading.Lock()
+        self._publisher: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{REDIS_PREFIX}tag:{tag}"
+
+    def _redis_get(self, key: str, tags: Sequence[str]) -> Tuple[Optional[CachedResponse], List[int]]:
+        """The shared entry, if still valid, and the tags' current versions"""
+        pipe = self.redis.redis.pipeline(transaction=False)
+        pipe.get(REDIS_PREFIX + key)
+        for tag in tags:
+            pipe.get(self._tag_key(tag))
+        data, *versions = pipe.execute()
+        versions = [int(v or 0) for v in versions]
+        if data is None:
+            return None, versions
+        entry, written_under = CachedResponse.loads(data)
+        if versions != written_under:
+            return None, versions  # a tag was invalidated after this entry was written
+        return entry, versions
+
+    def _redis_set(self, key: str, entry: CachedResponse, versions: List[int], ttl: int):
+        # Versions were read before the route ran, so an invalidation since then retires this entry
+        self.redis.redis.set(REDIS_PREFIX + key, entry.dumps(versions), ex=ttl)
+
+    def _redis_call(self, call, *args):
+        # Queued invalidations go out before anything is read from Redis
+        def run():
+            if self._unpublished:
+                self._publish_pending()
+            return call(*args)
+
+        return self.breaker.call(run) if self.breaker is not None else run()
+
+    async def _shared(self, call, *args):
+        """Run a Redis call off the event loop; any Redis failure degrades to the local tier"""
+        if self.redis is None:
+            return None
+        if self.breaker is not None and not self.breaker.allow():
+            return None  # no thread hop while Redis is known to be down
+        try:
+            return await asyncio.to_thread(self._redis_call, call, *args)
+        except Exception as e:
+            logger.debug(f"Response cache Redis tier unavailable: {e}")
+            return None
+
+    async def get_or_compute(self, key: str, ttl: int, tags: Sequence[str],
+                             compute: Callable[[], Awaitable[Optional[Tuple[bytes, str]]]]
+                             ) -> Tuple[Optional[CachedResponse], str]:
+        """
+        Cached response for key, computing it at most once per process on a miss
+
+        compute returns (body, media_type), or None for a response that must
+        not be cached. Returns the entry and where it came from.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self.local.get(key, now)
+        if entry is not None:
+            self.stats["local_hits"] += 1
+            return entry, "HIT-LOCAL"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(inflight), "HIT-COALESCED"
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            entry, versions = await self._shared(self._redis_get, key, tags) or (None, None)
+            source = "HIT-REDIS"
+            if entry is None or entry.expires_at <= now:
+                source = "MISS"
+                result = await compute()
+                entry = None
+                if result is not None:
+                    body, media_type = result
+                    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                    entry = CachedResponse(body, media_type, etag, time.time() + ttl, tuple(tags))
+                    if versions is not None:
+                        await self._shared(self._redis_set, key, entry, versions, ttl)
+                self.stats["misses"] += 1
+            else:
+                self.stats["redis_hits"] += 1
+            # Not kept if this process invalidated anything meanwhile; it may predate the write
+            with self._lock:
+                if entry is not None and generation == self._generation:
+                    self.local.set(key, entry, min(entry.expires_at, time.time() + self.local_ttl))
+            future.set_result(entry)
+            return entry, source
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here so only the waiters see it
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _publish_pending(self):
+        """Bump the versions of the queued tags in Redis; they stay queued if this fails"""
+        with self._publish_lock:
+            with self._lock:
+                tags = sorted(self._unpublished)
+            if not tags:
+                return
+            pipe = self.redis.redis.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(self._tag_key(tag))
+                pipe.expire(self._tag_key(tag), 7 * 24 * 3600)
+            pipe.execute()
+            with self._lock:
+                self._unpublished.difference_update(tags)
+
+    def publish(self):
+        """Publish queued invalidations now, through the breaker"""
+        try:
+            self._redis_call(lambda: None)
+        except RedisUnavailable:
+            pass  # published by the first Redis call after recovery
+        except Exception as e:
+            logger.warning(f"Could not publish cache invalidations to Redis yet: {e}")
+
+    def _run_publisher(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.publish()
+
+    def invalidate(self, *tags: str) -> int:
+        """Retire every cached response carrying one of these tags, in all workers; does not wait for Redis"""
+        with self._lock:
+            self._generation += 1
+            dropped = self.local.invalidate(tags)
+            if self.redis is None or not tags:
+                return dropped
+            self._unpublished.update(tags)
+            if self.background and self._publisher is None:
+                self._publisher = threading.Thread(target=self._run_publisher, name="response-cache-publisher",
+                                                   daemon=True)
+                self._publisher.start()
+        if self.background:
+            self._wake.set()
+        else:
+            self.publish()
+        return dropped
+
+    def __call__(self, ttl: int = CACHE_TTL_SECONDS, tags=None, vary: Sequence[str] = (), private: bool = False):
+        """
+        Decorator caching a read-only route's 200 responses
+
+        Args:
+            ttl: Seconds a response is served from the cache
+            tags: Tag list, or a callable receiving the route's arguments by name
+            vary: Request headers that are part of the cache key (and the Vary header)
+            private: Cache-Control: private, for per-caller responses
+        """
+        scope = "private" if private else "public"
+        tag_params = list(inspect.signature(tags).parameters) if callable(tags) else []
+
+        def decorator(func):
+            signature = inspect.signature(func)
+            request_param = next((name for name, p in signature.parameters.items() if p.annotation is Request), None)
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                request: Request = kwargs[request_param] if request_param else kwargs.pop("_cache_request")
+                key_parts = [request.method, request.url.path, str(sorted(request.query_params.multi_items()))]
+                key_parts += [request.headers.get(name, "") for name in vary]
+                key = hashlib.sha256("|".join(key_parts).encode()).hexdigest()
+                if callable(tags):
+                    route_tags = list(tags(**{name: kwargs[name] for name in tag_params}))
+                else:
+                    route_tags = list(tags or ())
+
+                async def compute():
+                    result = await func(*args, **kwargs)
+                    if isinstance(result, Response):
+                        if result.status_code != 200:
+                            raise _Uncacheable(result)
+                        return result.body, result.media_type
+                    body = json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(",", ":")).encode()
+                    return body, "application/json"
+
+                try:
+                    entry, source = await self.get_or_compute(key, ttl, route_tags, compute)
+                except _Uncacheable as uncacheable:
+                    return uncacheable.response
+                headers = {
+                    "ETag": entry.etag,
+                    "Cache-Control": f"{scope}, max-age={entry.max_age(time.time())}",
+                    "X-Cache": source,
+                }
+                if vary:
+                    headers["Vary"] = ", ".join(vary)
+                if request.headers.get("if-none-match") in (entry.etag, f"W/{entry.etag}"):
+                    return Response(status_code=304, headers=headers)
+                return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+            if request_param is None:
+                # FastAPI reads the signature; ask it for the request too
+                parameters = list(signature.parameters.values())
+                position = next((i for i, p in enumerate(parameters) if p.kind is p.VAR_KEYWORD), len(parameters))
+                parameters.insert(position, inspect.Parameter("_cache_request", inspect.Parameter.KEYWORD_ONLY,
+                                                              annotation=Request))
+                wrapper.__signature__ = signature.replace(parameters=parameters)
+            return wrapper
+
+        return decorator
+
+
+def install_cache_invalidation(cache: ResponseCache, session_class=Session):
+    """Invalidate the "table:<name>" tag of every table a committed session of session_class wrote to"""
+
+    @event.listens_for(session_class, "after_flush")
+    def _collect(session, flush_context):
+        changed = session.info.setdefault("cache_tables", set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            changed.add(object_mapper(obj).local_table.name)
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _collect_bulk(orm_execute_state):
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and (orm_execute_state.is_update or orm_execute_state.is_delete):
+            orm_execute_state.session.info.setdefault("cache_tables", set()).add(mapper.local_table.name)
+
+    @event.listens_for(session_class, "after_commit")
+    def _invalidate(session):
+        changed = session.info.pop("cache_tables", None)
+        if changed:
+            cache.invalidate(*(f"table:{table}" for table in sorted(changed)))
+
+    @event.listens_for(session_class, "after_rollback")
+    def _discard(session):
+        session.info.pop("cache_tables", None)
+
+
+# Process-wide cache used by the routers; main.py gives it redis_manager as its shared tier
+response_cache = ResponseCache()
@@ -1,32 +1,230 @@
 """
 Script to create a backup of the SQLite database
+Run with: python -m scripts.backup_db [--incremental] [--keep N]
+          python -m scripts.backup_db --restore NAME --to PATH
+
+Snapshots are taken with the SQLite online backup API in a single step,
+which is one read transaction on the source. The app runs zra.db in WAL
+mode, where that reader does not block writers and their commits cannot
+restart the copy (a stepwise backup starts over after every commit from
+another connection, so it may never finish on a busy database). The
+snapshot is made in memory, or in a temporary file next to the backups
+for databases over SNAPSHOT_IN_MEMORY_MB.
+
+Full mode writes one gzip-compressed snapshot per run and skips the write
+when the database has not changed since the newest snapshot. Incremental
+mode splits the snapshot into blocks of pages and stores each block once,
+by content hash, so a run only writes the blocks that changed. Both modes
+keep the newest --keep snapshots and delete the rest.
 """
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
 import shutil
+import sqlite3
+import sys
+import time
+import zlib
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-def backup_database():
+BASE_DIR = Path(__file__).parent.parent
+DB_PATH = BASE_DIR / "zra.db"
+BACKUP_DIR = BASE_DIR / "backups"
+
+SNAPSHOT_IN_MEMORY_MB = 256  # larger databases are snapshotted to a temporary file
+PAGES_PER_BLOCK = 64  # incremental dedup unit
+KEEP = 7
+COPY_BUFFER = 1 << 20
+
+
+def snapshot(db_path: Path, target: Path = None) -> dict:
+    """
+    Copy db_path with the online backup API, in one step.
+
+    The copy is made in memory and returned as "data" when target is None,
+    otherwise written to target. Also returns the page size, page count
+    and elapsed time.
+    """
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    destination = sqlite3.connect(":memory:" if target is None else target)
+    start = time.perf_counter()
+    try:
+        source.backup(destination, pages=-1)
+        page_size = destination.execute("PRAGMA page_size").fetchone()[0]
+        page_count = destination.execute("PRAGMA page_count").fetchone()[0]
+        data = destination.serialize() if target is None else None
+    finally:
+        destination.close()
+        source.close()
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "seconds": time.perf_counter() - start,
+        "data": data,
+    }
+
+
+def file_digest(f) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    for chunk in iter(lambda: f.read(COPY_BUFFER), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def full_backups(backup_dir: Path) -> list:
+    return sorted(backup_dir.glob("zra_backup_*.db.gz"))
+
+
+def store_full(open_snapshot, backup_dir: Path, timestamp: str) -> tuple:
+    """gzip the snapshot unless the newest full backup has the same content"""
+    with open_snapshot() as f:
+        digest = file_digest(f)[:16]
+    existing = full_backups(backup_dir)
+    if existing and existing[-1].name.endswith(f"_{digest}.db.gz"):
+        return existing[-1], False
+
+    backup_path = backup_dir / f"zra_backup_{timestamp}_{digest}.db.gz"
+    partial = backup_path.with_suffix(".partial")
+    with open_snapshot() as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER)
+    partial.replace(backup_path)
+    return backup_path, True
+
+
+def store_incremental(open_snapshot, backup_dir: Path, timestamp: str, page_size: int) -> tuple:
+    """Store the blocks of the snapshot that are not in the object store yet"""
+    objects = backup_dir / "incremental" / "objects"
+    manifests = backup_dir / "incremental" / "manifests"
+    manifests.mkdir(parents=True, exist_ok=True)
+
+    block_size = page_size * PAGES_PER_BLOCK
+    blocks, new_blocks, shipped, size = [], 0, 0, 0
+    with open_snapshot() as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            size += len(block)
+            digest = hashlib.blake2b(block, digest_size=20).hexdigest()
+            blocks.append(digest)
+            path = objects / digest[:2] / digest
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = zlib.compress(block, 6)
+            partial = path.with_suffix(".partial")
+            partial.write_bytes(data)
+            partial.replace(path)
+            new_blocks += 1
+            shipped += len(data)
+
+    # Two runs in the same microsecond only share a name if they stored the same blocks
+    content = hashlib.blake2b("".join(blocks).encode(), digest_size=8).hexdigest()
+    manifest_path = manifests / f"zra_{timestamp}_{content}.json"
+    manifest = {
+        "created": timestamp,
+        "page_size": page_size,
+        "block_size": block_size,
+        "size": size,
+        "blocks": blocks,
+    }
+    manifest_path.write_text(json.dumps(manifest))
+    return manifest_path, new_blocks, len(blocks), shipped
+
+
+def rotate(backup_dir: Path, keep: int):
+    """Keep the newest snapshots of each kind and drop unreferenced blocks"""
+    for old in full_backups(backup_dir)[:-keep]:
+        old.unlink()
+
+    incremental = backup_dir / "incremental"
+    if not incremental.exists():
+        return
+    manifests = sorted((incremental / "manifests").glob("zra_*.json"))
+    for old in manifests[:-keep]:
+        old.unlink()
+    referenced = set()
+    for manifest in manifests[-keep:]:
+        referenced.update(json.loads(manifest.read_text())["blocks"])
+    for path in (incremental / "objects").glob("*/*"):
+        if path.name not in referenced:
+            path.unlink()
+
+
+def restore(name: str, target: Path, backup_dir: Path = BACKUP_DIR):
+    """Rebuild a database file from a full backup or an incremental manifest"""
+    partial = target.with_name(target.name + ".partial")
+    if name.endswith(".db.gz"):
+        with gzip.open(backup_dir / name, "rb") as src, open(partial, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER)
+    else:
+        incremental = backup_dir / "incremental"
+        manifest = json.loads((incremental / "manifests" / name).read_text())
+        with open(partial, "wb") as dst:
+            for digest in manifest["blocks"]:
+                dst.write(zlib.decompress((incremental / "objects" / digest[:2] / digest).read_bytes()))
+    # A WAL left next to the old file would be replayed onto the restored one
+    for path in (target.with_name(target.name + "-wal"), target.with_name(target.name + "-shm")):
+        path.unlink(missing_ok=True)
+    partial.replace(target)
+    print(f"Database restored from {name} to: {target}")
+
+
+def backup_database(incremental: bool = False, keep: int = KEEP, db_path: Path = DB_PATH,
+                    backup_dir: Path = BACKUP_DIR):
     """Create a backup of the SQLite database"""
-    # Define paths
-    base_dir = Path(__file__).parent.parent
-    db_path = base_dir / "zra.db"
-    backup_dir = base_dir / "backups"
-    
     # Create backup directory if it doesn't exist
     backup_dir.mkdir(exist_ok=True)
-    
+
     # Create timestamp for backup file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = backup_dir / f"zra_backup_{timestamp}.db"
-    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snapshot_path = backup_dir / f".snapshot_{timestamp}.db"
+
     try:
-        # Copy the database file
-        shutil.copy2(db_path, backup_path)
-        print(f"Database backup created successfully at: {backup_path}")
+        if not db_path.exists():
+            raise FileNotFoundError(db_path)
+        if db_path.stat().st_size <= SNAPSHOT_IN_MEMORY_MB * 1e6:
+            stats = snapshot(db_path)
+            open_snapshot = partial(io.BytesIO, stats["data"])
+        else:
+            stats = snapshot(db_path, snapshot_path)
+            open_snapshot = partial(open, snapshot_path, "rb")
+        size_mb = stats["page_size"] * stats["page_count"] / 1e6
+        print(f"Snapshot of {size_mb:,.1f} MB taken in {stats['seconds']:.2f}s")
+
+        if incremental:
+            path, new_blocks, total_blocks, shipped = store_incremental(
+                open_snapshot, backup_dir, timestamp, stats["page_size"]
+            )
+            print(f"Incremental backup created successfully at: {path} "
+                  f"({new_blocks}/{total_blocks} blocks changed, {shipped / 1e6:,.1f} MB written)")
+        else:
+            path, written = store_full(open_snapshot, backup_dir, timestamp)
+            if written:
+                print(f"Database backup created successfully at: {path}")
+            else:
+                print(f"Database unchanged since {path.name}, no new backup written")
+
+        rotate(backup_dir, keep)
         return True
     except Exception as e:
         print(f"Error creating database backup: {e}")
         return False
+    finally:
+        if snapshot_path.exists():
+            os.remove(snapshot_path)
 
 if __name__ == "__main__":
-    backup_database()
+    parser = argparse.ArgumentParser(description="Back up or restore zra.db")
+    parser.add_argument("--incremental", action="store_true", help="store only changed blocks of pages")
+    parser.add_argument("--keep", type=int, default=KEEP, help="snapshots of each kind to keep")
+    parser.add_argument("--restore", metavar="NAME", help="backup file or manifest name to restore")
+    parser.add_argument("--to", type=Path, default=DB_PATH, help="restore target (default: zra.db)")
+    args = parser.parse_args()
+
+    if args.restore:
+        restore(args.restore, args.to)
+    else:
+        sys.exit(0 if backup_database(args.incremental, args.keep) else 1)
@@ -0,0 +1,185 @@
+"""
+Benchmark async repositories against sync sessions in async handlers.
+Run with: python -m scripts.bench_async_db --clients 500 --requests 20
+          python -m scripts.bench_async_db --url postgresql://user:pw@localhost/zra_bench
+
+A fresh database (a temporary SQLite file, or the tables of --url, which
+are dropped afterwards) is seeded with --users users and --entities
+entities. Each simulated client then issues --requests requests; a request
+looks up a user by username, lists their active sessions, fetches an
+entity by TIN and, every --write-every requests, writes an audit row.
+
+  blocking: SessionLocal called straight from the coroutine, which
+            stalls the event loop for every query
+  thread:   SessionLocal via asyncio.to_thread (the default executor)
+  async:    AsyncSessionLocal and the repositories
+
+Reported: requests/s, p50/p99 latency at the given concurrency, and the
+longest the event loop went without running a 10 ms ticker task (what any
+other request on the same worker would have waited).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from db_profile import create_async_engine, create_engine
+from direct_db_setup import AuditLog, Base, Entity, User, UserSession
+from repositories import AuditLogRepository, EntityRepository, UserRepository, UserSessionRepository
+
+
+def seed(engine, users: int, entities: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x",
+             "full_name": f"User {i}", "role": "officer"} for i in range(users)
+        ])
+        conn.execute(UserSession.__table__.insert(), [
+            {"user_id": i + 1, "device_id": f"device-{i}", "status": "active"} for i in range(users)
+        ])
+        conn.execute(Entity.__table__.insert(), [
+            {"entity_id": f"entity-{i}", "name": f"Entity {i}", "type": "business",
+             "tin": f"{1000000000 + i}", "risk_score": random.random()} for i in range(entities)
+        ])
+
+
+def audit_row(user_id: int) -> dict:
+    return {"log_id": f"AUDIT-{uuid.uuid4().hex}", "user_id": user_id, "event_type": "data_access",
+            "operation": "read", "audit_hash": "0" * 64}
+
+
+def sync_request(SessionLocal, username: str, tin: str, write: bool):
+    with SessionLocal() as session:
+        user = session.scalar(select(User).where(User.username == username))
+        session.scalars(select(UserSession).where(UserSession.user_id == user.id,
+                                                  UserSession.status == "active")).all()
+        session.scalar(select(Entity).where(Entity.tin == tin))
+        if write:
+            session.execute(AuditLog.__table__.insert(), [audit_row(user.id)])
+            session.commit()
+
+
+async def async_request(AsyncSessionLocal, username: str, tin: str, write: bool):
+    async with AsyncSessionLocal() as session:
+        user = await UserRepository(session).get_by_username(username)
+        await UserSessionRepository(session).active_for_user(user.id)
+        await EntityRepository(session).get_by_tin(tin)
+        if write:
+            await AuditLogRepository(session).add_many([audit_row(user.id)])
+            await session.commit()
+
+
+TICK = 0.01
+
+
+async def run_clients(handler, args) -> tuple:
+    latencies = []
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal stall
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            stall = max(stall, time.perf_counter() - start - TICK)
+
+    async def client(seed_value: int):
+        rng = random.Random(seed_value)
+        for i in range(args.requests):
+            username = f"user{rng.randrange(args.users)}"
+            tin = f"{1000000000 + rng.randrange(args.entities)}"
+            start = time.perf_counter()
+            await handler(username, tin, i % args.write_every == 0)
+            latencies.append(time.perf_counter() - start)
+
+    monitor = asyncio.create_task(ticker())
+    await asyncio.gather(*(client(c) for c in range(args.clients)))
+    done.set()
+    await monitor
+    return latencies, stall
+
+
+def report(name: str, latencies: list, stall: float, elapsed: float):
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{name:>8}: {len(latencies) / elapsed:10,.0f} req/s  "
+          f"p50 {cuts[49] * 1000:7.1f} ms  p99 {cuts[98] * 1000:7.1f} ms  "
+          f"max loop stall {stall * 1000:7.1f} ms")
+
+
+def make_handler(mode: str, url: str):
+    """Returns (handler, dispose) for one mode against url"""
+    if mode == "async":
+        async_engine = create_async_engine(url)
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+        async def handler(username, tin, write):
+            await async_request(AsyncSessionLocal, username, tin, write)
+
+        return handler, async_engine.dispose
+
+    sync_engine = create_engine(url)
+    SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+    if mode == "thread":
+        async def handler(username, tin, write):
+            await asyncio.to_thread(sync_request, SessionLocal, username, tin, write)
+    else:
+        async def handler(username, tin, write):
+            sync_request(SessionLocal, username, tin, write)
+
+    async def dispose():
+        sync_engine.dispose()
+
+    return handler, dispose
+
+
+async def bench(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            url = args.url or f"sqlite:///{Path(tmp) / mode}.db"
+            seed_engine = create_engine(url)
+            Base.metadata.drop_all(seed_engine)
+            seed(seed_engine, args.users, args.entities)
+            handler, dispose = make_handler(mode, url)
+            try:
+                start = time.perf_counter()
+                latencies, stall = await run_clients(handler, args)
+                report(mode, latencies, stall, time.perf_counter() - start)
+            finally:
+                await dispose()
+                if args.url:
+                    Base.metadata.drop_all(seed_engine)
+                seed_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--write-every", type=int, default=10, help="one audit write per N requests")
+    parser.add_argument("--url", help="database to benchmark instead of a temporary SQLite file")
+    parser.add_argument("--modes", nargs="+", default=["blocking", "thread", "async"],
+                        choices=["blocking", "thread", "async"])
+    args = parser.parse_args()
+
+    print(f"=== {args.clients} concurrent clients x {args.requests} requests ===")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark audit ledger appends and integrity verification.
+Run with: python -m scripts.bench_audit_ledger --entries 1000000
+
+Builds a ledger of --entries audit events in a temporary SQLite database
+(batches of --batch, as the audit writer flushes them), then times:
+
+  verify_entry:  single-entry verification with its inclusion proof, for
+                 --samples random entries
+  full rehash:   what checking one entry cost before, rehashing every row
+                 (timed over a 100,000 entry range and scaled up)
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from audit_ledger import MAX_RANGE, append_entries, verify_entry, verify_range
+from audit_writer import _row, make_event
+from db_profile import create_async_engine
+from direct_db_setup import Base
+
+
+async def bench(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite:///{Path(tmp) / 'ledger.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        log_ids = []
+        start = time.perf_counter()
+        for offset in range(0, args.entries, args.batch):
+            events = [make_event("data_access", "read", entity_id=i, user_id=i % 100, details={"field": "tin"})
+                      for i in range(offset, min(offset + args.batch, args.entries))]
+            log_ids.extend(e["log_id"] for e in events)
+            async with engine.begin() as conn:
+                await append_entries(conn, [_row(e) for e in events])
+        elapsed = time.perf_counter() - start
+        print(f"append:       {args.entries:,} entries in {elapsed:.1f}s ({args.entries / elapsed:,.0f} entries/s)")
+
+        async with engine.connect() as conn:
+            timings = []
+            for log_id in random.sample(log_ids, args.samples):
+                start = time.perf_counter()
+                result = await verify_entry(conn, log_id)
+                timings.append(time.perf_counter() - start)
+                assert result["valid"], result
+            print(f"verify_entry: p50 {statistics.median(timings) * 1000:.1f} ms, "
+                  f"max {max(timings) * 1000:.1f} ms over {args.samples} entries")
+
+            span = min(MAX_RANGE, args.entries)
+            start = time.perf_counter()
+            report = await verify_range(conn, 1, span)
+            elapsed = time.perf_counter() - start
+            assert report["valid"], report
+            print(f"full rehash:  {span:,} entries in {elapsed:.1f}s "
+                  f"(~{elapsed * args.entries / span:,.0f}s for {args.entries:,}, "
+                  f"~{elapsed * 3e8 / span / 3600:,.1f}h for 300M)")
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"=== Audit ledger with {args.entries:,} entries ===")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark entity writes with inline auditing against the audit pipeline.
+Run with: python -m scripts.bench_audit_writer --clients 50 --writes 100
+
+Each client updates random entities, one transaction per write.
+
+  inline:   the write transaction also inserts its audit_logs row, as the
+            init.sql row trigger did
+  pipeline: install_session_auditing + AuditWriter; the audit row is
+            written by the background flusher after commit
+
+Reported: writes/s and p50/p99 write latency, plus how long the pipeline
+took to drain its queue once the clients finished.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from audit_writer import AuditWriter, _row, change_event, install_session_auditing
+from db_profile import create_async_engine
+from direct_db_setup import AuditLog, Base, Entity
+
+
+class PipelineSession(Session):
+    """Only sessions of this class are audited by the pipeline"""
+
+
+async def seed(engine, entities: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(Entity.__table__.insert(), [
+            {"entity_id": f"entity-{i}", "name": f"Entity {i}", "type": "business", "tin": f"{1000000000 + i}"}
+            for i in range(entities)
+        ])
+
+
+async def run_clients(Sessions, args, inline: bool) -> list:
+    latencies = []
+
+    async def client(seed_value: int):
+        rng = random.Random(seed_value)
+        for _ in range(args.writes):
+            start = time.perf_counter()
+            async with Sessions() as session:
+                entity = await session.scalar(select(Entity).where(Entity.id == rng.randrange(1, args.entities)))
+                entity.risk_score = rng.random()
+                if inline:
+                    await session.flush()
+                    session.add(AuditLog(**_row(change_event(entity, "UPDATE"))))
+                await session.commit()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(c) for c in range(args.clients)))
+    return latencies
+
+
+async def bench(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("inline", "pipeline"):
+            # One connection: SQLite has a single writer, and read-then-write
+            # transactions on several connections fail with "database is locked"
+            engine = create_async_engine(f"sqlite:///{Path(tmp) / mode}.db", pool_size=1, max_overflow=0)
+            await seed(engine, args.entities)
+            if mode == "inline":
+                Sessions = async_sessionmaker(engine, expire_on_commit=False)
+            else:
+                writer = AuditWriter(engine, Path(tmp) / "spool")
+                install_session_auditing(writer, PipelineSession)
+                await writer.start()
+                Sessions = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=PipelineSession)
+
+            start = time.perf_counter()
+            latencies = await run_clients(Sessions, args, inline=mode == "inline")
+            elapsed = time.perf_counter() - start
+            drain = ""
+            if mode == "pipeline":
+                drain_start = time.perf_counter()
+                await writer.stop()
+                drain = (f"  drained in {time.perf_counter() - drain_start:.2f}s "
+                         f"({writer.stats['batches']} batches)")
+
+            cuts = statistics.quantiles(latencies, n=100)
+            print(f"{mode:>8}: {len(latencies) / elapsed:8,.0f} writes/s  "
+                  f"p50 {cuts[49] * 1000:6.1f} ms  p99 {cuts[98] * 1000:6.1f} ms{drain}")
+            await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=100, help="writes per client")
+    parser.add_argument("--entities", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"=== {args.clients} clients x {args.writes} audited entity updates ===")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Micro-benchmark of per-request middleware overhead.
+Run with: python -m scripts.bench_middleware --requests 20000
+
+Builds the main.py middleware stack (CORS, rate limiting, GZip, cache
+control) twice, once with the previous BaseHTTPMiddleware layers and once
+with the pure ASGI ones, and calls each app in-process through the ASGI
+interface so the numbers exclude sockets and HTTP parsing. The bare app
+with no middleware is measured as the baseline. Redis is replaced by a
+limiter that never fills, so only middleware cost is measured.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import CacheControlMiddleware, RateLimitMiddleware
+from rate_limiter import RateLimitResult
+from token_bucket import TokenBucketPreFilter
+
+
+class UnlimitedLimiter:
+    limit = 10**9
+    window = 60
+
+    def hit(self, rate_key, cost=1):
+        return RateLimitResult(True, 0, self.limit, 0)
+
+
+class LegacyCacheControlMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation previously defined in main.py"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if request.url.path.startswith("/api/"):
+            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+        elif any(ext in request.url.path for ext in [".js", ".css", ".png", ".jpg", ".jpeg", ".gif", ".svg"]):
+            response.headers["Cache-Control"] = "public, max-age=31536000"
+        return response
+
+
+def legacy_rate_limit_dispatch(prefilter: TokenBucketPreFilter):
+    async def dispatch(request: Request, call_next):
+        prefilter.check(request.client.host)
+        return await call_next(request)
+    return dispatch
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/ping")
+    async def ping():
+        return {"status": "ok", "payload": "x" * 2048}
+
+    if stack == "bare":
+        return app
+
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    prefilter = TokenBucketPreFilter(UnlimitedLimiter(), sync_every=10**9, sync_interval_ms=10**9)
+    if stack == "legacy":
+        app.add_middleware(BaseHTTPMiddleware, dispatch=legacy_rate_limit_dispatch(prefilter))
+    else:
+        app.add_middleware(RateLimitMiddleware, prefilter=prefilter)
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(LegacyCacheControlMiddleware if stack == "legacy" else CacheControlMiddleware)
+    return app
+
+
+async def call(app, scope):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(dict(scope), receive, send)
+
+
+async def measure(app, requests: int):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/ping",
+        "raw_path": b"/api/v1/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip"), (b"origin", b"http://bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    # Startup and warm-up so the middleware stack is built before timing
+    for _ in range(200):
+        await call(app, scope)
+
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call(app, scope)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("=== Middleware Overhead Benchmark ===")
+    results = {}
+    for stack in ("bare", "legacy", "asgi"):
+        samples = asyncio.run(measure(build_app(stack), args.requests))
+        results[stack] = statistics.median(samples)
+        samples.sort()
+        print(f"\n{stack:<7} median {results[stack]:7.1f} us   p99 {samples[int(len(samples) * 0.99)]:7.1f} us")
+
+    print("\nPer-request middleware overhead (median minus bare app):")
+    print(f"- BaseHTTPMiddleware stack: {results['legacy'] - results['bare']:7.1f} us")
+    print(f"- Pure ASGI stack:          {results['asgi'] - results['bare']:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark the staged MySQL -> PostgreSQL migration on a synthetic register.
+Run with: python -m scripts.bench_migration --dsn postgresql://user:pw@localhost/zra_bench
+          python -m scripts.bench_migration --transform-only
+
+Synthetic source tables are generated lazily (half the taxpayers are
+individuals, half businesses, each with two tax returns and a payment,
+plus penalties, audit cases and 1% orphaned child rows) and fed to
+DatabaseMigrator in place of the MySQL cursor. Everything after
+extraction is the real pipeline: ROW_TRANSFORMS, COPY into the staging
+tables, and the ENTITIES_UPSERT / ENTITY_DETAILS_UPDATE /
+OBLIGATIONS_UPSERT / CASES_UPSERT merges, whose joins go through
+idx_entities_tin. --dsn must be a scratch database with the init.sql
+schema; its entities, obligations and cases are upserted, never dropped.
+
+Reported: rows/s per table and overall, and peak RSS. --transform-only
+skips PostgreSQL and times the row transforms alone.
+"""
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from migrate_mysql_to_postgres import CHUNK_SIZE, CONCURRENCY, ROW_TRANSFORMS, SOURCE_TABLES, DatabaseMigrator
+
+
+def tpin(i: int) -> str:
+    return f"{1000000000 + i}"
+
+
+def synthetic_tables(n: int) -> dict:
+    """Generators over n taxpayers and their child rows, in primary key order"""
+    registered = date(2024, 1, 1)
+
+    def taxpayers():
+        for i in range(n):
+            yield {'TPIN': tpin(i), 'TaxpayerType': 'Individual' if i % 2 == 0 else 'Business',
+                   'RegistrationDate': registered, 'Status': 'Active',
+                   'PrimaryEmail': f"tp{i}@example.com", 'PrimaryPhone': None}
+
+    def individuals():
+        for i in range(0, n, 2):
+            yield {'IndividualID': i, 'TPIN': tpin(i), 'FirstName': 'First', 'LastName': f"Last{i}",
+                   'email': f"person{i}@example.com"}
+
+    def businesses():
+        for i in range(1, n, 2):
+            yield {'BusinessID': i, 'TPIN': tpin(i), 'BusinessName': f"Business {i}", 'Email': f"biz{i}@example.com"}
+
+    def taxreturns():
+        for i in range(n + n // 100):  # the last 1% reference unknown TPINs
+            for quarter in (1, 2):
+                yield {'ReturnID': 2 * i + quarter, 'TPIN': tpin(i), 'TaxPeriod': f"2024-Q{quarter}",
+                       'DueDate': registered, 'Status': 'Filed'}
+
+    def payments():
+        for i in range(n):
+            yield {'PaymentID': i, 'TPIN': tpin(i), 'PaymentDate': registered, 'AmountPaid': 100,
+                   'PaymentMethod': 'Bank Transfer'}
+
+    def penalties():
+        for i in range(0, n, 10):
+            yield {'PenaltyID': i, 'TPIN': tpin(i), 'PenaltyType': 'Late Filing', 'Amount': 50,
+                   'IssueDate': registered, 'Status': 'Outstanding'}
+
+    def auditcases():
+        for i in range(0, n, 20):
+            yield {'AuditID': i, 'TPIN': tpin(i), 'CaseOfficerID': 1, 'StartDate': registered,
+                   'AuditType': 'Desk Audit', 'Status': 'Open', 'FindingsSummary': None, 'RiskLevel': 'Low'}
+
+    return {
+        'taxpayers': taxpayers(),
+        'individuals': individuals(),
+        'biz_businesses': businesses(),
+        'taxreturns': taxreturns(),
+        'payments': payments(),
+        'penalties': penalties(),
+        'auditcases': auditcases(),
+    }
+
+
+def chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SyntheticMigrator(DatabaseMigrator):
+    """DatabaseMigrator reading the synthetic register instead of MySQL"""
+
+    def __init__(self, dsn: str, taxpayers: int, chunk_size: int = CHUNK_SIZE, concurrency: int = CONCURRENCY):
+        super().__init__({}, {}, chunk_size=chunk_size, concurrency=concurrency)
+        self.dsn = dsn
+        self.tables = synthetic_tables(taxpayers)
+
+    @property
+    def postgres_dsn(self) -> str:
+        return self.dsn
+
+    async def extract_mysql_data(self, table, after=None):
+        for chunk in chunks(self.tables[table], self.chunk_size):
+            yield chunk
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_transforms(n: int, chunk_size: int):
+    now = datetime.now()
+    total = 0
+    start = time.perf_counter()
+    for table, rows in synthetic_tables(n).items():
+        _, transform = ROW_TRANSFORMS[table]
+        table_start = time.perf_counter()
+        count = 0
+        for chunk in chunks(rows, chunk_size):
+            records = [transform(row, now) for row in chunk]
+            count += len(records)
+        seconds = time.perf_counter() - table_start
+        print(f"   {table}: {count:,} rows in {seconds:.2f}s ({count / seconds:,.0f} rows/s)")
+        total += count
+    elapsed = time.perf_counter() - start
+    print(f"transforms: {total:,} rows in {elapsed:.2f}s "
+          f"({total / elapsed:,.0f} rows/s, peak RSS {peak_rss_mb():,.0f} MB)")
+
+
+async def bench_pipeline(args):
+    migrator = SyntheticMigrator(args.dsn, args.taxpayers, chunk_size=args.chunk_size, concurrency=args.concurrency)
+    await migrator.migrate_mysql_to_postgres(restart=True)
+    rows = sum(stats.rows for stats in migrator.stats.values())
+    written = sum(stats.written for stats in migrator.stats.values())
+    print(f"pipeline: {rows:,} source rows ({written:,} written) in {migrator.elapsed:.2f}s "
+          f"({rows / migrator.elapsed:,.0f} rows/s, peak RSS {peak_rss_mb():,.0f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--taxpayers", type=int, default=1_000_000)
+    parser.add_argument("--dsn", help="scratch PostgreSQL database with the init.sql schema")
+    parser.add_argument("--transform-only", action="store_true", help="time the row transforms without PostgreSQL")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+    if not args.transform_only and not args.dsn:
+        parser.error("--dsn is required unless --transform-only is given")
+
+    print(f"=== Migration benchmark: {args.taxpayers:,} taxpayers, {len(SOURCE_TABLES)} tables "
+          f"({datetime.now():%Y-%m-%d %H:%M}) ===")
+    if args.transform_only:
+        bench_transforms(args.taxpayers, args.chunk_size)
+    else:
+        asyncio.run(bench_pipeline(args))
+
+
+if __name__ == "__main__":
+    main()
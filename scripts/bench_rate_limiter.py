@@ -0,0 +1,114 @@
+"""
+Benchmark the latency the Redis rate limiter adds to each request.
+Run with: python -m scripts.bench_rate_limiter --rate 5000 --duration 10
+
+Requests are issued open-loop at the target rate (so slow calls do not
+hide queueing delay) and the p50/p95/p99 latency of each limiter check is
+reported for the Lua sliding-window engine and the legacy 4-command pipeline.
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.redis_manager import redis_manager
+from rate_limiter import RateLimiter
+
+
+def legacy_pipeline(client, rate_key: str, window: int):
+    """Per-request commands issued by the previous limiter implementation"""
+    current_time = int(time.time())
+    pipe = client.pipeline()
+    pipe.zadd(rate_key, {str(current_time): current_time})
+    pipe.zremrangebyscore(rate_key, 0, current_time - window)
+    pipe.zcard(rate_key)
+    pipe.expire(rate_key, window)
+    return pipe.execute()
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_load(check, rate: int, duration: float, workers: int, clients: int):
+    """Drive check(key) at rate req/s across worker threads, return latencies (us)"""
+    latencies = []
+    lock = threading.Lock()
+    per_worker = rate / workers
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        local = []
+        interval = 1.0 / per_worker
+        next_at = time.perf_counter()
+        i = 0
+        while next_at < deadline:
+            sleep_for = next_at - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+            start = time.perf_counter()
+            check(f"bench:rate_limit:{(worker_id + i * workers) % clients}")
+            local.append((time.perf_counter() - start) * 1_000_000)
+            i += 1
+            next_at += interval
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - started
+
+
+def report(name: str, latencies, elapsed: float):
+    print(f"\n{name}")
+    print("-" * 50)
+    print(f"Requests:     {len(latencies)} ({len(latencies) / elapsed:,.0f} req/s achieved)")
+    print(f"Mean:         {statistics.mean(latencies):8.1f} us")
+    print(f"p50:          {percentile(latencies, 50):8.1f} us")
+    print(f"p95:          {percentile(latencies, 95):8.1f} us")
+    print(f"p99:          {percentile(latencies, 99):8.1f} us")
+    print(f"Max:          {max(latencies):8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=int, default=5000, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--clients", type=int, default=1000, help="Distinct client keys")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--window", type=int, default=60)
+    args = parser.parse_args()
+
+    client = redis_manager.redis
+    limiter = RateLimiter(redis_manager, limit=args.limit, window=args.window)
+
+    print("=== Rate Limiter Benchmark ===")
+    print(f"Target rate: {args.rate} req/s, {args.workers} workers, {args.clients} client keys")
+
+    latencies, elapsed = run_load(limiter.hit, args.rate, args.duration, args.workers, args.clients)
+    report("Lua sliding window (1 round trip)", latencies, elapsed)
+
+    latencies, elapsed = run_load(
+        lambda key: legacy_pipeline(client, key, args.window),
+        args.rate, args.duration, args.workers, args.clients,
+    )
+    report("Legacy pipeline (4 commands)", latencies, elapsed)
+
+    for key in client.scan_iter("bench:rate_limit:*", count=1000):
+        client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
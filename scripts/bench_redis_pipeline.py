@@ -0,0 +1,100 @@
+"""
+Benchmark Redis commands/sec with and without pipelining.
+Run with: python -m scripts.bench_redis_pipeline --keys 20000 --chunk-size 500
+
+Writes and reads --keys keys under bench:pipeline: one command per round
+trip, then through the pipelined batch helpers of redis_pool.py, on the
+sync client and the asyncio client, and removes them afterwards.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from redis_pool import REDIS_URL, PooledRedisManager
+
+PREFIX = "bench:pipeline:"
+
+
+def report(name: str, commands: int, elapsed: float):
+    print(f"{name:<38} {commands / elapsed:>12,.0f} commands/s  ({elapsed * 1000:,.0f} ms)")
+
+
+def timed(name: str, commands: int, run):
+    start = time.perf_counter()
+    run()
+    report(name, commands, time.perf_counter() - start)
+
+
+async def atimed(name: str, commands: int, run):
+    start = time.perf_counter()
+    await run()
+    report(name, commands, time.perf_counter() - start)
+
+
+def bench_sync(manager: PooledRedisManager, keys, values):
+    client = manager.redis
+
+    def one_by_one_set():
+        for key, value in zip(keys, values):
+            client.set(key, value, ex=300)
+
+    def one_by_one_get():
+        for key in keys:
+            client.get(key)
+
+    timed("sync SET, 1 per round trip", len(keys), one_by_one_set)
+    timed("sync SET EX, pipelined", len(keys), lambda: manager.mset(dict(zip(keys, values)), ex=300))
+    timed("sync GET, 1 per round trip", len(keys), one_by_one_get)
+    timed("sync MGET, chunked", len(keys), lambda: manager.mget(keys))
+    timed("sync TTL, pipelined", len(keys), lambda: manager.pipelined(keys, lambda pipe, key: pipe.ttl(key)))
+
+
+async def bench_async(manager: PooledRedisManager, keys, values, concurrency: int):
+    client = manager.aio
+
+    async def one_by_one_get():
+        for key in keys:
+            await client.get(key)
+
+    async def concurrent_get():
+        # Bounded by the pool: waits for a free connection rather than opening more
+        for start in range(0, len(keys), concurrency):
+            await asyncio.gather(*(client.get(key) for key in keys[start:start + concurrency]))
+
+    await atimed("async GET, 1 per round trip", len(keys), one_by_one_get)
+    await atimed(f"async GET, {concurrency} concurrent", len(keys), concurrent_get)
+    await atimed("async SET EX, pipelined", len(keys), lambda: manager.amset(dict(zip(keys, values)), ex=300))
+    await atimed("async MGET, chunked", len(keys), lambda: manager.amget(keys))
+    await manager.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=REDIS_URL)
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--value-size", type=int, default=100, help="bytes per value")
+    parser.add_argument("--chunk-size", type=int, default=500, help="commands per pipeline round trip")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent async commands")
+    args = parser.parse_args()
+
+    manager = PooledRedisManager(args.url, max_connections=args.concurrency, chunk_size=args.chunk_size)
+    keys = [f"{PREFIX}{i}" for i in range(args.keys)]
+    values = [b"x" * args.value_size] * args.keys
+
+    print("=== Redis Pipelining Benchmark ===")
+    print(f"{args.keys} keys, {args.value_size} B values, {args.chunk_size} commands per pipeline\n")
+    try:
+        bench_sync(manager, keys, values)
+        asyncio.run(bench_async(manager, keys, values, args.concurrency))
+    finally:
+        manager.pipelined(keys, lambda pipe, key: pipe.delete(key))
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
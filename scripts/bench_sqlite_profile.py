@@ -0,0 +1,125 @@
+"""
+Benchmark concurrent SQLite reads and writes with and without db_profile.
+Run with: python -m scripts.bench_sqlite_profile --readers 8 --writers 2 --duration 10
+
+Each configuration gets a fresh database seeded with --rows entities, then
+reader threads run indexed point lookups and small range scans while writer
+threads insert and update rows, one transaction per operation. The
+baseline is the previous plain create_engine(check_same_thread=False)
+setup; the profile uses the WAL/mmap writer engine plus the read-only
+reader pool. Reported: reads/s, writes/s and "database is locked" errors.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from db_profile import create_engines
+
+SCHEMA = """
+    CREATE TABLE entities (
+        id INTEGER PRIMARY KEY,
+        tin TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        risk_score REAL DEFAULT 0.0,
+        status TEXT DEFAULT 'active'
+    )
+"""
+
+
+def seed(engine, rows: int):
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+        conn.execute(
+            text("INSERT INTO entities (tin, name, risk_score) VALUES (:tin, :name, :risk)"),
+            [{"tin": f"{1000000000 + i}", "name": f"Entity {i}", "risk": random.random()} for i in range(rows)],
+        )
+
+
+def run(writer, reader, rows: int, readers: int, writers: int, duration: float) -> dict:
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def read_loop():
+        local = {"reads": 0, "locked": 0}
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            try:
+                with reader.connect() as conn:
+                    start = rng.randrange(rows)
+                    conn.execute(text("SELECT name FROM entities WHERE tin = :tin"),
+                                 {"tin": f"{1000000000 + start}"}).fetchone()
+                    conn.execute(text("SELECT avg(risk_score) FROM entities WHERE id BETWEEN :a AND :b"),
+                                 {"a": start, "b": start + 100}).fetchone()
+                local["reads"] += 2
+            except OperationalError:
+                local["locked"] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    def write_loop(worker: int):
+        local = {"writes": 0, "locked": 0}
+        rng = random.Random()
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                with writer.begin() as conn:
+                    conn.execute(text("INSERT INTO entities (tin, name) VALUES (:tin, :name)"),
+                                 {"tin": f"w{worker}-{i}", "name": f"New {i}"})
+                    conn.execute(text("UPDATE entities SET risk_score = :risk WHERE id = :id"),
+                                 {"risk": rng.random(), "id": rng.randrange(1, rows)})
+                local["writes"] += 1
+            except OperationalError:
+                local["locked"] += 1
+            i += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(w,)) for w in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"=== SQLite concurrency: {args.readers} readers, {args.writers} writers, {args.duration:.0f}s ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("baseline", "profile"):
+            url = f"sqlite:///{Path(tmp) / name}.db"
+            if name == "baseline":
+                writer = reader = create_engine(url, connect_args={"check_same_thread": False})
+            else:
+                writer, reader = create_engines(url)
+            seed(writer, args.rows)
+            counts = run(writer, reader, args.rows, args.readers, args.writers, args.duration)
+            print(f"{name:>8}: {counts['reads'] / args.duration:10,.0f} reads/s "
+                  f"{counts['writes'] / args.duration:8,.0f} writes/s "
+                  f"{counts['locked']:6,} locked errors")
+            writer.dispose()
+            reader.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark token verifications per second on one core.
+Run with: python -m scripts.bench_token_verifier --permissions 200 --tokens 1000
+
+Tokens shaped like those of generate_token.py, with --permissions
+entries in their permission list, are verified in a loop on one thread:
+with PyJWT (jwt.decode plus building a permission set, the work the
+dashboard does per request today) when it is installed, with the
+token_verifier cache disabled, and with it enabled (every token after its
+first request is a cache hit). A permission check follows each verification.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from token_verifier import PermissionRegistry, TokenVerifier
+
+try:
+    import jwt
+except ImportError:
+    jwt = None
+
+SECRET = "benchmark-secret-key-with-at-least-32-bytes"
+
+
+def make_tokens(verifier: TokenVerifier, count: int, permissions: int):
+    now = int(time.time())
+    names = ["read:dashboard", "read:cases", "write:cases"] + [f"read:report_{i}" for i in range(permissions - 3)]
+    return [
+        verifier.sign({
+            "user_id": f"officer_{i:05d}",
+            "user_type": "officer",
+            "permissions": names,
+            "role": "officer",
+            "clearance_level": 2,
+            "iat": now,
+            "exp": now + 3600,
+            "iss": "zra-system",
+            "aud": "zra-dashboard",
+        })
+        for i in range(count)
+    ]
+
+
+def run(name: str, check, tokens, seconds: float):
+    done = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for token in tokens:
+            check(token)
+        done += len(tokens)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {done / elapsed:>12,.0f} verifications/s   {elapsed / done * 1e6:8.2f} us each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--permissions", type=int, default=200, help="permissions per token")
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens (active sessions)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each run")
+    args = parser.parse_args()
+
+    registry = PermissionRegistry()
+    uncached = TokenVerifier(SECRET, cache_size=0, registry=registry)
+    cached = TokenVerifier(SECRET, cache_size=args.tokens, registry=registry)
+    tokens = make_tokens(cached, args.tokens, args.permissions)
+    required = registry.mask(["read:cases", "write:cases"])
+
+    print("=== Token Verification Benchmark (1 core) ===")
+    print(f"{args.tokens} tokens, {args.permissions} permissions each, {len(tokens[0])} bytes per token\n")
+
+    if jwt is not None:
+        def pyjwt(token):
+            claims = jwt.decode(token, SECRET, algorithms=["HS256"], audience="zra-dashboard", issuer="zra-system")
+            assert {"read:cases", "write:cases"} <= set(claims["permissions"])
+
+        run("PyJWT decode + permission set", pyjwt, tokens, args.seconds)
+    else:
+        print("PyJWT not installed, skipping the baseline")
+
+    run("token_verifier, no cache", lambda token: uncached.verify(token).allows(required), tokens, args.seconds)
+    # Each request brings its own copy of the token, so the cache compares them in full
+    for token in tokens:
+        cached.verify(token)
+    requests = [token.encode().decode() for token in tokens]
+    run("token_verifier, cached claims", lambda token: cached.verify(token).allows(required), requests, args.seconds)
+    print(f"\nCache: {cached.hits:,} hits, {cached.misses:,} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Build static assets for production serving.
+Run with: python -m scripts.build_assets [directory ...]
+
+For every file under the static directories (static, dash, base and
+dashboard/assets by default) this writes:
+- a content-hashed copy of cacheable assets (style.css -> style.3f2a1b9c.css),
+- .gz and, when the brotli package is installed, .br siblings of
+  compressible files,
+- asset-manifest.json, read by static_assets.PrecompressedStaticFiles.
+
+Outputs are only rewritten when the source content changes. Outputs of
+the previous build that are no longer produced are removed; only files
+that build's manifest lists are ever deleted, so a checked-in file that
+happens to look hashed or compressed is treated as a source.
+"""
+import gzip
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from static_assets import ENCODINGS, MANIFEST_NAME
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_DIRS = ["static", "dash", "base", "dashboard/assets"]
+
+# Referenced from templates by a stable URL, so they get hashed copies
+HASHED_EXTENSIONS = {".js", ".css", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico",
+                     ".woff", ".woff2", ".ttf", ".eot", ".webp", ".map"}
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".htm", ".svg", ".json", ".map",
+                           ".txt", ".xml", ".ttf", ".eot", ".ico", ".csv"}
+MIN_COMPRESS_SIZE = 256
+
+
+def previous_outputs(root: Path) -> set:
+    """Files written by the build that produced root's current manifest"""
+    try:
+        manifest = json.loads((root / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    outputs = set()
+    for logical, info in manifest.get("files", {}).items():
+        names = [logical]
+        if info.get("hashed"):
+            names.append(info["hashed"])
+            outputs.add(root / info["hashed"])
+        for encoding, suffix in ENCODINGS:
+            if encoding in info.get("encodings", ()):
+                outputs.update(root / (name + suffix) for name in names)
+    return outputs
+
+
+def write_if_changed(path: Path, data: bytes):
+    if path.exists() and path.read_bytes() == data:
+        return
+    path.write_bytes(data)
+
+
+def compress_variants(path: Path, data: bytes) -> list:
+    """Write .br/.gz siblings when they are smaller than the source"""
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            write_if_changed(path.with_name(path.name + ".br"), compressed)
+            encodings.append("br")
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        write_if_changed(path.with_name(path.name + ".gz"), compressed)
+        encodings.append("gzip")
+    return encodings
+
+
+def build_directory(root: Path) -> dict:
+    files = {}
+    keep = set()
+    built = previous_outputs(root)
+    sources = sorted(p for p in root.rglob("*") if p.is_file() and p.name != MANIFEST_NAME and p not in built)
+    for path in sources:
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        logical = path.relative_to(root).as_posix()
+        entry = {"etag": digest[:32], "size": len(data), "encodings": []}
+
+        targets = [path]
+        if path.suffix.lower() in HASHED_EXTENSIONS:
+            hashed = path.with_name(f"{path.stem}.{digest[:10]}{path.suffix}")
+            if not hashed.exists():
+                shutil.copy2(path, hashed)
+            entry["hashed"] = hashed.relative_to(root).as_posix()
+            targets.append(hashed)
+
+        if path.suffix.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+            for target in targets:
+                entry["encodings"] = compress_variants(target, data)
+
+        keep.update(targets)
+        keep.update(t.with_name(t.name + suffix) for t in targets
+                    for encoding, suffix in ENCODINGS if encoding in entry["encodings"])
+        files[logical] = entry
+
+    # Remove outputs of the previous build whose source has changed or gone
+    for path in built - keep:
+        path.unlink(missing_ok=True)
+
+    manifest = {"version": 1, "files": files}
+    write_if_changed(root / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def main(directories):
+    print("=== Building static assets ===")
+    if brotli is None:
+        print("⚠️  brotli not installed; only .gz variants will be built")
+    for directory in directories:
+        root = (BASE_DIR / directory).resolve()
+        if not root.is_dir():
+            print(f"- {directory}: not found, skipped")
+            continue
+        manifest = build_directory(root)
+        hashed = sum(1 for f in manifest["files"].values() if "hashed" in f)
+        compressed = sum(1 for f in manifest["files"].values() if f["encodings"])
+        print(f"✅ {directory}: {len(manifest['files'])} files, {hashed} hashed, {compressed} precompressed")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DEFAULT_DIRS)
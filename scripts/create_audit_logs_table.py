@@ -2,9 +2,15 @@
 Script to create the audit_logs table in the SQLite database
 """
 import sqlite3
+import sys
 from pathlib import Path
 from datetime import datetime
 
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from db_profile import connect
+
 def create_audit_logs_table():
     """Create the audit_logs table in the SQLite database"""
     db_path = Path(__file__).parent.parent / "zra.db"
@@ -26,24 +32,62 @@ def create_audit_logs_table():
         audit_hash TEXT,
         blockchain_tx_hash TEXT,
         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        seq INTEGER UNIQUE,
+        chain_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
     """
     
-    # Create indexes for better query performance
+    # Audit ledger head, checkpoints and Merkle nodes (audit_ledger.py)
+    ledger_sqls = [
+        """
+        CREATE TABLE IF NOT EXISTS audit_ledger_head (
+            id INTEGER PRIMARY KEY,
+            seq BIGINT NOT NULL,
+            chain_hash TEXT NOT NULL,
+            updated_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS audit_checkpoints (
+            block BIGINT PRIMARY KEY,
+            last_seq BIGINT NOT NULL,
+            merkle_root TEXT NOT NULL,
+            ledger_root TEXT NOT NULL,
+            chain_hash TEXT NOT NULL,
+            blockchain_tx_hash TEXT,
+            created_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS audit_merkle_nodes (
+            level INTEGER NOT NULL,
+            idx BIGINT NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (level, idx)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS audit_ledger_stubs (
+            seq BIGINT PRIMARY KEY,
+            audit_hash TEXT NOT NULL,
+            chain_hash TEXT NOT NULL
+        )
+        """,
+    ]
+    
+    # Create indexes for better query performance; the app splits this table
+    # into monthly shards with their own indexes (scripts/partition_audit_logs.py)
     index_sqls = [
-        "CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON audit_logs (user_id)",
-        "CREATE INDEX IF NOT EXISTS idx_audit_logs_event_type ON audit_logs (event_type)",
-        "CREATE INDEX IF NOT EXISTS idx_audit_logs_operation ON audit_logs (operation)",
-        "CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp)",
-        "CREATE INDEX IF NOT EXISTS idx_audit_logs_entity ON audit_logs (entity_type, entity_id)"
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs (user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_entity ON audit_logs (entity_id, timestamp)",
     ]
     
     try:
         # Connect to the database
-        conn = sqlite3.connect(f"file:{db_path}?mode=rwc", uri=True)
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         # Create the table
@@ -52,6 +96,8 @@ def create_audit_logs_table():
         # Create indexes
         for index_sql in index_sqls:
             cursor.execute(index_sql)
+        for ledger_sql in ledger_sqls:
+            cursor.execute(ledger_sql)
         
         # Commit changes and close connection
         conn.commit()
@@ -70,7 +116,7 @@ if __name__ == "__main__":
     # Verify the table was created
     try:
         db_path = Path(__file__).parent.parent / "zra.db"
-        conn = sqlite3.connect(f"file:{db_path}", uri=True)
+        conn = connect(db_path, readonly=True)
         cursor = conn.cursor()
         
         # Check if table exists
@@ -2,8 +2,14 @@
 Script to create missing tables in the SQLite database
 """
 import sqlite3
+import sys
 from pathlib import Path
 
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from db_profile import connect
+
 def create_missing_tables():
     """Create missing tables in the SQLite database"""
     db_path = Path(__file__).parent.parent / "zra.db"
@@ -91,7 +97,7 @@ def create_missing_tables():
     
     try:
         # Connect to the database
-        conn = sqlite3.connect(f"file:{db_path}?mode=rwc", uri=True)
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         # Execute each SQL statement
@@ -1,91 +1,345 @@
 """
 Script to import the MySQL SQL dump into SQLite
+Run with: python -m scripts.import_sql [dump.sql] [zra.db]
+
+The dump is read in fixed-size chunks and split into statements by a small
+tokenizer that understands quotes and comments, so memory use is bounded by
+the largest single statement rather than the size of the file. Multi-row
+INSERT ... VALUES statements are executed as one statement when their
+literals are plain SQL, and otherwise parsed (MySQL escapes, double-quoted
+strings) into rows for executemany. Everything runs in one transaction
+with fsyncs switched off (the database is rebuilt from scratch, so a
+crashed import is simply re-run). The rollback journal is kept in memory
+rather than switched off, so a statement that fails part-way is undone
+instead of leaving some of its rows behind.
 """
 import os
 import re
 import sqlite3
+import sys
+import time
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Iterator, List, Optional, TextIO, Tuple
+
+READ_CHUNK_SIZE = 1 << 20  # characters per read
+
+IMPORT_PRAGMAS = (
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",  # 256 MiB
+)
+
+# Statement text that cannot end a statement: ordinary characters, complete
+# quoted strings/identifiers, and a - or / that does not open a comment
+_STATEMENT_TEXT = re.compile(
+    r"(?:[^;'\"`#/\-]+|'[^'\\]*(?:\\.[^'\\]*)*'|\"[^\"\\]*(?:\\.[^\"\\]*)*\"|`[^`]*`|-(?!-)|/(?!\*))*", re.S
+)
+
+# Statements with no SQLite equivalent (session settings, locks, transactions)
+_SKIPPED = re.compile(r"(SET|START\s+TRANSACTION|BEGIN|COMMIT|ROLLBACK|LOCK\s+TABLES|UNLOCK\s+TABLES|USE)\b", re.I)
+_QUOTED_STRING = r"'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'"
+
+# MySQL column syntax -> SQLite; quoted strings are matched first so their contents are never rewritten
+_CONVERSIONS = [
+    (r"\b(?:tiny|small|medium|big)?int\(\d+\)(?:\s+UNSIGNED)?", "INTEGER"),
+    (r"\b(?:var)?char\(\d+\)", "TEXT"),
+    (r"\b(?:tiny|medium|long)?text\b", "TEXT"),
+    (r"\b(?:datetime|timestamp)\b", "TEXT"),
+    (r"\bdecimal\(\d+,\s*\d+\)", "REAL"),
+    (r"\benum\((?:\s*" + _QUOTED_STRING + r"\s*,?)+\)", "TEXT"),
+    (r"\b(?:current_timestamp|now)\(\)", "CURRENT_TIMESTAMP"),
+    (r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP(?:\(\))?", ""),
+    (r"\bCHARACTER\s+SET\s*=?\s*\w+", ""),
+    (r"\b(?:DEFAULT\s+)?CHARSET\s*=\s*\w+", ""),
+    (r"\bCOLLATE\s*=?\s*\w+", ""),
+    (r"\bENGINE\s*=\s*\w+", ""),
+    (r"\bAUTO_INCREMENT(?:\s*=\s*\d+)?", ""),
+    (r"\bUNSIGNED\b", ""),
+    (r"\bCOMMENT\s*=?\s*" + _QUOTED_STRING, ""),
+]
+_CONVERT = re.compile(
+    "|".join([f"({_QUOTED_STRING})"] + [f"({pattern})" for pattern, _ in _CONVERSIONS]), re.I | re.S
+)
+_REPLACEMENTS = [replacement for _, replacement in _CONVERSIONS]
+
+_INSERT = re.compile(r"INSERT\s+(?:IGNORE\s+)?INTO\s+([`\"]?[\w$]+[`\"]?)\s*(\([^)]*\))?\s*VALUES\s*", re.I)
+# One literal of a VALUES row: 1 quoted string, 2 double-quoted string, 3 NULL or number
+_LITERAL = (
+    r"\s*(?:'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)'"
+    r"|\"([^\"\\]*(?:(?:\\.|\"\")[^\"\\]*)*)\""
+    r"|(NULL|[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?))\s*"
+)
+_ESCAPE = {"'": re.compile(r"\\(.)|''", re.S), '"': re.compile(r'\\(.)|""', re.S)}
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+_ALTER = re.compile(r"ALTER\s+TABLE\s+([`\"]?[\w$]+[`\"]?)\s+(.*)", re.I | re.S)
+_ADD_INDEX = re.compile(r"ADD\s+(PRIMARY\s+KEY|UNIQUE\s+(?:KEY|INDEX)\s+([`\"]?[\w$]+[`\"]?)|(?:KEY|INDEX)\s+([`\"]?[\w$]+[`\"]?))\s*(\([^)]*\))", re.I)
+
+
+def iter_statements(stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yield the SQL statements of stream one at a time.
+
+    Semicolons inside quoted strings/identifiers and comments do not end a
+    statement. Comments between statements are dropped. Only the current
+    statement plus one read chunk is kept in memory.
+    """
+    buf = ""
+    start = pos = 0  # start of the current statement / scan position in buf
+    eof = False
+
+    while True:
+        pos = _STATEMENT_TEXT.match(buf, pos).end()
+        if pos < len(buf):
+            char = buf[pos]
+            if char == ";":
+                statement = buf[start:pos].strip()
+                if statement:
+                    yield statement
+                start = pos = pos + 1
+                continue
+            if char not in "'\"`":
+                end = _comment_end(buf, pos, eof)
+                if end >= 0:
+                    # A comment before any statement text is not part of a statement
+                    if not buf[start:pos].strip():
+                        start = end
+                    pos = end
+                    continue
+            # Otherwise an unterminated quote or comment: it continues in the next chunk
+        elif buf.endswith(("-", "/")) and not eof:
+            pos -= 1  # could be the first half of -- or /*
+
+        if eof:
+            break
+        data = stream.read(chunk_size)
+        eof = not data
+        buf = buf[start:] + data
+        pos -= start
+        start = 0
+
+    statement = buf[start:].strip()
+    if statement:
+        yield statement
 
-def convert_mysql_to_sqlite(mysql_sql):
+
+def _comment_end(buf: str, i: int, eof: bool) -> int:
+    """Index just past the comment starting at i, or -1 if not in buf yet"""
+    if buf.startswith("/*", i):
+        end = buf.find("*/", i + 2)
+        if end >= 0:
+            return end + 2
+    else:
+        end = buf.find("\n", i)
+        if end >= 0:
+            return end + 1
+    return len(buf) if eof else -1
+
+
+def convert_mysql_to_sqlite(mysql_sql: str) -> str:
     """Convert MySQL SQL to SQLite compatible SQL"""
-    # Remove MySQL specific syntax
-    sql = mysql_sql
-    
-    # Remove character set and collation
-    sql = re.sub(r'CHARACTER SET \w+', '', sql)
-    sql = re.sub(r'COLLATE \w+_\w+', '', sql)
-    
-    # Convert MySQL data types to SQLite
-    sql = sql.replace('int(11)', 'INTEGER')
-    sql = sql.replace('varchar\((\d+)\)', 'TEXT')
-    sql = sql.replace('text', 'TEXT')
-    sql = sql.replace('datetime', 'TEXT')
-    sql = sql.replace('timestamp', 'TEXT')
-    sql = sql.replace('decimal\([\d,]+\),', 'REAL,')
-    sql = sql.replace('decimal\([\d,]+\)', 'REAL')
-    
-    # Remove ENGINE=InnoDB
-    sql = re.sub(r'ENGINE=\w+\s*', '', sql)
-    
-    # Remove AUTO_INCREMENT
-    sql = sql.replace('AUTO_INCREMENT', '')
-    
-    # Remove UNSIGNED
-    sql = sql.replace('UNSIGNED', '')
-    
-    # Remove ON UPDATE CURRENT_TIMESTAMP
-    sql = re.sub(r'ON UPDATE CURRENT_TIMESTAMP', '', sql)
-    
-    return sql
-
-def import_sql_to_sqlite():
-    """Import SQL file into SQLite database"""
-    # Paths
-    base_dir = Path(__file__).parent.parent
-    sql_file = base_dir / "base" / "db" / "zra_db.sql"
-    db_path = base_dir / "zra.db"
-    
-    # Remove existing database if it exists
-    if db_path.exists():
-        os.remove(db_path)
-    
-    # Connect to SQLite database
-    conn = sqlite3.connect(db_path)
+
+    def replace(match):
+        literal = match.group(1)
+        if literal is not None:
+            if "\\" not in literal:
+                return literal
+            # MySQL backslash escapes -> a standard SQL literal with '' for quotes
+            # (sqlite3 rejects a NUL in the statement text, so \0 becomes char(0))
+            value = _unescape(literal[1:-1]).replace("'", "''").replace("\0", "' || char(0) || '")
+            return f"'{value}'"
+        for index, replacement in enumerate(_REPLACEMENTS, start=2):
+            if match.group(index) is not None:
+                return replacement
+        return match.group(0)
+
+    return _CONVERT.sub(replace, mysql_sql)
+
+
+def _unescape(value: str, quote: str = "'") -> str:
+    if "\\" not in value and quote * 2 not in value:
+        return value
+    return _ESCAPE[quote].sub(lambda m: quote if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+@lru_cache(maxsize=None)
+def _row_pattern(width: int) -> re.Pattern:
+    return re.compile(r"\s*\(" + ",".join([_LITERAL] * width) + r"\)\s*(?:,|$)", re.I | re.S)
+
+
+def _literal(string: Optional[str], double_quoted: Optional[str], bare: Optional[str]) -> Any:
+    if string is not None:
+        return _unescape(string)
+    if double_quoted is not None:
+        return _unescape(double_quoted, '"')
+    if bare[0] in "nN":
+        return None
+    if "." in bare or "e" in bare or "E" in bare:
+        return float(bare)
+    return int(bare)
+
+
+def parse_values(sql: str, pos: int, width: int) -> Optional[List[tuple]]:
+    """
+    Parse the width-column row tuples of a VALUES list starting at pos.
+
+    Returns None when a value is not a plain literal (a function call or
+    expression), in which case the statement must be executed as SQL.
+    """
+    pattern = _row_pattern(width)
+    rows = []
+    length = len(sql)
+    while pos < length:
+        match = pattern.match(sql, pos)
+        if match is None:
+            return None if sql[pos:].strip() else rows
+        values = match.groups()
+        rows.append(tuple(map(_literal, values[0::3], values[1::3], values[2::3])))
+        pos = match.end()
+    return rows
+
+
+def _row_width(sql: str, pos: int) -> int:
+    """Number of values in the first row of a VALUES list"""
+    width = 0
+    literal = re.compile(_LITERAL + r"([,)])", re.I | re.S)
+    pos = sql.index("(", pos) + 1
+    while True:
+        match = literal.match(sql, pos)
+        if match is None:
+            return 0
+        width += 1
+        pos = match.end()
+        if match.group(4) == ")":
+            return width
+
+
+def convert_insert(statement: str) -> Optional[Tuple[str, List[tuple]]]:
+    """Parameterized INSERT and its rows for a literal multi-row INSERT, else None"""
+    match = _INSERT.match(statement)
+    if match is None:
+        return None
+    table, columns = match.group(1), match.group(2) or ""
+    width = columns.count(",") + 1 if columns else _row_width(statement, match.end())
+    rows = parse_values(statement, match.end(), width) if width else None
+    if not rows:
+        return None
+    placeholders = ", ".join("?" * width)
+    return f"INSERT INTO {table} {columns} VALUES ({placeholders})", rows
+
+
+def convert_alter(statement: str) -> List[str]:
+    """
+    Index statements for an ALTER TABLE.
+
+    SQLite cannot add keys or constraints to an existing table, so primary
+    and unique keys become unique indexes, plain keys become indexes, and
+    AUTO_INCREMENT changes and foreign keys are dropped.
+    """
+    match = _ALTER.match(statement)
+    if match is None:
+        return []
+    table = match.group(1)
+    bare_table = table.strip('`"')
+    statements = []
+    for add in _ADD_INDEX.finditer(match.group(2)):
+        _, unique_name, key_name, columns = add.groups()
+        name = (unique_name or key_name or "pk").strip('`"')
+        unique = "" if key_name else "UNIQUE "
+        statements.append(f'CREATE {unique}INDEX IF NOT EXISTS "{bare_table}_{name}" ON {table} {columns}')
+    return statements
+
+
+def load_dump(conn: sqlite3.Connection, stream: TextIO) -> dict:
+    """
+    Execute every statement of stream on conn in a single transaction.
+
+    Each statement runs in its own savepoint, so one that fails (including
+    an executemany part-way through its rows) is rolled back whole and
+    counted as an error.
+    """
+    counts = {"statements": 0, "rows": 0, "errors": 0, "skipped": 0}
     cursor = conn.cursor()
-    
-    # Read SQL file
-    with open(sql_file, 'r', encoding='utf-8') as f:
-        sql = f.read()
-    
-    # Split into individual statements
-    statements = re.split(r';\s*\n', sql)
-    
-    # Execute each statement
-    for statement in statements:
-        statement = statement.strip()
-        if not statement:
-            continue
-            
-        # Skip comments and MySQL specific commands
-        if statement.startswith('--') or statement.startswith('/*'):
+    cursor.execute("BEGIN")
+    for statement in iter_statements(stream):
+        counts["statements"] += 1
+        if _SKIPPED.match(statement) or statement.startswith("/*!"):
+            counts["skipped"] += 1
             continue
-        if 'SET ' in statement.upper() or 'USE ' in statement.upper():
-            continue
-            
-        # Convert MySQL to SQLite
-        statement = convert_mysql_to_sqlite(statement)
-        
+
+        cursor.execute("SAVEPOINT statement")
         try:
-            cursor.execute(statement)
+            keyword = statement[:6].upper()
+            if keyword == "INSERT":
+                if "\\" not in statement and '"' not in statement:
+                    # Only standard SQL literals: SQLite parses the whole row list natively
+                    try:
+                        cursor.execute(statement)
+                    except sqlite3.OperationalError:
+                        pass  # e.g. a MySQL function; convert it below
+                    else:
+                        _release(cursor, counts, cursor.rowcount)
+                        continue
+                insert = convert_insert(statement)
+                if insert is not None:
+                    cursor.executemany(*insert)
+                    _release(cursor, counts, len(insert[1]))
+                    continue
+            elif keyword == "ALTER ":
+                for index in convert_alter(statement):
+                    cursor.execute(index)
+                _release(cursor, counts)
+                continue
+            cursor.execute(convert_mysql_to_sqlite(statement))
+            _release(cursor, counts, cursor.rowcount if keyword == "INSERT" else 0)
         except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO statement")
+            cursor.execute("RELEASE statement")
+            counts["errors"] += 1
             print(f"Error executing statement: {e}")
-            print(f"Statement: {statement}")
-    
-    # Commit changes and close connection
-    conn.commit()
-    conn.close()
-    
+            print(f"Statement: {statement[:500]}")
+    cursor.execute("COMMIT")
+    return counts
+
+
+def _release(cursor: sqlite3.Cursor, counts: dict, rows: int = 0):
+    cursor.execute("RELEASE statement")
+    counts["rows"] += rows
+
+
+def import_sql_to_sqlite(sql_file: Optional[Path] = None, db_path: Optional[Path] = None):
+    """Import SQL file into SQLite database"""
+    # Paths
+    base_dir = Path(__file__).parent.parent
+    sql_file = Path(sql_file or base_dir / "base" / "db" / "zra_db.sql")
+    db_path = Path(db_path or base_dir / "zra.db")
+
+    # Remove existing database if it exists, with any WAL left by the app
+    for path in (db_path, db_path.with_name(db_path.name + "-wal"), db_path.with_name(db_path.name + "-shm")):
+        if path.exists():
+            os.remove(path)
+
+    # Autocommit mode: load_dump manages its own transaction
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for pragma in IMPORT_PRAGMAS:
+        conn.execute(pragma)
+
+    start = time.perf_counter()
+    try:
+        with open(sql_file, "r", encoding="utf-8") as f:
+            counts = load_dump(conn, f)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
     print(f"Database created successfully at: {db_path}")
+    print(
+        f"{counts['statements']:,} statements, {counts['rows']:,} rows in {elapsed:.2f}s "
+        f"({counts['rows'] / elapsed if elapsed else 0:,.0f} rows/s), "
+        f"{counts['skipped']} skipped, {counts['errors']} errors"
+    )
 
 if __name__ == "__main__":
-    import_sql_to_sqlite()
+    import_sql_to_sqlite(*sys.argv[1:3])
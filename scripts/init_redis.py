@@ -11,6 +11,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from app.core.config import settings
 from app.core.redis_manager import redis_manager
+from redis_pool import pipelined
 
 def init_redis():
     print("=== Initializing Redis ===\n")
@@ -40,9 +41,9 @@ def init_redis():
             }
         }
         
-        # Store API keys in Redis
+        # Store API keys and rate limits in Redis, one pipelined round trip per batch
+        writes = []
         for key_id, key_data in api_keys.items():
-            redis_key = f"api:keys:{key_id}"
             # Convert all values to strings and flatten the dictionary
             redis_data = {}
             for k, v in key_data.items():
@@ -50,27 +51,28 @@ def init_redis():
                     redis_data[k] = json.dumps(v)
                 else:
                     redis_data[k] = str(v)
-            
-            # Use hset instead of hmset (hmset is deprecated)
-            if redis_data:
-                redis_manager.redis.hset(redis_key, mapping=redis_data)
-                redis_manager.redis.expire(redis_key, 30 * 24 * 3600)  # 30 days TTL
-                print(f"✅ Initialized API key: {key_id}")
-            else:
-                print(f"⚠️  No data to store for key: {key_id}")
-        
+            writes.append((f"api:keys:{key_id}", redis_data, 30 * 24 * 3600))  # 30 days TTL
+
         # Initialize rate limits
         rate_limits = {
             "global": {"limit": 1000, "window": 60},
             "auth": {"limit": 100, "window": 60},
             "api": {"limit": 500, "window": 60}
         }
-        
         for scope, limits in rate_limits.items():
-            redis_key = f"ratelimit:{scope}"
             # Convert values to strings for storage
-            redis_limits = {k: str(v) for k, v in limits.items()}
-            redis_manager.redis.hset(redis_key, mapping=redis_limits)
+            writes.append((f"ratelimit:{scope}", {k: str(v) for k, v in limits.items()}, None))
+
+        def queue(pipe, write):
+            redis_key, mapping, ttl = write
+            pipe.hset(redis_key, mapping=mapping)
+            if ttl:
+                pipe.expire(redis_key, ttl)
+
+        pipelined(redis_client, writes, queue)
+        for key_id in api_keys:
+            print(f"✅ Initialized API key: {key_id}")
+        for scope, limits in rate_limits.items():
             print(f"✅ Initialized rate limit for {scope}: {limits['limit']} req/{limits['window']}s")
         
         print("\n✅ Redis initialization complete!")
@@ -1,11 +1,17 @@
-""
-Redis monitoring dashboard.
-Run with: python -m scripts.monitor_redis
 """
-import time
-import json
+Redis monitoring agent.
+Run with: python -m scripts.monitor_redis [--json] [--metrics-port 9121]
+
+Prints one line (or JSON object) per interval instead of redrawing the
+screen: key counts from INFO keyspace, ops/sec, hit ratio, PING latency
+percentiles and per-prefix key and memory estimates from a bounded,
+pipelined key sample (redis_monitor.py). --metrics-port also serves the
+samples as Prometheus gauges. --exact adds a SCAN key count to every
+sample, which walks the whole keyspace.
+"""
+import argparse
 import sys
-from datetime import datetime
+import time
 from pathlib import Path
 
 # Add the project root to the Python path
@@ -13,79 +19,50 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from app.core.config import settings
 from app.core.redis_manager import redis_manager
+from redis_monitor import DEFAULT_PREFIXES, PrometheusExporter, RedisMonitor, format_json, format_line
 
-def get_redis_info():
-    """Get Redis server information"""
-    if not settings.REDIS_ENABLED:
-        return {"error": "Redis is disabled in settings"}
-    
-    try:
-        info = redis_manager.redis.info()
-        return {
-            "status": "connected",
-            "version": info.get("redis_version"),
-            "uptime_days": info.get("uptime_in_days"),
-            "used_memory_mb": info.get("used_memory") / (1024 * 1024),
-            "connected_clients": info.get("connected_clients"),
-            "total_commands_processed": info.get("total_commands_processed"),
-            "keys_count": sum(1 for _ in redis_manager.redis.scan_iter("*"))
-        }
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
 
-def monitor_redis(interval=5):
-    """Monitor Redis with the specified interval in seconds"""
-    print("🚀 Redis Monitoring Dashboard\n" + "="*50)
-    
-    try:
-        while True:
-            # Clear screen (works on most terminals)
-            print("\033[H\033[J", end="")
-            
-            # Get and display Redis info
-            info = get_redis_info()
-            print(f"🕒 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print("-" * 50)
-            
-            if "error" in info:
-                print(f"❌ Error: {info['error']}")
-            else:
-                print(f"🔌 Status: {info['status'].upper()}")
-                print(f"📊 Version: {info['version']}")
-                print(f"⏱️  Uptime: {info['uptime_days']} days")
-                print(f"💾 Memory: {info['used_memory_mb']:.2f} MB")
-                print(f"👥 Clients: {info['connected_clients']}")
-                print(f"📈 Commands: {info['total_commands_processed']}")
-                print(f"🔑 Keys: {info['keys_count']}")
-                
-                # Display some sample keys
-                print("\nSample Keys:" + "-" * 40)
-                for i, key in enumerate(redis_manager.redis.scan_iter("*", count=5)):
-                    key_type = redis_manager.redis.type(key).decode()
-                    ttl = redis_manager.redis.ttl(key)
-                    print(f"- {key} (Type: {key_type}, TTL: {ttl}s)")
-                    if i >= 4:  # Show max 5 keys
-                        break
-            
-            print("\n" + "="*50)
-            print("Press Ctrl+C to exit")
-            time.sleep(interval)
-            
-    except KeyboardInterrupt:
-        print("\n👋 Exiting Redis monitor")
-    except Exception as e:
-        print(f"\n❌ Error: {e}")
-        if hasattr(e, '__traceback__'):
-            import traceback
-            traceback.print_exc()
+def monitor_redis(monitor: RedisMonitor, interval: float = 5, as_json: bool = False,
+                  exporter: PrometheusExporter = None, output=sys.stdout):
+    """Collect a sample every interval seconds until interrupted"""
+    while True:
+        started = time.monotonic()
+        try:
+            sample = monitor.collect()
+        except Exception as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+        else:
+            print(format_json(sample) if as_json else format_line(sample), file=output, flush=True)
+            if exporter is not None:
+                exporter.update(sample)
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--json", action="store_true", help="one JSON object per sample")
+    parser.add_argument("--sample-size", type=int, default=100, help="keys sampled per interval")
+    parser.add_argument("--prefix", action="append", help=f"key prefix to track (default: {', '.join(DEFAULT_PREFIXES)})")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus gauges on this port")
+    parser.add_argument("--exact", action="store_true", help="also count keys with SCAN (walks the keyspace)")
+    args = parser.parse_args()
+
     if not settings.REDIS_ENABLED:
         print("❌ Redis is disabled in settings")
         sys.exit(1)
-    
+
+    monitor = RedisMonitor(redis_manager.redis, prefixes=args.prefix or DEFAULT_PREFIXES,
+                           sample_size=args.sample_size, exact=args.exact)
+    exporter = None
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        exporter = PrometheusExporter()
+        start_http_server(args.metrics_port, registry=exporter.registry)
+
     try:
-        monitor_redis(interval=2)  # Update every 2 seconds
+        monitor_redis(monitor, interval=args.interval, as_json=args.json, exporter=exporter)
     except KeyboardInterrupt:
-        print("\n👋 Exiting")
+        print("\n👋 Exiting Redis monitor")
         sys.exit(0)
@@ -0,0 +1,50 @@
+"""
+Split audit_logs into monthly partitions and apply audit retention.
+Run with: python -m scripts.partition_audit_logs --url sqlite:///zra.db
+
+Converts an unpartitioned audit_logs (PostgreSQL partitions, SQLite
+shards behind an audit_logs view), creates the coming months'
+partitions, then drops months older than --retention-days. The app does
+the same on startup and every few hours while it runs.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from async_db import DATABASE_URL
+from audit_partitions import DATA_RETENTION_DAYS, apply_retention, layout, maintain_partitions, partition_audit_logs
+from db_profile import create_async_engine
+
+
+async def run(args):
+    engine = create_async_engine(args.url)
+    try:
+        async with engine.begin() as conn:
+            moved = await partition_audit_logs(conn)
+            state = await layout(conn)
+        print(f"audit_logs: {state['mode']}, {len(state['months'])} partitions ({moved:,} rows moved)")
+        if args.retention_days is None:
+            dropped = await maintain_partitions(engine)
+        else:
+            async with engine.begin() as conn:
+                dropped = await apply_retention(conn, retention_days=args.retention_days)
+        print(f"Dropped {len(dropped)} expired partitions{': ' + ', '.join(dropped) if dropped else ''}")
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=DATABASE_URL)
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help=f"override DATA_RETENTION_DAYS ({DATA_RETENTION_DAYS}); 0 keeps everything")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Empty the Prometheus multiprocess directory before the server starts.
+Run with: python -m scripts.prepare_metrics_dir && uvicorn main:app --workers 4
+
+Each uvicorn worker keeps its samples in mmap files under
+PROMETHEUS_MULTIPROC_DIR (see metrics.py). Files left by a previous run
+would be merged into /metrics, so the directory is emptied here, before
+any worker starts, and never by the application: a worker that wiped it
+after importing metrics.py would delete files that are open. Does
+nothing when PROMETHEUS_MULTIPROC_DIR is unset. This script must not
+import metrics.py.
+"""
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def prepare(path: str) -> Path:
+    """Remove path with everything in it and create it again, empty"""
+    directory = Path(path)
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory", nargs="?", default=os.environ.get(MULTIPROC_DIR_ENV),
+                        help=f"directory to empty (default: ${MULTIPROC_DIR_ENV})")
+    args = parser.parse_args(argv)
+    if not args.directory:
+        print(f"{MULTIPROC_DIR_ENV} is not set; nothing to prepare")
+        return 0
+    print(f"Prepared empty metrics directory {prepare(args.directory)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
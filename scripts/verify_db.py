@@ -1,59 +1,99 @@
 """
 Script to verify database connection and tables
+Run with: python -m scripts.verify_db [--exact] [--url postgresql://...]
+
+Row counts come from the planner statistics (table_stats.py) and are
+approximate; --exact runs COUNT(*) on every table instead, which scans
+each of them.
 """
+import argparse
 import sqlite3
+import sys
+import time
 from pathlib import Path
 
-def verify_database():
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_profile import connect, create_engine
+from table_stats import postgres_row_counts, sqlite_row_counts
+
+REQUIRED_TABLES = ['users', 'businesses', 'payments', 'tax_returns']
+
+
+def report_tables(counts, elapsed: float):
+    """Print row counts and any required tables that are missing"""
+    print("\nTables in the database:")
+    for table_name, count in counts.items():
+        print(f"- {table_name}: {count}")
+    print(f"(counted in {elapsed * 1000:.0f} ms)")
+
+    existing_tables = [t.lower() for t in counts]
+    missing_tables = [t for t in REQUIRED_TABLES if t not in existing_tables]
+    if missing_tables:
+        print("\nWarning: The following required tables are missing:")
+        for table in missing_tables:
+            print(f"- {table}")
+    else:
+        print("\nAll required tables are present!")
+
+
+def verify_database(exact: bool = False):
     """Verify database connection and tables"""
     db_path = Path(__file__).parent.parent / "zra.db"
-    
+
     if not db_path.exists():
         print(f"Error: Database file not found at {db_path}")
         print("Please run 'python scripts/import_sql.py' first to create the database.")
         return False
-    
+
     try:
         # Connect to the database
-        conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True)
-        cursor = conn.cursor()
-        
-        # Get list of tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
+        conn = connect(db_path, create=False)
+
         print("\nDatabase connection successful!")
         print(f"Database path: {db_path}")
-        print("\nTables in the database:")
-        
-        # Print table names and row counts
-        for table in tables:
-            table_name = table[0]
-            if table_name == 'sqlite_sequence':
-                continue
-                
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            print(f"- {table_name}: {count} rows")
-        
-        # Check for required tables
-        required_tables = ['users', 'businesses', 'payments', 'tax_returns']
-        existing_tables = [t[0].lower() for t in tables]
-        missing_tables = [t for t in required_tables if t not in existing_tables]
-        
-        if missing_tables:
-            print("\nWarning: The following required tables are missing:")
-            for table in missing_tables:
-                print(f"- {table}")
-        else:
-            print("\nAll required tables are present!")
-        
+
+        start = time.perf_counter()
+        counts = sqlite_row_counts(conn, exact=exact)
+        report_tables(counts, time.perf_counter() - start)
+
         conn.close()
         return True
-        
+
     except sqlite3.Error as e:
         print(f"\nError connecting to the database: {e}")
         return False
 
+
+def verify_postgres(url: str, exact: bool = False):
+    """Verify a PostgreSQL database, with row counts from pg_class.reltuples"""
+    engine = create_engine(url, readonly=True)
+    try:
+        with engine.connect() as conn:
+            print("\nDatabase connection successful!")
+            print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+            start = time.perf_counter()
+            counts = postgres_row_counts(conn, exact=exact)
+            report_tables(counts, time.perf_counter() - start)
+        return True
+    except SQLAlchemyError as e:
+        print(f"\nError connecting to the database: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+
 if __name__ == "__main__":
-    verify_database()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--exact", action="store_true", help="COUNT(*) every table (full scans)")
+    parser.add_argument("--url", help="verify this PostgreSQL database instead of zra.db")
+    args = parser.parse_args()
+
+    if args.url:
+        ok = verify_postgres(args.url, exact=args.exact)
+    else:
+        ok = verify_database(exact=args.exact)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,147 @@
+"""
+Static file serving for assets built by scripts/build_assets.py.
+
+The build step writes, next to each asset, a content-hashed copy
+(``style.3f2a1b9c.css``), pre-compressed ``.br``/``.gz`` siblings and an
+``asset-manifest.json`` describing them. PrecompressedStaticFiles reads
+the manifest once at startup and then, per request:
+
+- serves the best pre-built encoding the client accepts, so nothing is
+  compressed on the fly,
+- marks content-hashed filenames as immutable for a year,
+- uses the content hash as the ETag and answers If-None-Match with 304.
+
+Directories without a manifest are served exactly like StaticFiles.
+"""
+import json
+import logging
+import mimetypes
+import os
+import re
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "asset-manifest.json"
+# name.<8+ hex chars>.ext as produced by the build step
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[^./]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+# Preferred order when the client accepts several
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class AssetEntry(NamedTuple):
+    etag: str
+    media_type: str
+    hashed: bool
+    # encoding -> (variant path, stat result)
+    variants: Dict[str, Tuple[str, os.stat_result]]
+
+
+def accepted_encodings(header: str) -> set:
+    """Content codings from an Accept-Encoding header, minus any with q=0"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving pre-built compressed variants with content ETags"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.assets: Dict[str, AssetEntry] = {}
+        self.hashed_names: Dict[str, str] = {}
+        self.precompressed: Set[str] = set()  # names relative to the directory
+        if self.directory is not None:
+            self.load_manifest(str(self.directory))
+
+    def load_manifest(self, directory: str):
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        root = os.path.realpath(directory)
+        for logical, info in manifest.get("files", {}).items():
+            media_type = mimetypes.guess_type(logical)[0] or "text/plain"
+            names = [(logical, False)]
+            if info.get("hashed"):
+                names.append((info["hashed"], True))
+                self.hashed_names[logical] = info["hashed"]
+            for name, hashed in names:
+                full_path = os.path.normpath(os.path.join(root, name))
+                variants = {}
+                for encoding, suffix in ENCODINGS:
+                    if encoding in info.get("encodings", ()):
+                        try:
+                            variants[encoding] = (full_path + suffix, os.stat(full_path + suffix))
+                        except OSError:
+                            pass
+                self.assets[full_path] = AssetEntry(info["etag"], media_type, hashed, variants)
+                if variants:
+                    self.precompressed.add(name)
+        logger.info(f"Loaded {len(manifest.get('files', {}))} built assets from {manifest_path}")
+
+    def hashed_path(self, path: str) -> str:
+        """Content-hashed name for a logical asset path, if it was built"""
+        return self.hashed_names.get(path, path)
+
+    def precompressed_urls(self, mount_path: str) -> Set[str]:
+        """Request paths under mount_path that are answered with a pre-built .br/.gz"""
+        urls = {f"{mount_path}/{name}" for name in self.precompressed}
+        if self.html:
+            urls.update(url[:-len("index.html")] for url in list(urls) if url.endswith("/index.html"))
+        return urls
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        entry: Optional[AssetEntry] = self.assets.get(str(full_path))
+        if entry is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        encoding = None
+        if entry.variants:
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            encoding = next((e for e, _ in ENCODINGS if e in accepted and e in entry.variants), None)
+
+        headers = {"Cache-Control": IMMUTABLE if entry.hashed else REVALIDATE}
+        if entry.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            path, stat_result = entry.variants[encoding]
+            headers["Content-Encoding"] = encoding
+            headers["ETag"] = f'"{entry.etag}-{encoding}"'
+        else:
+            path = full_path
+            headers["ETag"] = f'"{entry.etag}"'
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=entry.media_type,
+            stat_result=stat_result,
+        )
+        # Make sure the content hash wins over FileResponse's mtime-based ETag
+        response.headers["etag"] = headers["ETag"]
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
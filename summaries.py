@@ -0,0 +1,249 @@
+"""
+Precomputed compliance and risk summaries for the dashboards.
+
+entity_compliance_summary, compliance_overview and risk_summary are
+PostgreSQL materialized views (init.sql). The officer and donor dashboards
+read one precomputed row (or one row per risk type) instead of joining and
+re-aggregating cases, obligations and risk_assessments on every request.
+
+SummaryRefresher keeps them current with REFRESH MATERIALIZED VIEW
+CONCURRENTLY, which rewrites only the rows that changed and never blocks
+readers. A summary is refreshed when a committed ORM write touched one of
+its source tables (install_summary_tracking), and at least every
+SUMMARY_MAX_AGE seconds for writes made outside the ORM and for the
+30-day window of risk_summary. Each refresh is recorded in
+summary_refreshes, and every response carries refreshed_at and
+age_seconds so a dashboard can show how stale its numbers are.
+Responses are served from response_cache until their view is refreshed,
+so age_seconds is as of the first request after the refresh.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import column, event, func, select, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import Session, object_mapper
+
+from async_db import async_engine
+from metrics import set_compliance_score
+from response_cache import response_cache
+from token_verifier import token_verifier
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_REFRESH_INTERVAL = float(os.getenv("SUMMARY_REFRESH_INTERVAL", "30"))
+SUMMARY_MAX_AGE = float(os.getenv("SUMMARY_MAX_AGE", "900"))
+
+# Materialized view -> tables whose changes make it stale, in refresh order
+# (compliance_overview is aggregated from entity_compliance_summary)
+SUMMARIES = {
+    "entity_compliance_summary": ("entities", "cases", "obligations"),
+    "compliance_overview": ("entities", "cases", "obligations"),
+    "risk_summary": ("risk_assessments",),
+}
+
+summary_refreshes = table("summary_refreshes", column("name"), column("refreshed_at"))
+entity_compliance_summary = table(
+    "entity_compliance_summary",
+    column("entity_id"), column("name"), column("type"), column("compliance_score"), column("risk_score"),
+    column("total_cases"), column("active_cases"), column("total_obligations"), column("pending_obligations"),
+)
+compliance_overview = table(
+    "compliance_overview",
+    column("total_entities"), column("average_compliance_score"), column("average_risk_score"),
+    column("high_risk_entities"), column("active_cases"), column("pending_obligations"),
+)
+risk_summary = table(
+    "risk_summary",
+    column("risk_type"), column("total_assessments"), column("average_score"),
+    column("high_risk_count"), column("critical_risk_count"),
+)
+
+
+class SummaryRefresher:
+    def __init__(self, engine: AsyncEngine, interval: float = SUMMARY_REFRESH_INTERVAL,
+                 max_age: float = SUMMARY_MAX_AGE, on_refresh: Optional[Callable[[List[str]], None]] = None):
+        """
+        Initialize the summary refresher
+
+        Args:
+            engine: Async engine of the PostgreSQL database holding the views
+            interval: Seconds between checks for summaries to refresh
+            max_age: Seconds after which a summary is refreshed even if unchanged
+            on_refresh: Called with the summaries refreshed in a round, if any
+        """
+        self.engine = engine
+        self.interval = interval
+        self.max_age = max_age
+        self.on_refresh = on_refresh
+        self.refreshed_at: Dict[str, datetime] = {}
+        self._dirty: Set[str] = set(SUMMARIES)  # unknown until the first refresh
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_changed(self, tables: Iterable[str]):
+        """Flag the summaries built from these tables for the next refresh"""
+        tables = set(tables)
+        self._dirty.update(name for name, sources in SUMMARIES.items() if tables.intersection(sources))
+
+    def due(self, now: datetime) -> List[str]:
+        """Summaries to refresh: changed since their last refresh, or older than max_age"""
+        return [
+            name for name in SUMMARIES
+            if name in self._dirty or name not in self.refreshed_at
+            or (now - self.refreshed_at[name]).total_seconds() >= self.max_age
+        ]
+
+    async def _refresh(self, conn: AsyncConnection, name: str) -> bool:
+        # One worker refreshes a view at a time; the others skip it this round
+        if not await conn.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": name}):
+            return False
+        await conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+        now = func.timezone("utc", func.now())
+        await conn.execute(
+            pg_insert(summary_refreshes).values(name=name, refreshed_at=now)
+            .on_conflict_do_update(index_elements=["name"], set_={"refreshed_at": now})
+        )
+        if name == "compliance_overview":
+            score = await conn.scalar(select(compliance_overview.c.average_compliance_score))
+            if score is not None:  # no entities yet
+                set_compliance_score(float(score))
+        return True
+
+    async def run_once(self) -> List[str]:
+        """Refresh every summary that is due; returns the ones refreshed"""
+        if self.engine.dialect.name != "postgresql":
+            return []
+        async with self.engine.connect() as conn:
+            # Refreshes by other workers count too
+            self.refreshed_at.update((await conn.execute(
+                select(summary_refreshes.c.name, summary_refreshes.c.refreshed_at)
+            )).all())
+            now = await conn.scalar(select(func.timezone("utc", func.now())))
+
+        refreshed = []
+        for name in self.due(now):
+            self._dirty.discard(name)  # writes committed during the refresh mark it again
+            try:
+                async with self.engine.begin() as conn:
+                    if await self._refresh(conn, name):
+                        refreshed.append(name)
+                        self.refreshed_at[name] = now
+            except Exception as e:
+                self._dirty.add(name)
+                logger.error(f"Refreshing {name} failed: {e}")
+        if refreshed and self.on_refresh is not None:
+            self.on_refresh(refreshed)
+        return refreshed
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Summary refresh round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def install_summary_tracking(refresher: SummaryRefresher, session_class=Session):
+    """Mark summaries stale when a session of session_class commits writes to their source tables"""
+
+    @event.listens_for(session_class, "after_flush")
+    def _collect(session, flush_context):
+        changed = session.info.setdefault("summary_tables", set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            changed.add(object_mapper(obj).local_table.name)
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _collect_bulk(orm_execute_state):
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and (orm_execute_state.is_update or orm_execute_state.is_delete):
+            orm_execute_state.session.info.setdefault("summary_tables", set()).add(mapper.local_table.name)
+
+    @event.listens_for(session_class, "after_commit")
+    def _mark(session):
+        changed = session.info.pop("summary_tables", None)
+        if changed:
+            refresher.mark_changed(changed)
+
+    @event.listens_for(session_class, "after_rollback")
+    def _discard(session):
+        session.info.pop("summary_tables", None)
+
+
+async def _freshness(conn: AsyncConnection, name: str) -> dict:
+    row = (await conn.execute(
+        select(
+            summary_refreshes.c.refreshed_at,
+            func.extract("epoch", func.timezone("utc", func.now()) - summary_refreshes.c.refreshed_at),
+        ).where(summary_refreshes.c.name == name)
+    )).first()
+    if row is None:
+        return {"refreshed_at": None, "age_seconds": None}
+    return {"refreshed_at": row[0].isoformat(), "age_seconds": round(float(row[1]), 1)}
+
+
+# Dashboard Summaries API
+
+router = APIRouter(
+    prefix="/api/v1/users/dashboard/summary",
+    tags=["dashboard"],
+    dependencies=[Depends(token_verifier.require("read:dashboard"))],
+)
+
+
+@asynccontextmanager
+async def _connection():
+    if async_engine.dialect.name != "postgresql":
+        raise HTTPException(status_code=503, detail="Dashboard summaries are only materialized on PostgreSQL")
+    async with async_engine.connect() as conn:
+        yield conn
+
+
+@router.get("/overview")
+@response_cache(ttl=int(SUMMARY_MAX_AGE), tags=["summary:compliance_overview"], vary=("Authorization",), private=True)
+async def get_compliance_overview():
+    """Portfolio totals for the donor dashboard"""
+    async with _connection() as conn:
+        row = (await conn.execute(select(compliance_overview))).mappings().first()
+        return {"overview": dict(row) if row else None, **(await _freshness(conn, "compliance_overview"))}
+
+
+@router.get("/entities/{entity_id}")
+@response_cache(ttl=int(SUMMARY_MAX_AGE), tags=["summary:entity_compliance_summary"], vary=("Authorization",), private=True)
+async def get_entity_summary(entity_id: str):
+    """Case and obligation counts for one entity, for the officer dashboard"""
+    async with _connection() as conn:
+        row = (await conn.execute(
+            select(entity_compliance_summary).where(entity_compliance_summary.c.entity_id == entity_id)
+        )).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"No summary for entity {entity_id}")
+        return {"summary": dict(row), **(await _freshness(conn, "entity_compliance_summary"))}
+
+
+@router.get("/risk")
+@response_cache(ttl=int(SUMMARY_MAX_AGE), tags=["summary:risk_summary"], vary=("Authorization",), private=True)
+async def get_risk_summary():
+    """Risk assessments of the last 30 days by risk type"""
+    async with _connection() as conn:
+        rows = (await conn.execute(select(risk_summary).order_by(risk_summary.c.risk_type))).mappings().all()
+        return {"risk_types": [dict(row) for row in rows], **(await _freshness(conn, "risk_summary"))}
@@ -0,0 +1,125 @@
+"""
+Approximate row and key counts without scanning.
+
+COUNT(*) reads a whole table (or its smallest index), which takes
+seconds to minutes on production-sized tables; SCAN over a keyspace is
+O(keys) round trips. The planner statistics every database keeps already
+hold counts that are good enough for health and verification output:
+
+  SQLite:     sqlite_stat1, written by ANALYZE (the first number of each
+              row is the table's row count when it was analyzed)
+  PostgreSQL: pg_class.reltuples, maintained by autovacuum/ANALYZE
+  Redis:      DBSIZE, O(1)
+
+Every function takes exact=True to count for real, and reports which of
+the two each number is.
+"""
+import sqlite3
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Rows ANALYZE examines per index when stats are missing; the count is then an estimate
+SQLITE_ANALYSIS_LIMIT = 1000
+
+
+class RowCount(NamedTuple):
+    rows: Optional[int]  # None: no statistics yet
+    exact: bool
+
+    def __str__(self) -> str:
+        if self.rows is None:
+            return "unknown (never analyzed)"
+        return f"{self.rows:,} rows" if self.exact else f"~{self.rows:,} rows"
+
+
+def sqlite_tables(conn: sqlite3.Connection):
+    return [
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    ]
+
+
+def _sqlite_stat1(conn: sqlite3.Connection) -> Dict[str, int]:
+    try:
+        rows = conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.OperationalError:  # no such table: never analyzed
+        return {}
+    counts = {}
+    for table, stat in rows:
+        if stat:
+            counts[table] = max(counts.get(table, 0), int(stat.split()[0]))
+    return counts
+
+
+def sqlite_row_counts(conn: sqlite3.Connection, exact: bool = False, analyze: bool = True) -> Dict[str, RowCount]:
+    """
+    Row count per table of a SQLite database
+
+    Args:
+        conn: sqlite3 connection
+        exact: COUNT(*) every table instead of reading sqlite_stat1
+        analyze: Run a bounded ANALYZE for tables that have no statistics yet
+            (needs a writable connection)
+    """
+    tables = sqlite_tables(conn)
+    if exact:
+        return {table: RowCount(conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0], True) for table in tables}
+
+    counts = _sqlite_stat1(conn)
+    missing = [table for table in tables if table not in counts]
+    analyzed = False
+    if missing and analyze:
+        try:
+            conn.execute(f"PRAGMA analysis_limit = {SQLITE_ANALYSIS_LIMIT}")
+            for table in missing:
+                conn.execute(f'ANALYZE "{table}"')
+            conn.commit()
+            counts, analyzed = _sqlite_stat1(conn), True
+        except sqlite3.OperationalError:  # read-only connection
+            pass
+    # ANALYZE writes no sqlite_stat1 row for an empty table
+    unanalyzed = RowCount(0, False) if analyzed else RowCount(None, False)
+    return {table: RowCount(counts[table], False) if table in counts else unanalyzed for table in tables}
+
+
+def postgres_row_counts(conn: Connection, exact: bool = False, schema: str = "public") -> Dict[str, RowCount]:
+    """
+    Row count per table of a PostgreSQL schema, from pg_class.reltuples
+
+    Partitioned tables report the sum of their partitions, which are not
+    listed separately. reltuples is -1 for a table never vacuumed or
+    analyzed (PostgreSQL 14+), reported as unknown.
+    """
+    result = conn.execute(text("""
+        SELECT c.relname,
+               CASE WHEN c.relkind = 'p' THEN (
+                   SELECT SUM(GREATEST(p.reltuples, 0)) FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                   WHERE i.inhparent = c.oid
+               ) ELSE c.reltuples END AS estimate
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+        ORDER BY c.relname
+    """), {"schema": schema}).all()
+    counts = {}
+    for table, estimate in result:
+        if exact:
+            rows = conn.execute(text(f'SELECT COUNT(*) FROM "{schema}"."{table}"')).scalar()
+            counts[table] = RowCount(rows, True)
+        else:
+            counts[table] = RowCount(None if estimate is None or estimate < 0 else int(estimate), False)
+    return counts
+
+
+def redis_key_count(client, exact: bool = False) -> RowCount:
+    """
+    Keys in the current Redis database
+
+    DBSIZE is O(1) but includes keys that have expired and not been
+    reclaimed yet; exact=True walks the keyspace with SCAN instead.
+    """
+    if exact:
+        return RowCount(sum(1 for _ in client.scan_iter(count=1000)), True)
+    return RowCount(client.dbsize(), False)
@@ -0,0 +1,73 @@
+"""
+Jinja2 template setup for development and production.
+
+Development keeps auto_reload so edited templates show up immediately.
+Production (ENVIRONMENT=production) turns off the per-render mtime checks,
+keeps every compiled template in memory, and stores template bytecode in
+an on-disk cache shared by all workers, so only the first worker to start
+after a deploy pays for compiling from source.
+"""
+import logging
+import os
+import tempfile
+import time
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+
+def is_production() -> bool:
+    return os.getenv("ENVIRONMENT", os.getenv("APP_ENV", "development")).lower() == "production"
+
+
+def create_templates(directory: str, production: bool = None, cache_dir: str = None) -> Jinja2Templates:
+    """
+    Build the Jinja2Templates instance for directory
+
+    Args:
+        directory: Template root (app/templates)
+        production: Production mode; defaults to is_production()
+        cache_dir: Bytecode cache directory (TEMPLATE_CACHE_DIR, default
+            zra-template-cache in the system temp directory)
+    """
+    if production is None:
+        production = is_production()
+    if not production:
+        env = Environment(loader=FileSystemLoader(directory), auto_reload=True, autoescape=True)
+        return Jinja2Templates(env=env)
+
+    # Not inside the source tree, which may be read-only or shared between deploys
+    cache_dir = cache_dir or os.getenv(
+        "TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zra-template-cache")
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(directory),
+        auto_reload=False,
+        autoescape=True,
+        cache_size=-1,  # never evict a compiled template
+        bytecode_cache=FileSystemBytecodeCache(cache_dir),
+    )
+    return Jinja2Templates(env=env)
+
+
+def warm_templates(templates: Jinja2Templates) -> int:
+    """
+    Compile every template so the first request renders from memory.
+
+    Returns the number of templates loaded. Templates that fail to compile
+    are logged and skipped rather than stopping startup.
+    """
+    env = templates.env
+    start = time.perf_counter()
+    loaded = 0
+    for name in env.list_templates(extensions=("html", "htm", "jinja", "j2", "txt", "xml")):
+        try:
+            env.get_template(name)
+            loaded += 1
+        except Exception as e:
+            logger.error(f"Failed to precompile template {name}: {e}")
+    logger.info(f"Precompiled {loaded} templates in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return loaded
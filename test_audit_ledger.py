@@ -0,0 +1,119 @@
+"""
+Audit ledger tests: chaining, checkpoints, inclusion proofs and tampering.
+Run with: python test_audit_ledger.py
+"""
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+import audit_ledger
+from audit_writer import _row, make_event
+from db_profile import create_async_engine
+from direct_db_setup import AuditLog, Base
+from token_verifier import token_verifier
+
+
+def run_with_ledger(scenario, entries: int = 100, interval: int = 8):
+    """Run scenario(engine, events) against a ledger of entries, checkpointed every interval"""
+
+    async def setup(tmp: Path):
+        engine = create_async_engine(f"sqlite:///{tmp / 'ledger.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        events = [make_event("data_access", "read", entity_id=i, details={"i": i}) for i in range(entries)]
+        for start in range(0, entries, 7):  # batches that straddle block boundaries
+            async with engine.begin() as conn:
+                await audit_ledger.append_entries(conn, [_row(e) for e in events[start:start + 7]])
+        try:
+            await scenario(engine, events)
+        finally:
+            await engine.dispose()
+
+    saved = audit_ledger.CHECKPOINT_INTERVAL
+    audit_ledger.CHECKPOINT_INTERVAL = interval
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(setup(Path(tmp)))
+    finally:
+        audit_ledger.CHECKPOINT_INTERVAL = saved
+
+
+def test_inclusion_proofs():
+    async def scenario(engine, events):
+        async with engine.begin() as conn:
+            assert await audit_ledger.append_entries(conn, [_row(e) for e in events[:5]]) == 0, "replays are skipped"
+        async with engine.connect() as conn:
+            for i in (0, 7, 8, 50, 95):
+                result = await audit_ledger.verify_entry(conn, events[i]["log_id"])
+                assert result["valid"] and result["checkpointed"], (i, result["checks"])
+                assert audit_ledger.verify_proof(result["proof"]), "proofs check out offline"
+                assert len(result["proof"]["ledger_path"]) <= 4  # 12 blocks: log2 height
+
+            pending = await audit_ledger.verify_entry(conn, events[99]["log_id"])
+            assert pending["valid"] and not pending["checkpointed"]
+            assert await audit_ledger.verify_entry(conn, "AUDIT-missing") is None
+
+            proof = (await audit_ledger.verify_entry(conn, events[50]["log_id"]))["proof"]
+            forged = dict(proof, chain_hash=proof["block_path"][0])
+            assert not audit_ledger.verify_proof(forged)
+
+    run_with_ledger(scenario)
+    print("✅ Inclusion proofs verify against the ledger root")
+
+
+def test_tampering_detected():
+    async def scenario(engine, events):
+        async with engine.begin() as conn:
+            await conn.execute(update(AuditLog).where(AuditLog.seq == 20).values(operation="delete"))
+            await conn.execute(update(AuditLog).where(AuditLog.seq == 42).values(chain_hash="0" * 64))
+            # Consistent forgery: content and audit_hash rewritten together
+            forged = dict(events[69], operation="delete")
+            await conn.execute(update(AuditLog).where(AuditLog.seq == 70).values(
+                operation="delete", audit_hash=audit_ledger.event_hash(forged)
+            ))
+        async with engine.connect() as conn:
+            edited = await audit_ledger.verify_entry(conn, events[19]["log_id"])
+            assert not edited["valid"] and not edited["checks"]["content"]
+            rechained = await audit_ledger.verify_entry(conn, events[41]["log_id"])
+            assert not rechained["checks"]["chain"] and not rechained["checks"]["block_root"]
+            rehashed = await audit_ledger.verify_entry(conn, events[69]["log_id"])
+            assert rehashed["checks"]["content"] and not rehashed["checks"]["chain"]
+
+            report = await audit_ledger.verify_range(conn, 1, 100)
+            assert report["entries"] == 100 and report["blocks_checked"] == 12
+            assert report["invalid_seqs"][:2] == [20, 42]
+            # A rewritten audit_hash changes its block root and every one after it
+            assert report["invalid_blocks"] == [8, 9, 10, 11]
+            assert (await audit_ledger.verify_range(conn, 49, 64))["valid"]
+
+    run_with_ledger(scenario)
+    print("✅ Edited content, rewritten hashes and broken chains are detected")
+
+
+def test_verify_routes_require_read_audit():
+    app = FastAPI()
+    app.include_router(audit_ledger.router)
+    client = TestClient(app)
+    for path in ("/api/v1/security/audit/verify/AUDIT-1", "/api/v1/security/audit/verify", "/api/v1/security/audit/root"):
+        assert client.get(path).status_code == 401, path
+
+    reader = token_verifier.sign({"user_id": "officer_001", "permissions": ["read:cases"],
+                                  "iss": token_verifier.issuer, "aud": token_verifier.audience})
+    response = client.get("/api/v1/security/audit/root", headers={"Authorization": f"Bearer {reader}"})
+    assert response.status_code == 403
+    print("✅ The verify routes need a bearer token with read:audit")
+
+
+if __name__ == "__main__":
+    test_inclusion_proofs()
+    test_tampering_detected()
+    test_verify_routes_require_read_audit()
+    print("\n✅ All audit ledger tests passed!")
@@ -0,0 +1,155 @@
+"""
+Audit partition tests: converting audit_logs to monthly shards, routing and retention.
+Run with: python test_audit_partitions.py
+"""
+import asyncio
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+import audit_ledger
+import audit_partitions
+from audit_writer import _row, make_event
+from db_profile import create_async_engine
+from direct_db_setup import AuditLedgerStub, AuditLog, Base
+from repositories import AuditLogRepository
+
+
+def events_for(months, per_month: int = 10):
+    return [
+        make_event("data_access", "read", entity_id=f"E{i % 3}", details={"i": i},
+                   timestamp=datetime(2025, month, 1 + i, 12))
+        for month in months for i in range(per_month)
+    ]
+
+
+def run_partitioned(scenario, interval: int = 8):
+    """Run scenario(engine) against a fresh SQLite database, checkpointed every interval"""
+
+    async def setup(tmp: Path):
+        engine = create_async_engine(f"sqlite:///{tmp / 'audit.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            await scenario(engine)
+        finally:
+            await engine.dispose()
+
+    saved = audit_ledger.CHECKPOINT_INTERVAL
+    audit_ledger.CHECKPOINT_INTERVAL = interval
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(setup(Path(tmp)))
+    finally:
+        audit_ledger.CHECKPOINT_INTERVAL = saved
+
+
+def test_convert_and_route():
+    async def scenario(engine):
+        before = events_for([1, 2, 3])
+        legacy = make_event("login", "read", user_id=None, timestamp=datetime(2025, 1, 20))
+        async with engine.begin() as conn:
+            await conn.execute(insert(AuditLog.__table__), [_row(legacy)])  # written before the ledger
+            await audit_ledger.append_entries(conn, [_row(e) for e in before])
+            moved = await audit_partitions.partition_audit_logs(conn, now=datetime(2025, 3, 15))
+            assert moved == 31
+            state = await audit_partitions.layout(conn)
+            assert state["mode"] == "sharded"
+            assert sorted(m.month for m in state["months"]) == [1, 2, 3, 4, 5]
+            assert await audit_partitions.partition_audit_logs(conn) == 0, "already partitioned"
+
+        after = events_for([3, 6])
+        async with engine.begin() as conn:
+            assert await audit_ledger.append_entries(conn, [_row(e) for e in after + before[:3]]) == 20
+            june = await conn.scalar(text("SELECT count(*) FROM audit_logs_y2025m06"))
+            assert june == 10, "rows land in their month's shard, which is created on demand"
+
+        async with engine.connect() as conn:
+            for event in (legacy, before[0], before[25], after[15]):
+                result = await audit_ledger.verify_entry(conn, event["log_id"])
+                assert result["checks"]["chain"] and result["seq"], result
+            assert (await audit_ledger.verify_range(conn, 1, 51))["valid"]
+
+        async with async_sessionmaker(engine)() as session:
+            repository = AuditLogRepository(session)
+            assert await repository.count() == 51
+            march = await repository.for_entity("E0", since=datetime(2025, 3, 1), until=datetime(2025, 4, 1))
+            assert len(march) == 8 and all(log.timestamp.month == 3 for log in march)
+            newest = await repository.recent(limit=1)
+            assert newest[0].seq == 51 and newest[0].id == 51
+
+    run_partitioned(scenario)
+    print("✅ audit_logs converts to monthly shards and rows route to their month")
+
+
+def test_workers_convert_once():
+    async def scenario(engine):
+        async with engine.begin() as conn:
+            await audit_ledger.append_entries(conn, [_row(e) for e in events_for([1, 2])])
+        # A second worker: its own engine on the same database file
+        other = create_async_engine(engine.url)
+
+        async def convert(worker):
+            async with worker.begin() as conn:
+                return await audit_partitions.partition_audit_logs(conn, now=datetime(2025, 2, 15))
+
+        try:
+            moved = await asyncio.gather(convert(engine), convert(other))
+        finally:
+            await other.dispose()
+        assert sorted(moved) == [0, 20], "one worker converts, the other waits and finds it done"
+        async with engine.connect() as conn:
+            assert await conn.scalar(select(func.count()).select_from(AuditLog)) == 20
+    run_partitioned(scenario)
+    print("✅ Concurrent workers convert audit_logs once")
+
+
+def test_retention_keeps_ledger_verifiable():
+    async def scenario(engine):
+        events = events_for([1, 2, 3, 4], per_month=9)  # month boundaries inside blocks of 8
+        async with engine.begin() as conn:
+            await audit_partitions.partition_audit_logs(conn, now=datetime(2025, 1, 1))
+            await audit_ledger.append_entries(conn, [_row(e) for e in events])
+
+        async with engine.begin() as conn:
+            dropped = await audit_partitions.apply_retention(conn, now=datetime(2025, 5, 15), retention_days=90)
+            assert dropped == ["audit_logs_y2025m01"]
+            assert await conn.scalar(select(func.count()).select_from(AuditLog.__table__)) == 27
+            # Seqs 1-8 were a whole block; 9 shares its block with rows kept
+            stubbed = list(await conn.scalars(select(AuditLedgerStub.seq)))
+            assert stubbed == [9]
+
+        async with engine.connect() as conn:
+            assert await audit_ledger.verify_entry(conn, events[0]["log_id"]) is None
+            for event in (events[9], events[20], events[35]):
+                result = await audit_ledger.verify_entry(conn, event["log_id"])
+                assert result["valid"], (event["log_id"], result["checks"])
+            report = await audit_ledger.verify_range(conn, 1, 36)
+            assert report["valid"] and report["entries"] == 27 and report["pruned"] == 9
+            assert report["blocks_checked"] == 3
+            assert (await audit_ledger.verify_range(conn, 1, 8))["pruned"] == 8
+
+        # Deleting a retained row is still caught
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM audit_logs_y2025m02 WHERE seq = 12"))
+        async with engine.connect() as conn:
+            report = await audit_ledger.verify_range(conn, 1, 36)
+            assert not report["valid"] and report["invalid_seqs"][:2] == [12, 13]
+            assert report["invalid_blocks"][0] == 1
+
+    run_partitioned(scenario)
+    print("✅ Retention drops whole months and the ledger stays verifiable")
+
+
+if __name__ == "__main__":
+    test_convert_and_route()
+    test_workers_convert_once()
+    test_retention_keeps_ledger_verifiable()
+    print("\n✅ All audit partition tests passed!")
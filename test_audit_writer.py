@@ -0,0 +1,163 @@
+"""
+Audit writer tests against a temporary aiosqlite database.
+Run with: python test_audit_writer.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from audit_writer import AuditWriter, install_session_auditing, make_event
+from db_profile import create_async_engine
+from direct_db_setup import AuditLog, Base, Entity, User
+
+
+async def make_engine(tmp: Path):
+    engine = create_async_engine(f"sqlite:///{tmp / 'audit.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def audit_count(engine) -> int:
+    async with engine.connect() as conn:
+        return await conn.scalar(select(func.count()).select_from(AuditLog))
+
+
+def test_batches_overflow_and_spool_cleanup():
+    async def scenario(tmp: Path):
+        engine = await make_engine(tmp)
+        writer = AuditWriter(engine, tmp / "spool", queue_size=10, batch_size=50)
+        await writer.start()
+        events = [make_event("data_access", "read", entity_id=i) for i in range(500)]
+        assert len({e["log_id"] for e in events}) == 500, "log_ids must not collide"
+        for audit_event in events:
+            writer.record(audit_event)
+        assert writer.stats["spooled_only"] > 0, "a full queue spills to the spool"
+        await writer.stop()
+
+        assert await audit_count(engine) == 500
+        assert list((tmp / "spool").iterdir()) == [], "committed segments are deleted"
+        await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(Path(tmp)))
+    print("✅ Overflowing events reach audit_logs exactly once")
+
+
+def test_crash_replay_is_idempotent():
+    async def scenario(tmp: Path):
+        engine = await make_engine(tmp)
+        crashed = AuditWriter(engine, tmp / "spool")
+        await crashed.start()
+        crashed._task.cancel()  # flusher dies before writing anything
+        events = [make_event("login", "create", user_id=1) for _ in range(20)]
+        for audit_event in events:
+            crashed.record(audit_event)
+        await crashed._insert(events[:5])  # some made it before the crash
+        crashed._close_active()
+
+        writer = AuditWriter(engine, tmp / "spool")
+        await writer.start()
+        await writer.stop()
+        assert writer.stats["replayed"] == 20
+        assert await audit_count(engine) == 20
+        await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(Path(tmp)))
+    print("✅ Spool replayed after a crash without duplicates")
+
+
+def test_failing_batches_are_dead_lettered():
+    async def scenario(tmp: Path):
+        engine = create_async_engine(f"sqlite:///{tmp / 'no-tables.db'}")
+        writer = AuditWriter(engine, tmp / "spool", max_attempts=2)
+        await writer.start()
+        for i in range(3):
+            writer.record(make_event("data_access", "read", entity_id=i))
+        await writer.stop()
+
+        assert writer.stats["dead_lettered"] == 3 and writer.stats["errors"] == 2
+        assert [p.name for p in (tmp / "spool").iterdir()] == [f"dead-letter-{os.getpid()}.jsonl"]
+        dead = (tmp / "spool" / f"dead-letter-{os.getpid()}.jsonl").read_text().splitlines()
+        assert [json.loads(line)["entity_id"] for line in dead] == ["0", "1", "2"]
+        await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(Path(tmp)))
+    print("✅ A batch that keeps failing goes to the dead-letter file instead of blocking the writer")
+
+
+def test_session_auditing_after_commit_only():
+    class AuditedSession(Session):
+        pass
+
+    async def scenario(tmp: Path):
+        engine = await make_engine(tmp)
+        writer = AuditWriter(engine, tmp / "spool")
+        install_session_auditing(writer, AuditedSession)
+        await writer.start()
+        Sessions = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=AuditedSession)
+        async with Sessions() as session:
+            session.info["user_id"] = 7
+            user = User(username="officer", email="officer@example.com", hashed_password="secret",
+                        full_name="Officer", role="officer")
+            session.add(user)
+            await session.commit()
+            user_id = user.id
+            user.role = "admin"
+            await session.commit()
+            await session.execute(update(User).where(User.id == user.id).values(is_active=False))
+            await session.commit()
+            session.add(Entity(entity_id="entity-3", name="Before the savepoint", type="business"))
+            await session.flush()
+            savepoint = await session.begin_nested()
+            session.add(Entity(entity_id="entity-0", name="Savepoint rolled back", type="business"))
+            await session.flush()
+            await savepoint.rollback()
+            async with session.begin_nested():
+                session.add(Entity(entity_id="entity-2", name="Savepoint released", type="business"))
+            await session.commit()
+            session.add(Entity(entity_id="entity-1", name="Rolled back", type="business"))
+            await session.flush()
+            await session.rollback()
+        await writer.stop()
+
+        async with engine.connect() as conn:
+            rows = (await conn.execute(
+                select(AuditLog.event_type, AuditLog.operation, AuditLog.entity_id, AuditLog.user_id, AuditLog.details)
+                .order_by(AuditLog.timestamp)
+            )).all()
+        assert [(r.event_type, r.operation, r.user_id) for r in rows] == [
+            ("users", "INSERT", 7), ("users", "UPDATE", 7), ("users", "UPDATE", 7),
+            ("entities", "INSERT", 7), ("entities", "INSERT", 7)
+        ]
+        assert sorted(r.details["new"]["entity_id"] for r in rows[3:]) == ["entity-2", "entity-3"], \
+            "a savepoint rollback drops only what was written inside it"
+        assert [r.entity_id for r in rows[:2]] == [str(user_id)] * 2, "inserts carry the new primary key"
+        assert "hashed_password" not in rows[0].details["new"]
+        assert rows[1].details["changes"] == {"role": {"old": "officer", "new": "admin"}}
+        assert "UPDATE users" in rows[2].details["statement"]
+        await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(Path(tmp)))
+    print("✅ ORM writes audited after commit, rolled-back writes and savepoints dropped")
+
+
+if __name__ == "__main__":
+    test_batches_overflow_and_spool_cleanup()
+    test_crash_replay_is_idempotent()
+    test_failing_batches_are_dead_lettered()
+    test_session_auditing_after_commit_only()
+    print("\n✅ All audit writer tests passed!")
@@ -0,0 +1,70 @@
+"""
+Health monitor tests (no Redis or database required).
+Run with: python test_health.py
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from health import HealthMonitor
+
+
+def test_probes_cached_and_ready():
+    calls = []
+    monitor = HealthMonitor("1.0.0", interval=5, timeout=1)
+    monitor.add_probe("database", lambda: calls.append("db") or True)
+    monitor.add_probe("redis", lambda: False, critical=False)
+
+    assert monitor.readiness_response().status_code == 503, "not ready before first probe"
+
+    asyncio.run(monitor.run_once())
+    for _ in range(100):
+        monitor.liveness_response()
+        response = monitor.readiness_response()
+
+    assert calls == ["db"], "serving responses must not run probes"
+    assert response.status_code == 200
+    body = json.loads(monitor.liveness_response().body)
+    assert body["services"] == {"database": "connected", "redis": "disconnected"}
+    print("✅ Probe results cached; non-critical failure keeps readiness")
+
+
+def test_slow_probe_times_out():
+    monitor = HealthMonitor("1.0.0", interval=5, timeout=0.05)
+    monitor.add_probe("database", lambda: time.sleep(0.5) or True)
+
+    async def timed_round():
+        start = time.perf_counter()
+        await monitor.run_once()
+        return time.perf_counter() - start
+
+    assert asyncio.run(timed_round()) < 0.4
+    assert not monitor.results["database"].ok
+    assert "timed out" in monitor.results["database"].error
+    assert monitor.readiness_response().status_code == 503
+    print("✅ Slow probe reported as failed after its timeout")
+
+
+def test_failing_probe_reports_error():
+    def broken():
+        raise ConnectionError("connection refused")
+
+    monitor = HealthMonitor("1.0.0")
+    monitor.add_probe("database", broken)
+    asyncio.run(monitor.run_once())
+
+    assert monitor.results["database"].error == "connection refused"
+    assert not monitor.ready
+    print("✅ Probe exceptions reported, not raised")
+
+
+if __name__ == "__main__":
+    test_probes_cached_and_ready()
+    test_slow_probe_times_out()
+    test_failing_probe_reports_error()
+    print("\n✅ All health tests passed!")
@@ -0,0 +1,197 @@
+"""
+Redis circuit breaker tests: tripping, backoff probes and local fallbacks (no Redis required).
+Run with: python test_redis_breaker.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from rate_limiter import RateLimiter
+from redis_breaker import CircuitBreaker, LocalRateWindows, RedisUnavailable
+from response_cache import ResponseCache
+
+
+class FlakyRedis:
+    """Raises ConnectionError while down; otherwise a tiny string store with a counting Lua stand-in"""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+        self.data = {}
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("Connection refused")
+
+    def ping(self):
+        self._check()
+        return True
+
+    def register_script(self, source):
+        def script(keys, args, client=None):
+            if client is not None:
+                return client.calls.append(("script", (keys, args)))
+            self._check()
+            return [args[4], 1, 0]
+        return script
+
+    def pipeline(self, transaction=True):
+        return FlakyPipeline(self)
+
+
+class FlakyPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        self.client._check()
+        results = []
+        for name, args in self.calls:
+            if name == "incr":
+                self.client.data[args[0]] = self.client.data.get(args[0], 0) + 1
+            if name == "script":
+                results.append([args[1][4], 1, 0])
+            else:
+                results.append(self.client.data.get(args[0]) if name == "get" else True)
+        return results
+
+
+class FlakyManager:
+    def __init__(self):
+        self.redis = FlakyRedis()
+
+    def ping(self):
+        return self.redis.ping()
+
+
+def test_breaker_trips_and_probes_with_backoff():
+    client = FlakyRedis()
+    breaker = CircuitBreaker(client.ping, failure_threshold=3, base_delay=0.02, max_delay=0.05, background=False)
+    client.down = True
+    for _ in range(3):
+        try:
+            breaker.call(client.ping)
+        except ConnectionError:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN and client.calls == 3
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        try:
+            breaker.call(client.ping)
+        except RedisUnavailable:
+            pass
+    per_call = (time.perf_counter() - start) / 10000
+    assert client.calls == 3, "no calls reach Redis while open"
+    assert per_call < 50e-6, f"open breaker costs {per_call * 1e6:.1f} us per call"
+
+    delays = []
+    for _ in range(3):
+        wait = breaker._next_probe - time.monotonic()
+        delays.append(wait)
+        time.sleep(max(0.0, wait) + 0.001)
+        assert not breaker.allow(), "the probe fails while Redis is down"
+    assert delays[1] > delays[0] * 1.5 and delays[2] <= 0.05 * 1.2 + 0.001, f"backoff: {delays}"
+
+    client.down = False
+    time.sleep(max(0.0, breaker._next_probe - time.monotonic()) + 0.001)
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    print("✅ The breaker opens after consecutive failures and closes on a successful backoff probe")
+
+
+def test_background_probe():
+    client = FlakyRedis()
+    breaker = CircuitBreaker(client.ping, failure_threshold=1, base_delay=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert not breaker.allow(), "the request that starts the probe does not wait for it"
+    deadline = time.monotonic() + 1
+    while breaker.state != CircuitBreaker.CLOSED and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert breaker.state == CircuitBreaker.CLOSED
+    print("✅ Recovery probes run in a background thread")
+
+
+def test_local_rate_windows():
+    windows = LocalRateWindows(max_keys=2)
+    results = [windows.hit("a", limit=5, window_ms=1000, now_ms=10_000) for _ in range(6)]
+    assert [granted for granted, _, _ in results] == [1, 1, 1, 1, 1, 0]
+    assert results[-1][1] == 5 and results[-1][2] == 1000
+
+    # Half of the previous window still overlaps: about half the limit is free again
+    granted = sum(windows.hit("a", 5, 1000, now_ms=11_500)[0] for _ in range(5))
+    assert granted == 2, granted
+    assert windows.hit("a", 5, 1000, now_ms=13_000)[0] == 1, "old windows expire"
+
+    assert windows.hit("a", 5, 1000, cost=10, now_ms=13_000)[0] == 4, "cost is capped at what fits"
+    windows.hit("b", 5, 1000, now_ms=13_000)
+    windows.hit("c", 5, 1000, now_ms=13_000)
+    assert len(windows) == 2
+    print("✅ Local sliding windows enforce the limit in bounded memory")
+
+
+def test_rate_limiter_falls_back_locally():
+    manager = FlakyManager()
+    breaker = CircuitBreaker(manager.ping, failure_threshold=2, base_delay=60, background=False)
+    limiter = RateLimiter(manager, limit=3, window=60, breaker=breaker)
+    assert limiter.hit("rate_limit:1.2.3.4").allowed and manager.redis.calls == 1
+
+    manager.redis.down = True
+    results = [limiter.hit("rate_limit:1.2.3.4") for _ in range(4)]
+    assert breaker.state == CircuitBreaker.OPEN and manager.redis.calls == 3
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert results[-1].retry_after > 0
+
+    batcher = RateLimiter(FlakyManager(), limit=3, window=60)
+    batch = batcher.hit_many([("rate_limit:a", 2), ("rate_limit:b", 1)])
+    assert [result.allowed for result in batch] == [True, True] and batcher.redis.redis.calls == 1, "one round trip"
+    # The breaker is still open: the whole batch is counted locally
+    batch = limiter.hit_many([("rate_limit:1.2.3.4", 1), ("rate_limit:c", 3)])
+    assert [result.allowed for result in batch] == [False, True]
+    print("✅ The rate limiter keeps answering from local windows while Redis is down")
+
+
+def test_response_cache_skips_redis_while_open():
+    async def run():
+        manager = FlakyManager()
+        breaker = CircuitBreaker(manager.ping, failure_threshold=1, base_delay=60, background=False)
+        cache = ResponseCache(manager, local_ttl=0, breaker=breaker)
+
+        async def compute():
+            return b"{}", "application/json"
+
+        manager.redis.down = True
+        await cache.get_or_compute("k", 60, ["t"], compute)
+        assert breaker.state == CircuitBreaker.OPEN
+        calls = manager.redis.calls
+        for _ in range(5):
+            assert (await cache.get_or_compute("k", 60, ["t"], compute))[1] == "MISS"
+        cache.invalidate("t")
+        assert manager.redis.calls == calls, "no Redis calls while the breaker is open"
+
+        manager.redis.down = False
+        breaker.state = CircuitBreaker.CLOSED
+        await cache.get_or_compute("k", 60, ["t"], compute)
+        assert manager.redis.data[cache._tag_key("t")] == 1, "the invalidation is published after recovery"
+
+    asyncio.run(run())
+    print("✅ The response cache stays local while the breaker is open")
+
+
+if __name__ == "__main__":
+    test_breaker_trips_and_probes_with_backoff()
+    test_background_probe()
+    test_local_rate_windows()
+    test_rate_limiter_falls_back_locally()
+    test_response_cache_skips_redis_while_open()
+    print("\n✅ All Redis circuit breaker tests passed!")
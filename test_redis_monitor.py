@@ -0,0 +1,119 @@
+"""
+Redis monitor tests (no Redis required).
+Run with: python test_redis_monitor.py
+"""
+import random
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from redis_monitor import OTHER, PrometheusExporter, RedisMonitor, format_line
+
+
+class FakeRedis:
+    """A keyspace of rate limit, API key and session keys; counts round trips"""
+
+    def __init__(self):
+        self.keys = {}
+        for i in range(6000):
+            self.keys[f"rate_limit:10.0.{i // 256}.{i % 256}"] = (60, 100)
+        for i in range(1000):
+            self.keys[f"api:keys:{i}"] = (-1, 500)
+        for i in range(3000):
+            self.keys[f"session:{i}"] = (3600, 200)
+        self.names = list(self.keys)
+        self.random = random.Random(7)
+        self.commands = self.hits = self.misses = 0
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def info(self, section):
+        self.commands += 1
+        return {
+            "stats": {"total_commands_processed": self.commands, "keyspace_hits": self.hits,
+                      "keyspace_misses": self.misses, "expired_keys": 0, "evicted_keys": 0},
+            "memory": {"used_memory": 4 * 1024 * 1024},
+            # db1 belongs to another application and is never sampled
+            "keyspace": {"db0": {"keys": len(self.keys), "expires": 9000, "avg_ttl": 0},
+                         "db1": {"keys": 50000, "expires": 0, "avg_ttl": 0}},
+            "commandstats": {"cmdstat_get": {"calls": self.commands, "usec": 2 * self.commands}},
+        }[section]
+
+    def randomkey(self):
+        return self.random.choice(self.names)
+
+    def type(self, key):
+        return "string"
+
+    def ttl(self, key):
+        return self.keys[key][0]
+
+    def memory_usage(self, key):
+        return self.keys[key][1]
+
+    def ping(self):
+        self.round_trips += 1
+        return True
+
+    def scan_iter(self, count=None):
+        raise AssertionError("the monitor must not walk the keyspace")
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self, raise_on_error=True):
+        self.client.round_trips += 1
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+def test_bounded_round_trips_and_estimates():
+    client = FakeRedis()
+    monitor = RedisMonitor(client, sample_size=200, latency_probes=3)
+    first = monitor.collect()
+    assert client.round_trips == 3 + 3, "INFO, RANDOMKEY and key detail pipelines plus the PINGs"
+    assert first["ops_per_sec"] is None and first["keys"] == 10000, "only the selected database is counted"
+
+    for _ in range(9):
+        client.hits += 90
+        client.misses += 10
+        sample = monitor.collect()
+    assert sample["hit_ratio"] == 0.9 and sample["ops_per_sec"] > 0
+    assert sample["server_usec_per_call"] == 2.0
+    assert sample["latency_p50_ms"] is not None
+
+    rate_limit = sample["prefixes"]["rate_limit:"]
+    assert 5400 <= rate_limit["keys"] <= 6600, rate_limit
+    assert 0.5e6 <= rate_limit["memory_bytes"] <= 0.7e6
+    assert sample["prefixes"]["api:keys:"]["no_ttl_share"] == 1.0, "API keys never expire"
+    assert sample["prefixes"][OTHER]["no_ttl_share"] == 0.0
+    assert sample["prefixes"]["ratelimit:"]["sampled"] == 0
+    assert "keys=10,000" in format_line(sample)
+    print("✅ Each round costs a fixed number of round trips and extrapolates per-prefix usage")
+
+
+def test_prometheus_export():
+    client = FakeRedis()
+    monitor = RedisMonitor(client, sample_size=50)
+    exporter = PrometheusExporter()
+    for _ in range(2):
+        exporter.update(monitor.collect())
+    assert exporter.registry.get_sample_value("zra_redis_keys") == 10000
+    assert exporter.registry.get_sample_value("zra_redis_prefix_keys", {"prefix": "rate_limit:"}) > 0
+    assert exporter.registry.get_sample_value("zra_redis_latency_seconds", {"quantile": "0.99"}) is not None
+    print("✅ Samples are exported as Prometheus gauges")
+
+
+if __name__ == "__main__":
+    test_bounded_round_trips_and_estimates()
+    test_prometheus_export()
+    print("\n✅ All Redis monitor tests passed!")
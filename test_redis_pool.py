@@ -0,0 +1,110 @@
+"""
+Redis batch helper tests: chunked MGET/MSET and pipelines (no Redis required).
+Run with: python test_redis_pool.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from redis_pool import async_mget, async_mset, async_pipelined, chunks, mget, mset, pipelined
+
+
+class FakeRedis:
+    """Strings only; counts round trips"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def _mset(self, mapping):
+        self.data.update(mapping)
+        return True
+
+    def _set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+        return True
+
+    def _ttl(self, key):
+        return self.ttls.get(key) or -1
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        self.client.round_trips += 1
+        return [getattr(self.client, f"_{name}")(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeAsyncRedis(FakeRedis):
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self)
+
+    async def mget(self, keys):
+        return FakeRedis.mget(self, keys)
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def execute(self):
+        return FakePipeline.execute(self)
+
+
+def test_chunks():
+    assert list(chunks(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunks(iter([]), 3)) == []
+    print("✅ Iterables are split into bounded chunks")
+
+
+def test_batched_commands():
+    client = FakeRedis()
+    mapping = {f"k{i}": str(i) for i in range(1050)}
+    mset(client, mapping, chunk_size=500)
+    assert client.round_trips == 3 and client.data == mapping
+
+    client.round_trips = 0
+    assert mget(client, list(mapping) + ["missing"], chunk_size=500) == list(mapping.values()) + [None]
+    assert client.round_trips == 3
+
+    client.round_trips = 0
+    mset(client, {"a": "1", "b": "2"}, ex=60, chunk_size=500)
+    replies = pipelined(client, ["a", "b", "k0"], lambda pipe, key: pipe.ttl(key), chunk_size=2)
+    assert replies == [60, 60, -1] and client.round_trips == 1 + 2
+    print("✅ MGET, MSET and pipelines send one round trip per chunk")
+
+
+def test_async_batched_commands():
+    async def run():
+        client = FakeAsyncRedis()
+        mapping = {f"k{i}": str(i) for i in range(120)}
+        await async_mset(client, mapping, ex=30, chunk_size=50)
+        assert client.round_trips == 3 and client.ttls["k119"] == 30
+        assert await async_mget(client, list(mapping), chunk_size=50) == list(mapping.values())
+        replies = await async_pipelined(client, list(mapping)[:3], lambda pipe, key: pipe.ttl(key), chunk_size=50)
+        assert replies == [30, 30, 30]
+
+    asyncio.run(run())
+    print("✅ The asyncio helpers batch the same way")
+
+
+if __name__ == "__main__":
+    test_chunks()
+    test_batched_commands()
+    test_async_batched_commands()
+    print("\n✅ All Redis pool tests passed!")
@@ -0,0 +1,115 @@
+"""
+Async repository tests against an in-memory aiosqlite database.
+Run with: python test_repositories.py
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from db_profile import create_async_engine
+from direct_db_setup import AuditLog, Base, Entity, User, UserSession
+from repositories import AuditLogRepository, EntityRepository, UserRepository, UserSessionRepository
+
+
+async def make_session_factory():
+    engine = create_async_engine("sqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def seed(session):
+    user = User(username="officer1", email="officer1@example.com", hashed_password="x",
+                full_name="Officer One", role="officer")
+    await UserRepository(session).add(user)
+    now = datetime.utcnow()
+    session.add_all([
+        UserSession(user_id=user.id, device_id="laptop", status="active", expires_at=now + timedelta(hours=1)),
+        UserSession(user_id=user.id, device_id="phone", status="active", expires_at=now - timedelta(hours=1)),
+        Entity(entity_id="entity-1", name="Low", type="business", tin="1000000001", risk_score=0.1),
+        Entity(entity_id="entity-2", name="High", type="business", tin="1000000002", risk_score=0.9),
+    ])
+    await session.commit()
+    return user
+
+
+def test_user_and_session_repositories():
+    async def scenario():
+        engine, Session = await make_session_factory()
+        async with Session() as session:
+            user = await seed(session)
+            users = UserRepository(session)
+            sessions = UserSessionRepository(session)
+
+            assert (await users.get_by_username("officer1")).id == user.id
+            assert (await users.get_by_email("nobody@example.com")) is None
+            loaded = await users.get_with_sessions(user.id)
+            assert {s.device_id for s in loaded.sessions} == {"laptop", "phone"}
+
+            assert await sessions.expire_stale() == 1
+            active = await sessions.active_for_user(user.id)
+            assert [s.device_id for s in active] == ["laptop"]
+            await sessions.revoke(active[0].id)
+            await session.commit()
+            assert await sessions.active_for_user(user.id) == []
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    print("✅ User and session repositories")
+
+
+def test_entity_and_audit_repositories():
+    async def scenario():
+        engine, Session = await make_session_factory()
+        async with Session() as session:
+            user = await seed(session)
+            entities = EntityRepository(session)
+            audit = AuditLogRepository(session)
+
+            assert (await entities.get_by_tin("1000000002")).entity_id == "entity-2"
+            assert [e.entity_id for e in await entities.high_risk(0.5)] == ["entity-2"]
+
+            def fraud_detections():
+                return REGISTRY.get_sample_value("zra_fraud_detections_total", {"risk_level": "high"}) or 0
+
+            before = fraud_detections()
+            await entities.update_scores("entity-1", compliance_score=0.4, risk_score=0.8)
+            await entities.update_scores("entity-1", risk_score=0.85)
+            await entities.update_scores("entity-2", risk_score=0.95)
+            assert fraud_detections() == before + 1, "only entity-1 became high risk"
+            assert [e.entity_id for e in await entities.high_risk()] == ["entity-2", "entity-1"]
+
+            rows = [{"log_id": f"AUDIT-{i}", "user_id": user.id, "event_type": "data_access",
+                     "entity_id": "entity-1", "operation": "read", "audit_hash": "0" * 64}
+                    for i in range(3)]
+            assert await audit.add_many(rows) == 3
+            assert await audit.add_many([]) == 0
+            stored = await audit.add(AuditLog(log_id="AUDIT-3", event_type="login", operation="create",
+                                              audit_hash="1" * 64))
+            assert stored.seq == 4 and stored.chain_hash
+            try:
+                await audit.delete(stored)
+                raise AssertionError("audit entries cannot be deleted")
+            except NotImplementedError:
+                pass
+            await session.commit()
+            assert await audit.count() == 4
+            assert len(await audit.for_entity("entity-1")) == 3
+            assert len(await audit.recent(limit=2)) == 2
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    print("✅ Entity and audit log repositories")
+
+
+if __name__ == "__main__":
+    test_user_and_session_repositories()
+    test_entity_and_audit_repositories()
+    print("\n✅ All repository tests passed!")
@@ -0,0 +1,213 @@
+"""
+Response cache tests: local LRU bounds, coalescing, tag invalidation and HTTP caching headers.
+Run with: python test_response_cache.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from middleware import CacheControlMiddleware
+from response_cache import CachedResponse, LocalCache, ResponseCache
+
+
+class FakeRedis:
+    """Strings and INCR counters; TTLs are ignored"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key) or 0) + 1).encode()
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class FakeRedisManager:
+    def __init__(self):
+        self.redis = FakeRedis()
+
+
+def entry(body: bytes, tags=()) -> CachedResponse:
+    return CachedResponse(body, "application/json", '"etag"', time.time() + 60, tuple(tags))
+
+
+def test_local_cache_bounds():
+    now = time.time()
+    local = LocalCache(max_entries=3, max_bytes=800)
+    for i in range(4):
+        local.set(f"k{i}", entry(b"x" * 10, tags=["t"]), now + 60)
+    assert len(local) == 3 and local.get("k0", now) is None, "least recently used entry evicted"
+
+    local.get("k1", now)
+    local.set("big", entry(b"x" * 90), now + 60)
+    assert local.get("k2", now) is None and local.get("k1", now) is not None
+    local.set("huge", entry(b"x" * 200), now + 60)
+    assert local.get("huge", now) is None, "entries over an eighth of the budget are not kept"
+
+    assert local.get("k1", now + 61) is None, "expired entries are dropped"
+    assert local.invalidate(["t"]) == 1 and len(local) == 1 and local.bytes == 90
+    print("✅ The local tier is bounded by entries, bytes and TTL")
+
+
+def test_coalescing_and_invalidation():
+    async def run():
+        cache = ResponseCache(FakeRedisManager())
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return f'{{"n":{calls}}}'.encode(), "application/json"
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", 60, ["taxpayer:1"], compute) for _ in range(20)))
+        assert calls == 1, "concurrent misses share one computation"
+        assert sorted({source for _, source in results}) == ["HIT-COALESCED", "MISS"]
+
+        _, source = await cache.get_or_compute("k", 60, ["taxpayer:1"], compute)
+        assert source == "HIT-LOCAL"
+
+        # Another worker: empty local tier, same Redis
+        other = ResponseCache(cache.redis)
+        found, source = await other.get_or_compute("k", 60, ["taxpayer:1"], compute)
+        assert source == "HIT-REDIS" and found.body == b'{"n":1}'
+
+        cache.invalidate("taxpayer:1")
+        found, source = await cache.get_or_compute("k", 60, ["taxpayer:1"], compute)
+        assert source == "MISS" and found.body == b'{"n":2}' and calls == 2
+        other.local.invalidate(["taxpayer:1"])  # its local TTL running out
+        found, source = await other.get_or_compute("k", 60, ["taxpayer:1"], compute)
+        assert source == "HIT-REDIS" and found.body == b'{"n":2}', "old shared entry retired by the tag version"
+
+        # Writes committed while the route ran must not be hidden by its result
+        async def racing_compute():
+            body = b"read before the write"
+            cache.invalidate("taxpayer:2")  # the write commits
+            return body, "application/json"
+
+        await cache.get_or_compute("k2", 60, ["taxpayer:2"], racing_compute)
+        _, source = await cache.get_or_compute("k2", 60, ["taxpayer:2"], compute)
+        assert source == "MISS"
+
+    asyncio.run(run())
+    print("✅ Concurrent misses coalesce and tag invalidation reaches both tiers")
+
+
+def test_redis_failure_degrades_to_local():
+    class BrokenManager:
+        @property
+        def redis(self):
+            raise ConnectionError("redis down")
+
+    async def run():
+        cache = ResponseCache(BrokenManager())
+
+        async def compute():
+            return b"{}", "application/json"
+
+        assert (await cache.get_or_compute("k", 60, ["t"], compute))[1] == "MISS"
+        assert (await cache.get_or_compute("k", 60, ["t"], compute))[1] == "HIT-LOCAL"
+        cache.invalidate("t")
+
+    asyncio.run(run())
+    print("✅ Redis errors leave the in-process tier working")
+
+
+def test_invalidate_does_not_wait_for_redis():
+    class SlowPipeline(FakePipeline):
+        def execute(self):
+            time.sleep(0.2)
+            return super().execute()
+
+    manager = FakeRedisManager()
+    manager.redis.pipeline = lambda transaction=True: SlowPipeline(manager.redis)
+    cache = ResponseCache(manager)
+    start = time.perf_counter()
+    cache.invalidate("table:entities")
+    assert time.perf_counter() - start < 0.05, "the caller does not wait for the round trip"
+
+    deadline = time.monotonic() + 2
+    while cache._unpublished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.redis.data[cache._tag_key("table:entities")] == b"1", "published in the background"
+    print("✅ invalidate() queues the Redis version bump for a background publisher")
+
+
+def test_route_decorator_headers():
+    cache = ResponseCache()
+    app = FastAPI()
+    app.add_middleware(CacheControlMiddleware)
+    calls = []
+
+    @app.get("/api/v1/tax/status/{tpin}")
+    @cache(ttl=120, tags=lambda tpin: [f"taxpayer:{tpin}"])
+    async def tax_status(tpin: str, year: int = 2026):
+        calls.append(tpin)
+        if tpin == "0":
+            raise HTTPException(status_code=404, detail="Unknown TPIN")
+        return {"tpin": tpin, "year": year, "status": "compliant"}
+
+    @app.get("/api/v1/uncached")
+    async def uncached():
+        return {}
+
+    client = TestClient(app)
+    first = client.get("/api/v1/tax/status/100")
+    assert first.status_code == 200 and first.json() == {"tpin": "100", "year": 2026, "status": "compliant"}
+    assert first.headers["x-cache"] == "MISS" and first.headers["cache-control"].startswith("public, max-age=")
+    assert "pragma" not in first.headers, "the middleware keeps the route's Cache-Control"
+
+    again = client.get("/api/v1/tax/status/100")
+    assert again.headers["x-cache"] == "HIT-LOCAL" and again.headers["etag"] == first.headers["etag"]
+    assert client.get("/api/v1/tax/status/100?year=2025").headers["x-cache"] == "MISS", "query is part of the key"
+
+    revalidated = client.get("/api/v1/tax/status/100", headers={"If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+
+    assert client.get("/api/v1/tax/status/0").status_code == 404
+    assert client.get("/api/v1/tax/status/0").status_code == 404 and calls.count("0") == 2, "errors are not cached"
+
+    cache.invalidate("taxpayer:100")
+    assert client.get("/api/v1/tax/status/100").headers["x-cache"] == "MISS"
+    assert calls.count("100") == 3
+
+    assert client.get("/api/v1/uncached").headers["cache-control"].startswith("no-store")
+    print("✅ Cached routes send ETag and Cache-Control and answer If-None-Match with 304")
+
+
+if __name__ == "__main__":
+    test_local_cache_bounds()
+    test_coalescing_and_invalidation()
+    test_redis_failure_degrades_to_local()
+    test_invalidate_does_not_wait_for_redis()
+    test_route_decorator_headers()
+    print("\n✅ All response cache tests passed!")
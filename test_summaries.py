@@ -0,0 +1,136 @@
+"""
+Dashboard summary tests: change tracking and refresh scheduling.
+Run with: python test_summaries.py
+"""
+import asyncio
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from db_profile import create_async_engine
+from direct_db_setup import AuditLog, Base, Entity
+from summaries import SUMMARIES, SummaryRefresher, install_summary_tracking, router
+from token_verifier import token_verifier
+
+
+class TrackedSession(Session):
+    """Only sessions of this class report changes to the refresher under test"""
+
+
+def test_refresh_schedule():
+    refresher = SummaryRefresher(engine=None, max_age=600)
+    now = datetime(2026, 10, 18, 12)
+    assert refresher.due(now) == list(SUMMARIES), "everything is refreshed once at startup"
+
+    refresher._dirty.clear()
+    refresher.refreshed_at = {name: now for name in SUMMARIES}
+    assert refresher.due(now + timedelta(seconds=60)) == []
+
+    refresher.mark_changed({"risk_assessments"})
+    assert refresher.due(now + timedelta(seconds=60)) == ["risk_summary"]
+    refresher.mark_changed(["cases", "users"])
+    assert refresher.due(now) == list(SUMMARIES)
+
+    refresher._dirty.clear()
+    assert refresher.due(now + timedelta(seconds=600)) == list(SUMMARIES), "refreshed at least every max_age"
+    print("✅ Summaries are refreshed when their sources change or they reach max_age")
+
+
+def test_commits_mark_summaries_stale():
+    async def scenario(tmp: Path):
+        engine = create_async_engine(f"sqlite:///{tmp / 'summaries.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        refresher = SummaryRefresher(engine)
+        install_summary_tracking(refresher, TrackedSession)
+        Sessions = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=TrackedSession)
+        refresher._dirty.clear()
+        try:
+            async with Sessions() as session:
+                session.add(Entity(entity_id="entity-1", name="ABC Trading", type="business", tin="123456789"))
+                await session.flush()
+                await session.rollback()
+            assert not refresher._dirty, "rolled back writes change nothing"
+
+            async with Sessions() as session:
+                session.add(AuditLog(log_id="AUDIT-1", event_type="login", operation="read", audit_hash="0" * 64))
+                await session.commit()
+            assert not refresher._dirty, "tables no summary reads from are ignored"
+
+            async with Sessions() as session:
+                session.add(Entity(entity_id="entity-1", name="ABC Trading", type="business", tin="123456789"))
+                await session.commit()
+            assert refresher._dirty == {"entity_compliance_summary", "compliance_overview"}
+
+            refresher._dirty.clear()
+            async with Sessions() as session:
+                await session.execute(update(Entity).values(risk_score=0.9))
+                await session.commit()
+            assert refresher._dirty == {"entity_compliance_summary", "compliance_overview"}
+            assert await refresher.run_once() == [], "views exist on PostgreSQL only"
+        finally:
+            await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(Path(tmp)))
+    print("✅ Committed writes mark the summaries built from them as stale")
+
+
+def test_compliance_score_published_after_refresh():
+    class FakeConnection:
+        """Grants the advisory lock and returns 0.72 as the average compliance score"""
+
+        async def scalar(self, statement, params=None):
+            return True if params else 0.72
+
+        async def execute(self, statement, params=None):
+            pass
+
+    def exported():
+        return REGISTRY.get_sample_value("zra_compliance_score", {"scope": "overall"})
+
+    assert exported() is None, "no series before a score is computed"
+    refresher = SummaryRefresher(engine=None)
+    assert asyncio.run(refresher._refresh(FakeConnection(), "risk_summary"))
+    assert exported() is None
+    assert asyncio.run(refresher._refresh(FakeConnection(), "compliance_overview"))
+    assert exported() == 0.72
+    print("✅ zra_compliance_score is exported only once compliance_overview has been refreshed")
+
+
+def test_summary_routes_require_read_dashboard():
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    for path in ("/api/v1/users/dashboard/summary/overview", "/api/v1/users/dashboard/summary/entities/entity-001",
+                 "/api/v1/users/dashboard/summary/risk"):
+        assert client.get(path).status_code == 401, path
+
+    def bearer(*permissions):
+        token = token_verifier.sign({"user_id": "officer_001", "permissions": list(permissions),
+                                     "iss": token_verifier.issuer, "aud": token_verifier.audience})
+        return {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/v1/users/dashboard/summary/risk", headers=bearer("read:cases")).status_code == 403
+    # Past auth, the test database is not PostgreSQL
+    assert client.get("/api/v1/users/dashboard/summary/risk", headers=bearer("read:dashboard")).status_code == 503
+    print("✅ The summary routes need a bearer token with read:dashboard")
+
+
+if __name__ == "__main__":
+    test_refresh_schedule()
+    test_commits_mark_summaries_stale()
+    test_compliance_score_published_after_refresh()
+    test_summary_routes_require_read_dashboard()
+    print("\n✅ All summary tests passed!")
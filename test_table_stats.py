@@ -0,0 +1,65 @@
+"""
+Table statistics tests: approximate and exact row counts.
+Run with: python test_table_stats.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from db_profile import connect
+from table_stats import RowCount, redis_key_count, sqlite_row_counts
+
+
+def test_sqlite_row_counts():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "stats.db"
+        conn = connect(db_path)
+        conn.execute("CREATE TABLE payments (id INTEGER PRIMARY KEY, tin TEXT)")
+        conn.execute("CREATE INDEX ix_payments_tin ON payments (tin)")
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE empty (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO payments (tin) VALUES (?)", [(str(i % 97),) for i in range(5000)])
+        conn.executemany("INSERT INTO users (id) VALUES (?)", [(i,) for i in range(1, 31)])
+        conn.commit()
+
+        readonly = connect(db_path, readonly=True)
+        assert sqlite_row_counts(readonly)["payments"] == RowCount(None, False), "read-only: no ANALYZE"
+        readonly.close()
+
+        counts = sqlite_row_counts(conn)
+        assert not counts["payments"].exact and 0 < counts["payments"].rows <= 5000
+        assert counts["users"] == RowCount(30, False)
+        assert counts["empty"] == RowCount(0, False)
+
+        conn.executemany("INSERT INTO users (id) VALUES (?)", [(i,) for i in range(31, 41)])
+        conn.commit()
+        assert sqlite_row_counts(conn)["users"].rows == 30, "statistics are not re-read from the table"
+        exact = sqlite_row_counts(conn, exact=True)
+        assert exact["users"] == RowCount(40, True) and exact["payments"] == RowCount(5000, True)
+        assert str(exact["payments"]) == "5,000 rows" and str(counts["users"]) == "~30 rows"
+        conn.close()
+    print("✅ SQLite row counts come from sqlite_stat1 unless exact counts are requested")
+
+
+def test_redis_key_count():
+    class FakeRedis:
+        keys = ["session:1", "session:2", "cache:a"]
+
+        def dbsize(self):
+            return len(self.keys) + 1  # includes an expired key not yet reclaimed
+
+        def scan_iter(self, count=None):
+            return iter(self.keys)
+
+    assert redis_key_count(FakeRedis()) == RowCount(4, False)
+    assert redis_key_count(FakeRedis(), exact=True) == RowCount(3, True)
+    print("✅ Redis key count uses DBSIZE unless exact counts are requested")
+
+
+if __name__ == "__main__":
+    test_sqlite_row_counts()
+    test_redis_key_count()
+    print("\n✅ All table statistics tests passed!")
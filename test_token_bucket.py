@@ -0,0 +1,151 @@
+"""
+Token-bucket pre-filter tests (no Redis required).
+Run with: python test_token_bucket.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from rate_limiter import RateLimitResult
+from token_bucket import TokenBucketPreFilter
+
+
+class FakeLimiter:
+    """Stands in for RateLimiter and records each batched sync"""
+
+    def __init__(self, limit=100, window=60):
+        self.limit = limit
+        self.window = window
+        self.count = 0
+        self.calls = []
+        self.batches = []
+
+    def hit(self, rate_key, cost=1):
+        self.calls.append((rate_key, cost))
+        granted = max(0, min(cost, self.limit - self.count))
+        self.count += granted
+        retry_after_ms = 30_000 if self.count >= self.limit else 0
+        return RateLimitResult(granted >= cost, self.count, self.limit, retry_after_ms)
+
+    def hit_many(self, hits):
+        self.batches.append(list(hits))
+        return [self.hit(rate_key, cost) for rate_key, cost in hits]
+
+
+def test_flood_rejected_locally():
+    limiter = FakeLimiter(limit=1000, window=60)
+    prefilter = TokenBucketPreFilter(limiter, rate=1, burst=10, sync_every=1000, sync_interval_ms=60_000)
+
+    decisions = [prefilter.check("10.0.0.1") for _ in range(50)]
+
+    assert sum(d.allowed for d in decisions) == 10
+    assert all(d.retry_after >= 1 for d in decisions if not d.allowed)
+    assert limiter.calls == [], "local rejections must not touch Redis"
+    print("✅ Flood rejected from local bucket without Redis")
+
+
+def test_syncs_in_batches():
+    limiter = FakeLimiter(limit=1000, window=60)
+    prefilter = TokenBucketPreFilter(limiter, rate=1000, burst=1000, sync_every=20, sync_interval_ms=60_000)
+
+    for _ in range(100):
+        assert prefilter.check("10.0.0.2").allowed
+
+    assert limiter.calls == [("rate_limit:10.0.0.2", 20)] * 5
+    print("✅ Allowance synced to Redis every 20 requests")
+
+
+def test_shared_window_blocks_client():
+    limiter = FakeLimiter(limit=30, window=60)
+    prefilter = TokenBucketPreFilter(limiter, rate=1000, burst=1000, sync_every=20, sync_interval_ms=60_000)
+
+    decisions = [prefilter.check("10.0.0.3") for _ in range(60)]
+    calls_after_block = len(limiter.calls)
+    later = [prefilter.check("10.0.0.3") for _ in range(10)]
+
+    assert not decisions[39].allowed
+    assert not any(d.allowed for d in later)
+    assert len(limiter.calls) == calls_after_block, "blocked client must not touch Redis"
+    print("✅ Full shared window blocks the client locally")
+
+
+def test_client_table_is_bounded():
+    async def run():
+        limiter = FakeLimiter(limit=10_000)
+        prefilter = TokenBucketPreFilter(limiter, max_clients=100, sync_every=20, sync_interval_ms=60_000)
+        for i in range(1000):
+            await prefilter.acheck(f"10.1.{i // 256}.{i % 256}")
+        assert len(prefilter._buckets) == 100
+        assert limiter.calls == []
+        await prefilter.stop()
+        assert limiter.count == 1000, "evicted clients' pending hits are reported too"
+
+    asyncio.run(run())
+    print("✅ Client table bounded without losing evicted clients' hits")
+
+
+def test_async_sync_does_not_block_the_loop():
+    class SlowLimiter(FakeLimiter):
+        def hit(self, rate_key, cost=1):
+            time.sleep(0.2)
+            return super().hit(rate_key, cost)
+
+    async def run():
+        limiter = SlowLimiter()
+        prefilter = TokenBucketPreFilter(limiter, rate=1000, burst=1000, sync_every=1, sync_interval_ms=60_000)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        decisions = await asyncio.gather(*(prefilter.acheck("10.0.0.4") for _ in range(3)))
+        task.cancel()
+        assert all(d.allowed for d in decisions) and ticks >= 10, f"the loop kept running ({ticks} ticks)"
+        assert limiter.calls == [("rate_limit:10.0.0.4", 1)], "one sync in flight per client"
+        assert prefilter._buckets["10.0.0.4"].pending == 2, "hits admitted during the sync stay pending"
+
+    asyncio.run(run())
+    print("✅ acheck() syncs from a worker thread without stalling the event loop")
+
+
+def test_quiet_clients_are_flushed():
+    async def run():
+        limiter = FakeLimiter()
+        prefilter = TokenBucketPreFilter(limiter, rate=1000, burst=1000, sync_every=20, sync_interval_ms=20)
+        prefilter.start()
+        for _ in range(3):
+            assert (await prefilter.acheck("10.0.0.5")).allowed
+        assert limiter.calls == []
+        await asyncio.sleep(0.1)
+        assert limiter.calls == [("rate_limit:10.0.0.5", 3)], limiter.calls
+        assert (await prefilter.acheck("10.0.0.5")).allowed
+        await prefilter.stop()
+        assert limiter.calls[-1] == ("rate_limit:10.0.0.5", 1), "stop() flushes what is left"
+
+        for i in range(50):
+            await prefilter.acheck(f"10.0.1.{i}")
+        before = len(limiter.batches)
+        assert await prefilter.flush_idle(min_age=0) == 50
+        assert len(limiter.batches) == before + 1, "all due clients go out in one batch"
+        assert await prefilter.flush_idle(min_age=0) == 0
+
+    asyncio.run(run())
+    print("✅ Pending hits of quiet clients are flushed in the background")
+
+
+if __name__ == "__main__":
+    test_flood_rejected_locally()
+    test_syncs_in_batches()
+    test_shared_window_blocks_client()
+    test_client_table_is_bounded()
+    test_async_sync_does_not_block_the_loop()
+    test_quiet_clients_are_flushed()
+    print("\n✅ All token bucket tests passed!")
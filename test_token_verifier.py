@@ -0,0 +1,134 @@
+"""
+Token verifier tests: signature and claim checks, the claims cache and permission masks.
+Run with: python test_token_verifier.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from token_verifier import InvalidToken, PermissionRegistry, TokenVerifier
+
+try:
+    import jwt
+except ImportError:
+    jwt = None
+
+SECRET = "test-secret-for-the-token-verifier-tests"
+
+
+def claims(**overrides):
+    now = int(time.time())
+    base = {
+        "user_id": "officer_001",
+        "role": "officer",
+        "permissions": ["read:dashboard", "read:cases", "write:cases"],
+        "iat": now,
+        "exp": now + 1800,
+        "iss": "zra-system",
+        "aud": "zra-dashboard",
+    }
+    base.update(overrides)
+    return base
+
+
+def rejected(verifier: TokenVerifier, token: str, reason: str, now=None):
+    try:
+        verifier.verify(token, now=now)
+    except InvalidToken as e:
+        assert reason in str(e), e
+        return True
+    return False
+
+
+def test_verification():
+    verifier = TokenVerifier(SECRET, registry=PermissionRegistry())
+    token = verifier.sign(claims())
+    verified = verifier.verify(token)
+    assert verified.user_id == "officer_001" and verified.has("write:cases") and not verified.has("admin:access")
+
+    header, payload, signature = token.split(".")
+    assert rejected(verifier, f"{header}.{payload}.{signature[:-2]}AA", "Signature")
+    assert rejected(TokenVerifier("other-secret"), token, "Signature")
+    assert rejected(verifier, "eyJhbGciOiJub25lIn0." + payload + ".", "header"), "alg none is refused"
+    assert rejected(verifier, "not-a-token", "Malformed")
+    assert rejected(verifier, verifier.sign(claims(exp=int(time.time()) - 1)), "expired")
+    assert rejected(verifier, verifier.sign(claims(nbf=int(time.time()) + 60)), "not yet valid")
+    assert rejected(verifier, verifier.sign(claims(aud="another-app")), "audience")
+    assert rejected(verifier, verifier.sign(claims(iss="someone-else")), "issuer")
+    assert verifier.verify(verifier.sign(claims(aud=["zra-dashboard", "zra-api"]))).role == "officer"
+    print("✅ Tokens are checked for signature, header, expiry, audience and issuer")
+
+
+def test_pyjwt_compatibility():
+    if jwt is None:
+        print("⚠️  PyJWT not installed, skipping compatibility check")
+        return
+    verifier = TokenVerifier(SECRET)
+    minted = jwt.encode(claims(), SECRET, algorithm="HS256")
+    assert verifier.verify(minted).has("read:cases")
+    own = verifier.sign(claims())
+    assert jwt.decode(own, SECRET, algorithms=["HS256"], audience="zra-dashboard")["user_id"] == "officer_001"
+    print("✅ Tokens minted with PyJWT verify, and the other way round")
+
+
+def test_claims_cache():
+    verifier = TokenVerifier(SECRET, cache_size=2, max_ttl=300)
+    now = time.time()
+    token = verifier.sign(claims(exp=int(now) + 10))
+    first = verifier.verify(token, now=now)
+    assert verifier.verify(token, now=now + 1) is first and verifier.hits == 1
+    assert rejected(verifier, token, "expired", now=now + 11), "a cached token still expires"
+
+    permanent = verifier.sign(claims(exp=None))
+    verifier.verify(permanent, now=now)
+    assert verifier.verify(permanent, now=now + 299) is not None and verifier.misses == 3
+    verifier.verify(permanent, now=now + 301)
+    assert verifier.misses == 4, "tokens without exp are re-verified after max_ttl"
+
+    for i in range(3):
+        verifier.verify(verifier.sign(claims(user_id=f"user_{i}")), now=now)
+    assert len(verifier._cache) == 2
+    print("✅ Verified claims are cached until the token's exp, in a bounded LRU")
+
+
+def test_require_dependency():
+    verifier = TokenVerifier(SECRET, registry=PermissionRegistry())
+    dependency = verifier.require("read:cases", "write:cases")
+    admin_only = verifier.require("admin:access")
+
+    def request(authorization=None):
+        headers = [(b"authorization", authorization.encode())] if authorization else []
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+    def status(dep, req):
+        try:
+            asyncio.run(dep(req))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    token = verifier.sign(claims())
+    assert status(dependency, request(f"Bearer {token}")) == 200
+    assert status(admin_only, request(f"Bearer {token}")) == 403
+    assert status(dependency, request()) == 401
+    assert status(dependency, request("Bearer garbage")) == 401
+
+    mask = verifier.registry.mask(["read:cases", "write:cases"])
+    verified = verifier.verify(token)
+    assert verified.allows(mask) and not verified.allows(verifier.registry.mask(["admin:access"]))
+    print("✅ require() checks bearer tokens against a precompiled permission mask")
+
+
+if __name__ == "__main__":
+    test_verification()
+    test_pyjwt_compatibility()
+    test_claims_cache()
+    test_require_dependency()
+    print("\n✅ All token verifier tests passed!")
@@ -0,0 +1,223 @@
+"""
+In-process token-bucket pre-filter for the Redis rate limiter.
+
+Each worker keeps one small bucket per client IP. Obvious floods are
+rejected from local state without touching Redis; requests that pass are
+reported to the shared Redis sliding window in batches, either every
+``sync_every`` requests or every ``sync_interval_ms`` milliseconds,
+whichever comes first. When Redis reports the shared window as full the
+client is blocked locally until the window frees up.
+
+On the event loop use acheck(): a due sync runs in a worker thread, so a
+slow Redis never stalls other requests. start() runs a background flush
+that reports the pending hits of clients that went quiet before reaching
+either threshold, every sync_interval_ms. Clients with pending hits wait
+in a heap ordered by their last sync, so a flush only looks at the ones
+that are due, and all of them go to Redis in one pipelined batch. So do
+the pending hits of clients evicted from a full client table.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from rate_limiter import RateLimiter, RateLimitResult
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """Per-client state; slotted to keep a large client table cheap"""
+    __slots__ = ("tokens", "updated", "pending", "last_sync", "blocked_until", "syncing")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.pending = 0
+        self.last_sync = now
+        self.blocked_until = 0.0
+        self.syncing = False
+
+
+class Decision(NamedTuple):
+    """Outcome of a pre-filter check"""
+    allowed: bool
+    retry_after: int = 0
+    remote: bool = False  # True when the decision involved a Redis sync
+
+
+class TokenBucketPreFilter:
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        sync_every: int = 20,
+        sync_interval_ms: int = 250,
+        max_clients: int = 100_000,
+        key_prefix: str = "rate_limit:",
+    ):
+        """
+        Initialize the pre-filter
+
+        Args:
+            limiter: Shared Redis sliding-window limiter
+            rate: Local refill rate in tokens per second (default: limit / window)
+            burst: Local bucket capacity (default: the limiter's limit)
+            sync_every: Flush pending hits to Redis after this many requests
+            sync_interval_ms: Flush pending hits to Redis after this long
+            max_clients: Upper bound on tracked client buckets per worker
+            key_prefix: Redis key prefix for the shared per-client window
+        """
+        self.limiter = limiter
+        self.rate = rate if rate is not None else limiter.limit / limiter.window
+        self.burst = float(burst if burst is not None else limiter.limit)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval_ms / 1000
+        self.max_clients = max_clients
+        self.key_prefix = key_prefix
+        self._buckets: Dict[str, _Bucket] = {}
+        # (last_sync, client) of buckets with pending hits; entries go stale when the bucket syncs again
+        self._due: List[Tuple[float, str]] = []
+        # (client, pending hits) of evicted buckets, reported by the next flush
+        self._evicted: List[Tuple[str, int]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def _bucket(self, client: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                # Drop the least recently created client (dicts keep insertion order)
+                # that has no sync in flight; its pending hits still go out
+                victim = next((c for c, b in self._buckets.items() if not b.syncing), next(iter(self._buckets)))
+                evicted = self._buckets.pop(victim)
+                if evicted.pending and not evicted.syncing:
+                    self._evicted.append((victim, evicted.pending))
+            bucket = self._buckets[client] = _Bucket(self.burst, now)
+        return bucket
+
+    def check(self, client: str) -> Decision:
+        """Admit or reject one request from client; a due sync calls Redis inline"""
+        now = time.monotonic()
+        decision, bucket = self._admit(client, now)
+        if bucket is None:
+            return decision
+        cost = bucket.pending
+        return self._apply(client, bucket, cost, self._report(client, cost), now)
+
+    async def acheck(self, client: str) -> Decision:
+        """check() for the event loop; a due sync calls Redis from a worker thread"""
+        now = time.monotonic()
+        decision, bucket = self._admit(client, now)
+        if bucket is None:
+            return decision
+        cost = bucket.pending
+        result = await asyncio.to_thread(self._report, client, cost)
+        return self._apply(client, bucket, cost, result, now)
+
+    def _admit(self, client: str, now: float) -> Tuple[Decision, Optional[_Bucket]]:
+        """The local decision, and the client's bucket when its pending hits are due for a sync"""
+        bucket = self._bucket(client, now)
+
+        if now < bucket.blocked_until:
+            return Decision(False, max(1, int(bucket.blocked_until - now + 0.999))), None
+
+        tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if tokens < 1:
+            bucket.tokens = tokens
+            return Decision(False, max(1, int((1 - tokens) / self.rate + 0.999))), None
+
+        bucket.tokens = tokens - 1
+        bucket.pending += 1
+        if bucket.pending == 1:
+            heapq.heappush(self._due, (bucket.last_sync, client))
+        if bucket.syncing or (bucket.pending < self.sync_every and now - bucket.last_sync < self.sync_interval):
+            return Decision(True), None
+        bucket.syncing = True
+        bucket.last_sync = now
+        return Decision(True), bucket
+
+    def _report(self, client: str, cost: int) -> Optional[RateLimitResult]:
+        """Add cost locally admitted requests to the shared window; None if Redis failed"""
+        try:
+            return self.limiter.hit(f"{self.key_prefix}{client}", cost=cost)
+        except Exception as e:
+            # Keep serving from the local bucket; pending hits go out on the next sync
+            logger.warning(f"Rate limit sync failed for {client}: {e}")
+            return None
+
+    def _report_many(self, hits: List[Tuple[str, int]]) -> List[Optional[RateLimitResult]]:
+        """_report() for several clients in one pipelined batch"""
+        try:
+            return self.limiter.hit_many([(f"{self.key_prefix}{client}", cost) for client, cost in hits])
+        except Exception as e:
+            logger.warning(f"Rate limit sync of {len(hits)} clients failed: {e}")
+            return [None] * len(hits)
+
+    def _apply(self, client: str, bucket: _Bucket, cost: int, result: Optional[RateLimitResult],
+               now: float) -> Decision:
+        """Record a sync's outcome on the bucket; requests admitted meanwhile stay pending"""
+        bucket.syncing = False
+        if result is not None:
+            bucket.pending -= cost
+        if bucket.pending:
+            heapq.heappush(self._due, (bucket.last_sync, client))
+        if result is None:
+            return Decision(True)
+        if result.count >= result.limit and result.retry_after_ms > 0:
+            bucket.blocked_until = now + result.retry_after_ms / 1000
+        return Decision(result.allowed, result.retry_after, remote=True)
+
+    async def flush_idle(self, min_age: Optional[float] = None) -> int:
+        """
+        Sync clients not synced for min_age seconds (default sync_interval) that have pending hits
+
+        Reports them, and the pending hits of evicted clients, in one
+        pipelined batch; returns how many clients were reported.
+        """
+        now = time.monotonic()
+        cutoff = now - (self.sync_interval if min_age is None else min_age)
+        due: List[Tuple[str, _Bucket, int]] = []
+        while self._due and self._due[0][0] <= cutoff:
+            last_sync, client = heapq.heappop(self._due)
+            bucket = self._buckets.get(client)
+            if bucket is None or bucket.last_sync != last_sync or bucket.syncing or not bucket.pending:
+                continue  # evicted, synced since, or a sync is in flight
+            bucket.syncing = True
+            bucket.last_sync = now
+            due.append((client, bucket, bucket.pending))
+        evicted, self._evicted = self._evicted, []
+        if not due and not evicted:
+            return 0
+        results = await asyncio.to_thread(
+            self._report_many, [(client, cost) for client, _, cost in due] + evicted
+        )
+        for (client, bucket, cost), result in zip(due, results):
+            self._apply(client, bucket, cost, result, now)
+        # Hits of evicted clients whose sync failed are retried with the next flush
+        self._evicted.extend(hit for hit, result in zip(evicted, results[len(due):]) if result is None)
+        return len(due) + len(evicted)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.flush_idle()
+            except Exception as e:
+                logger.error(f"Rate limit flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_idle(min_age=0)
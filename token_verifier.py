@@ -0,0 +1,265 @@
+"""
+HS256 access token verification for the request path.
+
+Tokens minted by generate_token.py, quick_token.py and permanent_token.py
+are verified once and their claims cached. The cache is an LRU of
+TOKEN_CACHE_SIZE entries keyed by the token's signature, its HMAC-SHA256
+digest, and a hit also compares the whole token. An entry is dropped at
+the token's exp, or after TOKEN_CACHE_MAX_TTL_SECONDS for tokens without
+one, so a cached token is never accepted past its expiry. A repeat
+request costs a dict lookup and a string comparison instead of base64
+and JSON decoding, signature and claim checks.
+
+A cache miss also avoids the general-purpose JWT path: the HMAC key is
+prepared once and copied per token, and each distinct header segment
+(there is normally one) is decoded and checked once. Only HS256 is
+accepted.
+
+Permission lists are compiled into a frozenset and a bitmask when the
+token is first verified. require() compiles its permissions into a mask
+too, so an authorization check is one AND:
+
+    @router.get("/cases")
+    async def list_cases(token: VerifiedToken = Depends(token_verifier.require("read:cases"))):
+        ...
+
+The in-tree routers apply it to every route with APIRouter(dependencies=...):
+audit_ledger.router requires read:audit and summaries.router requires
+read:dashboard. A missing or invalid token gets 401, a token without the
+permission 403.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "zra-dashboard")
+JWT_ISSUER = os.getenv("JWT_ISSUER", "zra-system")
+JWT_LEEWAY = float(os.getenv("JWT_LEEWAY_SECONDS", "0"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
+
+# Bit order for the permissions the token scripts issue; others get bits as they are seen
+KNOWN_PERMISSIONS = (
+    "read:dashboard", "read:cases", "write:cases", "read:audit", "write:audit", "delete:audit",
+    "admin:access", "user:access", "manage:users", "system:config",
+)
+
+
+class InvalidToken(Exception):
+    """The token is malformed, wrongly signed, expired or for another audience"""
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class PermissionRegistry:
+    """Assigns each permission name a bit"""
+
+    def __init__(self, known: Iterable[str] = KNOWN_PERMISSIONS):
+        self._bits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for permission in known:
+            self.bit(permission)
+
+    def bit(self, permission: str) -> int:
+        bit = self._bits.get(permission)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(permission, 1 << len(self._bits))
+        return bit
+
+    def mask(self, permissions: Iterable[str]) -> int:
+        mask = 0
+        for permission in permissions:
+            mask |= self.bit(permission)
+        return mask
+
+
+class VerifiedToken:
+    """Claims of a verified token with its permissions precompiled"""
+    __slots__ = ("claims", "permissions", "mask", "cache_until")
+
+    def __init__(self, claims: Dict[str, Any], permissions: FrozenSet[str], mask: int, cache_until: float):
+        self.claims = claims
+        self.permissions = permissions
+        self.mask = mask
+        self.cache_until = cache_until
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.claims.get("user_id")
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.claims.get("role")
+
+    def has(self, permission: str) -> bool:
+        return permission in self.permissions
+
+    def allows(self, required_mask: int) -> bool:
+        return self.mask & required_mask == required_mask
+
+
+class TokenVerifier:
+    def __init__(self, secret: str = SECRET_KEY, audience: Optional[str] = JWT_AUDIENCE,
+                 issuer: Optional[str] = JWT_ISSUER, leeway: float = JWT_LEEWAY,
+                 cache_size: int = TOKEN_CACHE_SIZE, max_ttl: float = TOKEN_CACHE_MAX_TTL,
+                 registry: Optional[PermissionRegistry] = None):
+        """
+        Initialize the verifier
+
+        Args:
+            secret: HS256 signing key (SECRET_KEY)
+            audience: Required aud claim, or None to reject tokens that carry one
+            issuer: Required iss claim, or None to skip the check
+            leeway: Seconds of clock skew allowed on exp and nbf
+            cache_size: Verified tokens kept in the LRU
+            max_ttl: Longest a verified token is cached, for tokens without exp
+            registry: Permission bit assignments (shared between verifiers by default)
+        """
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self.max_ttl = max_ttl
+        self.registry = registry or default_registry
+        self._headers: Dict[str, bool] = {}
+        self._cache: "OrderedDict[str, Tuple[str, VerifiedToken]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        """Encode claims as an HS256 token, as jwt.encode does (for tests and benchmarks)"""
+        header = _b64encode(b'{"alg":"HS256","typ":"JWT"}')
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        mac = self._mac.copy()
+        mac.update(f"{header}.{payload}".encode())
+        return f"{header}.{payload}.{_b64encode(mac.digest())}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> VerifiedToken:
+        """Verified claims of token; raises InvalidToken"""
+        now = time.time() if now is None else now
+        # The signature segment is already a SHA-256 HMAC of the rest of the token
+        key = token[token.rfind(".") + 1:]
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == token:
+            verified = cached[1]
+            if now < verified.cache_until:
+                self.hits += 1
+                try:
+                    self._cache.move_to_end(key)
+                except KeyError:
+                    pass  # evicted by another thread meanwhile
+                return verified
+            with self._lock:
+                self._cache.pop(key, None)
+
+        self.misses += 1
+        verified = self._verify(token, now)
+        if verified.cache_until > now:
+            with self._lock:
+                self._cache[key] = (token, verified)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return verified
+
+    def _header_ok(self, segment: str) -> bool:
+        ok = self._headers.get(segment)
+        if ok is None:
+            try:
+                header = json.loads(_b64decode(segment))
+                ok = isinstance(header, dict) and header.get("alg") == "HS256" and "crit" not in header
+            except ValueError:
+                ok = False
+            if len(self._headers) < 64:
+                self._headers[segment] = ok
+        return ok
+
+    def _verify(self, token: str, now: float) -> VerifiedToken:
+        try:
+            header, payload, signature = token.split(".")
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        if not self._header_ok(header):
+            raise InvalidToken("Unsupported token header")
+
+        mac = self._mac.copy()
+        mac.update(token[:len(header) + len(payload) + 1].encode())
+        try:
+            valid = hmac.compare_digest(mac.digest(), _b64decode(signature))
+        except ValueError:
+            valid = False
+        if not valid:
+            raise InvalidToken("Signature verification failed")
+
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidToken("Malformed token payload")
+        if not isinstance(claims, dict):
+            raise InvalidToken("Malformed token payload")
+
+        cache_until = now + self.max_ttl
+        exp = claims.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise InvalidToken("Invalid exp claim")
+            if now >= exp + self.leeway:
+                raise InvalidToken("Token has expired")
+            cache_until = min(cache_until, exp + self.leeway)
+        nbf = claims.get("nbf")
+        if nbf is not None and (not isinstance(nbf, (int, float)) or now < nbf - self.leeway):
+            raise InvalidToken("Token is not yet valid")
+
+        aud = claims.get("aud")
+        if self.audience is None:
+            if aud is not None:
+                raise InvalidToken("Unexpected audience")
+        elif aud != self.audience and not (isinstance(aud, list) and self.audience in aud):
+            raise InvalidToken("Invalid audience")
+        if self.issuer is not None and claims.get("iss") != self.issuer:
+            raise InvalidToken("Invalid issuer")
+
+        permissions = claims.get("permissions") or []
+        if not isinstance(permissions, list) or not all(isinstance(p, str) for p in permissions):
+            raise InvalidToken("Invalid permissions claim")
+        permissions = frozenset(permissions)
+        return VerifiedToken(claims, permissions, self.registry.mask(permissions), cache_until)
+
+    def require(self, *permissions: str):
+        """FastAPI dependency: the request's bearer token, which must carry all of permissions"""
+        required = self.registry.mask(permissions)
+        challenge = {"WWW-Authenticate": "Bearer"}
+
+        async def dependency(request: Request) -> VerifiedToken:
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                raise HTTPException(status_code=401, detail="Not authenticated", headers=challenge)
+            try:
+                verified = self.verify(token)
+            except InvalidToken as e:
+                raise HTTPException(status_code=401, detail=str(e), headers=challenge)
+            if not verified.allows(required):
+                raise HTTPException(status_code=403, detail="Insufficient permissions")
+            return verified
+
+        return dependency
+
+
+default_registry = PermissionRegistry()
+token_verifier = TokenVerifier()
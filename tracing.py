@@ -0,0 +1,96 @@
+"""
+Opt-in OpenTelemetry tracing.
+
+Enabled with TRACING_ENABLED=true. Spans are created for every FastAPI
+route, every Redis command issued through redis_manager and every
+SQLAlchemy query, and exported over OTLP to the collector defined in
+ops/otel/config.yaml.
+
+Sampling happens in two places:
+- Head sampling here, TRACING_SAMPLE_RATE (0.0-1.0, default 0.1). The
+  decision is made when the root span starts and inherited by children,
+  so unsampled requests cost almost nothing.
+- Tail sampling in the collector (TAIL_SAMPLING_PERCENT, see the
+  tail_sampling processor), which keeps every error and slow trace from
+  what was head-sampled plus a percentage of the rest.
+
+Spans are handed to a BatchSpanProcessor: ending a span only appends to
+an in-memory queue and a background thread exports in batches, so the
+event loop never waits on the network. When the queue is full new spans
+are dropped rather than blocking.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_provider = None
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def setup_tracing(app, engine=None, async_engine=None) -> bool:
+    """
+    Instrument app, Redis and the SQLAlchemy engines if tracing is enabled.
+
+    async_engine (async_db.async_engine, used by the repositories) is traced
+    through the sync engine it runs on.
+
+    Returns True when tracing was configured.
+    """
+    global _provider
+    if not _env_flag("TRACING_ENABLED"):
+        return False
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        from opentelemetry.instrumentation.redis import RedisInstrumentor
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError as e:
+        logger.warning(f"Tracing enabled but OpenTelemetry is not installed ({e}); "
+                       f"install requirements-tracing.txt")
+        return False
+
+    sample_rate = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+    _provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: os.getenv("OTEL_SERVICE_NAME", "zra-service")}),
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(
+        OTLPSpanExporter(
+            endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317"),
+            insecure=_env_flag("OTEL_EXPORTER_OTLP_INSECURE", "true"),
+        ),
+        max_queue_size=int(os.getenv("TRACING_MAX_QUEUE_SIZE", "4096")),
+        max_export_batch_size=int(os.getenv("TRACING_MAX_EXPORT_BATCH_SIZE", "512")),
+        schedule_delay_millis=int(os.getenv("TRACING_SCHEDULE_DELAY_MS", "2000")),
+    ))
+    trace.set_tracer_provider(_provider)
+
+    # Probes and scrapes would otherwise dominate the sampled traces
+    FastAPIInstrumentor.instrument_app(
+        app, tracer_provider=_provider, excluded_urls="/health,/ready,/metrics"
+    )
+    RedisInstrumentor().instrument(tracer_provider=_provider)
+    engines = [engine] if engine is not None else []
+    if async_engine is not None:
+        engines.append(async_engine.sync_engine)
+    if engines:
+        SQLAlchemyInstrumentor().instrument(engines=engines, tracer_provider=_provider)
+
+    logger.info(f"Tracing enabled (head sample rate {sample_rate})")
+    return True
+
+
+def shutdown_tracing():
+    """Flush queued spans; call on application shutdown"""
+    if _provider is not None:
+        _provider.shutdown()